@@ -0,0 +1,242 @@
+"""Historical backtest of the DCF fair value against market prices.
+
+Replays calculate_advanced_dcf at every historical statement date using only
+what was known at the time: the statements of that period (from a
+StatementStore), the risk-free rate on the date they became public and the
+price on that date. The output is one row per (ticker, period) with the
+fair-value/price gap and forward returns, so the gap's predictive power can
+be measured across years and tickers. Risk-free rates come from the Treasury
+yield curve, loaded back to the earliest statement date before the run; dates
+without an observation get no rate (and so no fair value).
+
+    python backtest.py statement_store/ prices.csv backtest.csv --chunk-size 500
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from dtf import batch_advanced_dcf
+from statement_store import StatementStore
+from yield_curve import get_yield_curve_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {'short_term_growth': 0.1, 'long_term_growth': 0.02, 'market_risk_premium': 0.06}
+
+# Days between a fiscal period end and the filing that makes its statements public
+DEFAULT_REPORTING_LAG = 90
+
+DEFAULT_HORIZONS = (3, 6, 12)  # forward-return horizons in months
+
+# A risk-free observation older than this is treated as missing (e.g. a year the curve lacks)
+MAX_RATE_GAP_DAYS = 10
+
+# Days a price is carried forward over gaps inside a ticker's listed range
+PRICE_FILL_LIMIT = 10
+
+# Point-in-time DCF inputs: name -> statement items, first available wins
+DCF_ITEMS = {
+    'fcf': ('Free Cash Flow',),
+    'total_debt': ('Total Debt',),
+    'cash': ('Cash And Cash Equivalents', 'Cash Cash Equivalents And Short Term Investments'),
+    'shares': ('Ordinary Shares Number', 'Share Issued'),
+}
+
+RESULT_COLUMNS = (['ticker', 'period', 'available_date', 'fcf', 'net_debt', 'shares', 'risk_free_rate',
+                   'wacc', 'fair_price', 'price', 'gap'] + [f'fwd_return_{h}m' for h in DEFAULT_HORIZONS])
+
+def fetch_price_history(tickers, start=None):
+    """Daily adjusted close prices (dates x tickers) from Yahoo."""
+    import yfinance as yf  # only needed when prices aren't supplied
+
+    prices = yf.download(list(tickers), start=start, auto_adjust=True, progress=False)['Close']
+    return prices.to_frame(tickers[0]) if isinstance(prices, pd.Series) else prices
+
+def fill_listed(prices, limit=PRICE_FILL_LIMIT):
+    """Forward-fill gaps of at most `limit` rows, and never past a ticker's last quote.
+
+    A delisted ticker keeps NaN prices after its last trade, so its forward
+    returns are missing rather than a flat 0%.
+    """
+    return prices.ffill(limit=limit).where(prices.bfill().notna())
+
+def treasury_rate_lookup(first_date, service=None, max_gap_days=MAX_RATE_GAP_DAYS):
+    """Point-in-time 10-year Treasury yield by date, NaN where the curve has no recent observation.
+
+    The curve is refreshed synchronously back to first_date's year first,
+    so the lookup never depends on a background load having finished.
+    """
+    service = service or get_yield_curve_service()
+    service.refresh(min(service.start_year, pd.Timestamp(first_date).year))
+
+    def rate(as_of):
+        value = service.rate(as_of, max_gap_days=max_gap_days)
+        return np.nan if value is None else value
+
+    return rate
+
+def point_in_time_inputs(facts):
+    """Wide table of DCF inputs indexed by (ticker, period) from long statement facts."""
+    items = [item for names in DCF_ITEMS.values() for item in names]
+    wide = facts[facts['item'].isin(items)].pivot_table(index=['ticker', 'period'], columns='item',
+                                                         values='value', aggfunc='last')
+    inputs = pd.DataFrame(index=wide.index)
+    for name, names in DCF_ITEMS.items():
+        column = pd.Series(np.nan, index=wide.index)
+        for item in names:
+            if item in wide:
+                column = column.fillna(wide[item])
+        inputs[name] = column
+    inputs['net_debt'] = inputs['total_debt'].fillna(0) - inputs['cash'].fillna(0)
+    return inputs.drop(columns=['total_debt', 'cash'])
+
+def _as_of_positions(dates, as_of):
+    """Row of the last price date at or before each as-of date (-1 when there is none)."""
+    return np.searchsorted(dates, as_of, side='right') - 1
+
+def prices_at(prices, tickers, as_of):
+    """Last known price of tickers[i] on or before as_of[i], vectorized over both arrays."""
+    dates = prices.index.values.astype('datetime64[ns]')
+    positions = _as_of_positions(dates, np.asarray(as_of, dtype='datetime64[ns]'))
+    columns = prices.columns.get_indexer(tickers)
+    values = prices.to_numpy(dtype=float)
+    valid = (positions >= 0) & (columns >= 0)
+    result = np.full(len(positions), np.nan)
+    result[valid] = values[positions[valid], columns[valid]]
+    return result
+
+def backtest_chunk(facts, prices, risk_free_rate_for, betas=None, horizons=DEFAULT_HORIZONS,
+                   reporting_lag=DEFAULT_REPORTING_LAG, short_term_growth=0.1, long_term_growth=0.02,
+                   market_risk_premium=0.06, years_short=5, years_total=10):
+    """Backtest every (ticker, period) in `facts` in one vectorized DCF pass.
+
+    WACC on each date is the point-in-time risk-free rate plus
+    beta * market_risk_premium, with beta from `betas` (default 1.0).
+    """
+    inputs = point_in_time_inputs(facts).dropna(subset=['fcf', 'shares'])
+    inputs = inputs[inputs['shares'] > 0]
+    if inputs.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    frame = inputs.reset_index()
+    frame['available_date'] = frame['period'] + pd.Timedelta(days=reporting_lag)
+
+    # One risk-free lookup per distinct date, broadcast back to the rows
+    unique_dates, inverse = np.unique(frame['available_date'].to_numpy(), return_inverse=True)
+    rates = np.array([risk_free_rate_for(pd.Timestamp(d)) for d in unique_dates], dtype=float)
+    beta = frame['ticker'].map(betas or {}).fillna(1.0).to_numpy(dtype=float)
+    frame['risk_free_rate'] = rates[inverse.reshape(-1)]
+    frame['wacc'] = frame['risk_free_rate'] + beta * market_risk_premium
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fair_prices, _ = batch_advanced_dcf(frame['fcf'], short_term_growth, long_term_growth, frame['wacc'],
+                                            frame['net_debt'], frame['shares'], years_short, years_total)
+    # A terminal growth at or above WACC has no finite Gordon value
+    frame['fair_price'] = np.where(frame['wacc'] > long_term_growth, fair_prices, np.nan)
+
+    tickers = frame['ticker'].to_numpy()
+    frame['price'] = prices_at(prices, tickers, frame['available_date'].to_numpy())
+    frame['gap'] = frame['fair_price'] / frame['price'] - 1
+
+    # Forward returns only where the whole horizon is inside the price history
+    last_date = prices.index.max() if len(prices) else pd.Timestamp.min
+    return_columns = []
+    for horizon in horizons:
+        target = frame['available_date'] + pd.DateOffset(months=horizon)
+        future = prices_at(prices, tickers, target.to_numpy())
+        column = f'fwd_return_{horizon}m'
+        frame[column] = np.where(target <= last_date, future / frame['price'].to_numpy() - 1, np.nan)
+        return_columns.append(column)
+
+    return frame[RESULT_COLUMNS[:11] + return_columns]
+
+def iter_backtest(store, prices, tickers=None, chunk_size=500, risk_free_rate_for=None, **params):
+    """Yield backtest results one chunk of tickers at a time.
+
+    The store's facts and the price frame are held as given; each chunk
+    slices out (and forward-fills) only its own facts and price columns,
+    so the per-chunk work is bounded by chunk_size. Risk-free rates
+    default to treasury_rate_lookup and are looked up once per distinct
+    date across all chunks.
+    """
+    params = dict(DEFAULT_PARAMS, **params)
+    items = [item for names in DCF_ITEMS.values() for item in names]
+    facts = store.facts
+    if risk_free_rate_for is None and len(facts):
+        lag = pd.Timedelta(days=params.get('reporting_lag', DEFAULT_REPORTING_LAG))
+        risk_free_rate_for = treasury_rate_lookup(pd.Timestamp(facts['period'].min()) + lag)
+    prices = prices.sort_index()
+
+    rate_cache = {}
+    def cached_rate(as_of):
+        if as_of not in rate_cache:
+            rate_cache[as_of] = risk_free_rate_for(as_of)
+        return rate_cache[as_of]
+
+    # Row positions per ticker, so slicing a chunk doesn't rescan every fact
+    rows_by_ticker = facts.groupby('ticker', sort=False).indices
+    tickers = list(tickers) if tickers is not None else list(rows_by_ticker)
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        rows = [rows_by_ticker[ticker] for ticker in chunk if ticker in rows_by_ticker]
+        chunk_facts = facts.iloc[np.concatenate(rows)] if rows else facts.iloc[:0]
+        chunk_facts = chunk_facts[chunk_facts['item'].isin(items)]
+        chunk_prices = fill_listed(prices[prices.columns.intersection(chunk)])
+        result = backtest_chunk(chunk_facts, chunk_prices, cached_rate, **params)
+        logger.info("Backtested %d/%d tickers", min(start + chunk_size, len(tickers)), len(tickers))
+        if not result.empty:
+            yield result
+
+def run_backtest(store, prices, tickers=None, output=None, **kwargs):
+    """Run the whole backtest; returns the result frame, or streams it to a CSV when `output` is given.
+
+    An existing `output` is overwritten, so re-running never duplicates rows.
+    """
+    if output is None:
+        chunks = list(iter_backtest(store, prices, tickers, **kwargs))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=RESULT_COLUMNS)
+
+    rows = 0
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', newline='') as f:
+        for chunk in iter_backtest(store, prices, tickers, **kwargs):
+            chunk.to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+        if rows == 0:
+            pd.DataFrame(columns=RESULT_COLUMNS).to_csv(f, index=False)
+    return rows
+
+def summarize_backtest(results, horizon=12, quantiles=5):
+    """Mean forward return per gap quantile (cheapest to richest) for each period year."""
+    column = f'fwd_return_{horizon}m'
+    frame = results.dropna(subset=['gap', column]).copy()
+    frame['year'] = pd.to_datetime(frame['period']).dt.year
+    # Rank within each year's cross-section so quantiles compare like with like
+    frame['gap_quantile'] = frame.groupby('year')['gap'].transform(
+        lambda gap: pd.qcut(gap.rank(method='first'), quantiles, labels=False) if len(gap) >= quantiles else np.nan)
+    return frame.pivot_table(index='year', columns='gap_quantile', values=column, aggfunc='mean')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point-in-time DCF fair value vs price backtest")
+    parser.add_argument('store', help="StatementStore directory (facts.parquet)")
+    parser.add_argument('prices', help="CSV of daily prices: a Date column plus one column per ticker")
+    parser.add_argument('output', help="results .csv file (overwritten, written per chunk)")
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--reporting-lag', type=int, default=DEFAULT_REPORTING_LAG)
+    parser.add_argument('--short-term-growth', type=float, default=DEFAULT_PARAMS['short_term_growth'])
+    parser.add_argument('--long-term-growth', type=float, default=DEFAULT_PARAMS['long_term_growth'])
+    parser.add_argument('--market-risk-premium', type=float, default=DEFAULT_PARAMS['market_risk_premium'])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    prices = pd.read_csv(args.prices, index_col='Date', parse_dates=['Date'])
+    rows = run_backtest(StatementStore(args.store), prices, output=args.output, chunk_size=args.chunk_size,
+                        reporting_lag=args.reporting_lag, short_term_growth=args.short_term_growth,
+                        long_term_growth=args.long_term_growth, market_risk_premium=args.market_risk_premium)
+    logger.info("Done: %d rows written to %s", rows, args.output)
+
+if __name__ == '__main__':
+    main()
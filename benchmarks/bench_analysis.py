@@ -0,0 +1,119 @@
+"""Benchmark every analysis function over offline fixtures at several universe sizes.
+
+Runs with the network disabled: any socket connection attempt fails the run.
+Reports per-function time, throughput (tickers/second) and peak traced memory.
+
+    python benchmarks/bench_analysis.py                      # 1, 100 and 10,000 tickers
+    python benchmarks/bench_analysis.py --sizes 1 100 --functions calculate_wacc
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import DEFAULT_FIXTURE_PATH, fixture_universe, load_fixtures
+
+import financial_statements as fs
+from dtf import calculate_advanced_dcf, calculate_wacc
+from risk_analysis import get_risk_factors
+from snapshot import FundamentalsSnapshot
+from valuation import calculate_dtf_valuation, get_valuation_points
+from valuation_ensemble import value_ensemble
+
+RISK_FREE_RATE = 0.04
+
+def _format_statements(stock):
+    return [fs.format_statement(frame) for frame in (stock.income_stmt, stock.balance_sheet, stock.cashflow)]
+
+# Name -> per-ticker call
+BENCHMARKS = {
+    'calculate_wacc': lambda stock: calculate_wacc(stock, RISK_FREE_RATE),
+    'calculate_advanced_dcf': lambda stock: calculate_advanced_dcf(stock, 0.1, 0.02, 0.09),
+    'calculate_dtf_valuation': calculate_dtf_valuation,
+    'get_valuation_points': get_valuation_points,
+    'get_financial_ratios': fs.get_financial_ratios,
+    'get_risk_factors': get_risk_factors,
+    'format_statements': _format_statements,
+}
+
+# Name -> call over the whole universe at once
+BATCH_BENCHMARKS = {
+    'value_ensemble': lambda universe: value_ensemble(dict(enumerate(universe)), RISK_FREE_RATE),
+}
+
+def _clear_caches():
+    # Each size starts cold so results don't depend on which sizes ran before
+    fs._FORMAT_CACHE.clear()
+    import dtf
+    dtf._component_cache.clear()
+    dtf.combine_wacc.cache_clear()
+
+class NetworkDisabled(RuntimeError):
+    pass
+
+def disable_network():
+    """Make every outbound connection raise, so a benchmark can't silently hit Yahoo."""
+    def refuse(*args, **kwargs):
+        raise NetworkDisabled("network access attempted during an offline benchmark")
+    socket.socket.connect = refuse
+    socket.socket.connect_ex = refuse
+    socket.create_connection = refuse
+    socket.getaddrinfo = refuse
+
+def run(fn, universe, batch=False):
+    if batch:
+        fn(universe)
+        return
+    for stock in universe:
+        fn(stock)
+
+def measure(fn, universe, memory=True, batch=False):
+    _clear_caches()
+    start = time.perf_counter()
+    run(fn, universe, batch)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        # Separate pass: tracemalloc slows allocation-heavy code too much to time under it
+        _clear_caches()
+        tracemalloc.start()
+        run(fn, universe, batch)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10_000])
+    functions = list(BENCHMARKS) + list(BATCH_BENCHMARKS)
+    parser.add_argument('--functions', nargs='+', choices=functions, default=functions)
+    parser.add_argument('--no-memory', action='store_true', help="skip the peak-memory pass")
+    parser.add_argument('--snapshots', action='store_true',
+                        help="run against FundamentalsSnapshot objects instead of ticker stand-ins")
+    args = parser.parse_args()
+
+    records = load_fixtures(args.fixtures)
+    source = args.fixtures if os.path.exists(args.fixtures) else 'synthetic'
+    disable_network()
+
+    print(f"{len(records)} fixture tickers ({source})")
+    print(f"{'function':<26}{'tickers':>8}{'total ms':>12}{'tickers/s':>12}{'peak MiB':>10}")
+    for size in args.sizes:
+        universe = fixture_universe(records, size)
+        if args.snapshots:
+            universe = [FundamentalsSnapshot.from_ticker(stock) for stock in universe]
+        for name in args.functions:
+            batch = name in BATCH_BENCHMARKS
+            fn = BATCH_BENCHMARKS[name] if batch else BENCHMARKS[name]
+            seconds, peak = measure(fn, universe, memory=not args.no_memory, batch=batch)
+            peak_text = f"{peak / 2**20:10.2f}" if peak is not None else f"{'-':>10}"
+            print(f"{name:<26}{size:>8}{seconds * 1e3:12.2f}{size / seconds:12,.0f}{peak_text}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Simulate many concurrent sessions against a local stub server, with and without the shared fetcher.
+
+The stub serves fixture data over HTTP with an artificial delay and counts
+the requests it receives. Each simulated session requests snapshots for
+tickers drawn from a small hot set, the way several users land on the
+same popular names at once.
+
+    python benchmarks/bench_coalescing.py --sessions 200 --tickers 20 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import DEFAULT_FIXTURE_PATH, load_fixtures
+
+from bulk_fetch import make_http_fetcher
+from shared_fetch import SharedFetcher
+
+class StubServer(ThreadingHTTPServer):
+    """Serves GET /{ticker}/{field} from fixture records in make_http_fetcher's format."""
+
+    daemon_threads = True
+
+    def __init__(self, records, latency):
+        self.records = records
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), StubHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        time.sleep(server.latency)
+        ticker, field = self.path.strip('/').split('/')
+        record = server.records.get(ticker)
+        if record is None:
+            self.send_error(404)
+            return
+        value = record.get(field, pd.DataFrame())
+        body = json.dumps(value) if field == 'info' else value.to_json(orient='split', date_format='iso')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+def simulate(server, tickers, sessions, requests_per_session, shared, seed=0):
+    """Run `sessions` concurrent sessions; returns (seconds, upstream HTTP requests, fetcher stats)."""
+    fetch = make_http_fetcher(server.url)
+    shared_fetcher = SharedFetcher(fetch=fetch) if shared else None
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity: a few tickers get most of the traffic
+    weights = 1 / np.arange(1, len(tickers) + 1)
+    picks = rng.choice(tickers, (sessions, requests_per_session), p=weights / weights.sum())
+
+    def session(picked):
+        fetcher = shared_fetcher or SharedFetcher(fetch=fetch)  # unshared: every session fetches on its own
+        for ticker in picked:
+            fetcher.get_snapshot(ticker)
+        return fetcher.stats()
+
+    server.requests = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        session_stats = list(pool.map(session, picks))
+    seconds = time.perf_counter() - start
+    return seconds, server.requests, shared_fetcher.stats() if shared else session_stats[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_PATH)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=3, help="snapshot requests per session")
+    parser.add_argument('--tickers', type=int, default=20, help="size of the hot ticker set")
+    parser.add_argument('--latency', type=float, default=0.05, help="stub response delay in seconds")
+    args = parser.parse_args()
+
+    records = load_fixtures(args.fixtures)
+    tickers = list(records)[:args.tickers]
+    server = StubServer(records, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        total = args.sessions * args.requests
+        for shared in (False, True):
+            seconds, upstream, stats = simulate(server, tickers, args.sessions, args.requests, shared)
+            label = 'shared fetcher' if shared else 'per-session'
+            print(f"{label:<15} {total:6,} snapshot requests -> {upstream:6,} stub requests in {seconds:6.2f} s")
+            if shared:
+                for kind in ('snapshot', 'field'):
+                    counters = stats[kind]
+                    print(f"{'':<15} {kind:<9} requests={counters['requests']:,} hits={counters['hits']:,} "
+                          f"coalesced={counters['coalesced']:,} upstream_calls={counters['upstream_calls']:,} "
+                          f"dedup_rate={counters['dedup_rate']:.1%}")
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
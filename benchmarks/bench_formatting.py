@@ -0,0 +1,70 @@
+"""Benchmark: per-cell statement formatting/styling vs the vectorized pipeline.
+
+Run from the repo root:  python benchmarks/bench_formatting.py [rows] [cols]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import financial_statements as fs
+
+def make_statement(rows=100, cols=100, seed=0):
+    """Synthetic statement with values across the raw/M/B buckets, both signs and NaNs."""
+    rng = np.random.default_rng(seed)
+    values = rng.choice([1, -1], (rows, cols)) * 10 ** rng.uniform(0, 12, (rows, cols))
+    values[rng.random((rows, cols)) < 0.1] = np.nan
+    periods = pd.date_range(end='2024-12-31', periods=cols, freq='D').strftime('%Y-%m-%d')
+    return pd.DataFrame(values, index=[f'Item {i}' for i in range(rows)], columns=periods)
+
+def legacy_format(df):
+    formatted = df.map(fs.format_currency)
+    styles = df.apply(lambda column: [fs.get_color_style(v) for v in column])
+    return formatted, styles
+
+def legacy_render(df):
+    formatted = df.map(fs.format_currency)
+    return formatted.style.apply(lambda x: [fs.get_color_style(v) for v in df[x.name]], axis=0)._compute().ctx
+
+def vectorized_render(df):
+    return fs.style_statement(df)._compute().ctx
+
+def best_of(fn, repeat=5, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def report(label, legacy_time, new_time):
+    print(f"{label:<28}: {new_time * 1e3:8.2f} ms  vs legacy {legacy_time * 1e3:8.2f} ms  "
+          f"({legacy_time / new_time:.1f}x)")
+
+def main(rows=100, cols=100):
+    df = make_statement(rows, cols)
+    clear = fs._FORMAT_CACHE.clear
+
+    legacy_time, (legacy_formatted, legacy_styles) = best_of(lambda: legacy_format(df))
+    cold_time, (formatted, styles) = best_of(lambda: fs.format_statement(df), setup=clear)
+    warm_time, _ = best_of(lambda: fs.format_statement(df))
+    assert formatted.equals(legacy_formatted), "formatted output differs from format_currency"
+    assert styles.equals(legacy_styles), "styles differ from get_color_style"
+
+    legacy_render_time, legacy_ctx = best_of(lambda: legacy_render(df))
+    render_time, ctx = best_of(lambda: vectorized_render(df), setup=clear)
+    assert ctx == legacy_ctx, "rendered styles differ"
+
+    print(f"{rows * cols:,} cells")
+    report("format + colors (cold cache)", legacy_time, cold_time)
+    report("format + colors (warm cache)", legacy_time, warm_time)
+    report("styled render (cold cache)", legacy_render_time, render_time)
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,123 @@
+"""Startup benchmark: cold import time of the app modules and first-render latency.
+
+Each measurement runs in a fresh interpreter, as does a reference import of
+REFERENCE_MODULE (pandas, which every app module needs anyway). Timings are
+gated as a ratio to that same-run reference, so the gate holds on slower or
+faster machines. The script exits non-zero when any timing exceeds
+--max-ratio times the reference, or when a lazily-imported dependency gets
+loaded at startup again.
+
+    python benchmarks/bench_startup.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timings are relative to a cold import of this module in the same run
+REFERENCE_MODULE = 'pandas'
+
+APP_MODULES = ['dtf', 'financial_statements', 'stock_analysis', 'valuation', 'risk_analysis',
+               'visualization', 'dcf_scenarios', 'data_cache', 'bulk_fetch', 'yield_curve',
+               'instrumentation', 'snapshot', 'shared_fetch',
+               'page_loader', 'peer_stats', 'portfolio', 'valuation_ensemble',
+               'data_provider', 'valuation_snapshots', 'page_graph', 'statement_store', 'pipeline', 'backtest']
+
+# Must not be imported until first use
+LAZY_MODULES = ['yfinance', 'plotly', 'altair', 'bs4', 'requests']
+
+IMPORT_SNIPPET = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def _run_json(args):
+    output = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_import(module, repeat):
+    runs = [_run_json(['-c', IMPORT_SNIPPET.format(root=ROOT, module=module, lazy=LAZY_MODULES)])
+            for _ in range(repeat)]
+    return statistics.median(run['seconds'] for run in runs), runs[-1]['loaded']
+
+def render_once():
+    """Run streamlit_app.py once through Streamlit's local script runner (landing page, no ticker)."""
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.local_script_runner import LocalScriptRunner
+
+    # Streamlit itself may pull in some of these (e.g. plotly); only flag what the app adds
+    preloaded = {m for m in LAZY_MODULES if m in sys.modules}
+    config.set_option('runner.postScriptGC', False)
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+
+    start = time.perf_counter()
+    runner = LocalScriptRunner(os.path.join(ROOT, 'streamlit_app.py'))
+    runner.run(timeout=60)
+    while not runner.script_stopped():
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    runner.request_stop()
+    runner.join()
+
+    if runner.script_thread_exceptions:
+        raise runner.script_thread_exceptions[0]
+    loaded = [m for m in LAZY_MODULES if m in sys.modules and m not in preloaded]
+    print(json.dumps({'seconds': elapsed, 'loaded': loaded}))
+
+def measure_first_render(repeat):
+    runs = [_run_json([os.path.abspath(__file__), '--render-once']) for _ in range(repeat)]
+    return statistics.median(run['seconds'] for run in runs), runs[-1]['loaded']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ratio', type=float, default=1.5,
+                        help=f"allowed time relative to a cold 'import {REFERENCE_MODULE}'")
+    parser.add_argument('--render-once', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render_once:
+        render_once()
+        return 0
+
+    reference, _ = measure_import(REFERENCE_MODULE, args.repeat)
+    print(f"{'import ' + REFERENCE_MODULE:<28} {reference * 1e3:8.1f} ms  reference")
+
+    results, eager = {}, {}
+    for module in APP_MODULES:
+        results[f'import {module}'], eager[f'import {module}'] = measure_import(module, args.repeat)
+    results['first render'], eager['first render'] = measure_first_render(args.repeat)
+
+    failed = False
+    for name, seconds in results.items():
+        ratio = seconds / reference
+        status = f"{ratio:5.2f}x reference"
+        if ratio > args.max_ratio:
+            status += '  REGRESSION'
+            failed = True
+        if eager[name]:
+            status += f"  eagerly loads {', '.join(eager[name])}"
+            failed = True
+        print(f"{name:<28} {seconds * 1e3:8.1f} ms  {status}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
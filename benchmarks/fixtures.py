@@ -0,0 +1,181 @@
+"""Offline fundamentals fixtures for the benchmarks.
+
+A fixture file is a gzipped pickle of {ticker: {field: value}} holding the
+yfinance `info` dict and the four statement frames. Record one from Yahoo
+once, then every benchmark runs against it with no network:
+
+    python benchmarks/fixtures.py record tickers.txt      # needs network + yfinance
+    python benchmarks/fixtures.py synthetic --count 300   # deterministic stand-in data
+"""
+import argparse
+import gzip
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_cache import CACHED_FIELDS
+
+DEFAULT_FIXTURE_PATH = os.path.join(ROOT, 'benchmarks', 'fixtures', 'fundamentals.pkl.gz')
+
+SECTORS = {
+    'Technology': 'Software - Infrastructure', 'Financial Services': 'Banks - Diversified',
+    'Healthcare': 'Drug Manufacturers - General', 'Industrials': 'Specialty Industrial Machinery',
+    'Energy': 'Oil & Gas Integrated', 'Utilities': 'Utilities - Regulated Electric',
+    'Consumer Defensive': 'Household & Personal Products',
+}
+
+# Statement line items, in yfinance naming; extra filler rows bring each statement to a realistic size
+INCOME_ITEMS = ['Total Revenue', 'Cost Of Revenue', 'Gross Profit', 'Operating Income', 'Interest Expense',
+                'Pretax Income', 'Tax Provision', 'Net Income', 'EBITDA', 'EBIT', 'Diluted EPS', 'Basic EPS']
+BALANCE_ITEMS = ['Total Assets', 'Current Assets', 'Cash And Cash Equivalents', 'Inventory', 'Accounts Receivable',
+                 'Total Liabilities Net Minority Interest', 'Current Liabilities', 'Total Debt',
+                 'Stockholders Equity', 'Ordinary Shares Number', 'Share Issued']
+CASHFLOW_ITEMS = ['Operating Cash Flow', 'Capital Expenditure', 'Free Cash Flow', 'Investing Cash Flow',
+                  'Financing Cash Flow', 'Repurchase Of Capital Stock', 'Cash Dividends Paid']
+STATEMENT_ROWS = {'income_stmt': (INCOME_ITEMS, 40), 'balance_sheet': (BALANCE_ITEMS, 70),
+                  'cashflow': (CASHFLOW_ITEMS, 50)}
+
+class FixtureTicker:
+    """yf.Ticker stand-in serving one fixture record (no network, no cache)."""
+
+    def __init__(self, ticker, record):
+        self.ticker = ticker
+        self._record = record
+
+    def data_timestamp(self, fields=CACHED_FIELDS):
+        return 'fixture'
+
+    @property
+    def info(self):
+        return self._record['info']
+
+    @property
+    def financials(self):
+        return self._record['financials']
+
+    @property
+    def cashflow(self):
+        return self._record['cashflow']
+
+    @property
+    def balance_sheet(self):
+        return self._record['balance_sheet']
+
+    @property
+    def income_stmt(self):
+        return self._record['income_stmt']
+
+    # Fixtures recorded before quarterly statements were cached have none
+    @property
+    def quarterly_income_stmt(self):
+        return self._record.get('quarterly_income_stmt', pd.DataFrame())
+
+    @property
+    def quarterly_balance_sheet(self):
+        return self._record.get('quarterly_balance_sheet', pd.DataFrame())
+
+    @property
+    def quarterly_cashflow(self):
+        return self._record.get('quarterly_cashflow', pd.DataFrame())
+
+def _statement(rng, items, rows, periods, scale):
+    names = items + [f'{items[0]} Detail {i}' for i in range(rows - len(items))]
+    values = scale * rng.uniform(-0.2, 1.0, (rows, 1)) * rng.uniform(0.8, 1.2, (rows, len(periods)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=names, columns=periods)
+
+def synthetic_record(rng, ticker, periods=4, quarters=8):
+    """One ticker's info and statements with realistic magnitudes and missing values."""
+    sector = list(SECTORS)[rng.integers(len(SECTORS))]
+    revenue = 10 ** rng.uniform(8, 11.5)
+    shares = 10 ** rng.uniform(7, 10)
+    price = rng.uniform(5, 500)
+    columns = pd.DatetimeIndex(pd.date_range(end='2024-12-31', periods=periods, freq='YE')[::-1])
+
+    statements = {name: _statement(rng, items, rows, columns, revenue)
+                  for name, (items, rows) in STATEMENT_ROWS.items()}
+    statements['balance_sheet'].loc['Ordinary Shares Number'] = shares
+    statements['cashflow'].loc['Free Cash Flow'] = revenue * rng.uniform(-0.05, 0.25, periods)
+
+    info = {
+        'longName': f'{ticker} Holdings', 'sector': sector, 'industry': SECTORS[sector], 'country': 'United States',
+        'currentPrice': price, 'marketCap': price * shares, 'sharesOutstanding': shares,
+        'beta': rng.uniform(0.3, 2.2), 'trailingPE': rng.uniform(5, 60), 'forwardPE': rng.uniform(5, 50),
+        'pegRatio': rng.uniform(0.5, 3), 'priceToBook': rng.uniform(0.5, 15),
+        'dividendYield': rng.uniform(0, 0.06), 'payoutRatio': rng.uniform(0, 1.2),
+        'fiftyTwoWeekHigh': price * rng.uniform(1, 1.5), 'fiftyTwoWeekLow': price * rng.uniform(0.5, 1),
+        'totalRevenue': revenue, 'totalDebt': revenue * rng.uniform(0, 1.5), 'totalCash': revenue * rng.uniform(0, 0.5),
+        'totalAssets': revenue * rng.uniform(0.8, 3), 'totalCurrentLiabilities': revenue * rng.uniform(0.1, 0.6),
+        'inventory': revenue * rng.uniform(0, 0.2), 'netReceivables': revenue * rng.uniform(0, 0.3),
+        'freeCashflow': revenue * rng.uniform(-0.05, 0.25), 'operatingCashflow': revenue * rng.uniform(0, 0.3),
+        'netIncome': revenue * rng.uniform(-0.05, 0.2), 'grossMargins': rng.uniform(0.1, 0.8),
+        'operatingMargins': rng.uniform(-0.05, 0.4), 'profitMargins': rng.uniform(-0.05, 0.3),
+        'revenueGrowth': rng.uniform(-0.1, 0.3), 'earningsGrowth': rng.uniform(-0.2, 0.4),
+        'returnOnEquity': rng.uniform(-0.1, 0.4), 'returnOnAssets': rng.uniform(-0.05, 0.2),
+        'currentRatio': rng.uniform(0.5, 3), 'quickRatio': rng.uniform(0.3, 2.5),
+        'debtToEquity': rng.uniform(0, 3), 'effectiveTaxRate': rng.uniform(0.1, 0.3),
+    }
+    quarter_ends = pd.DatetimeIndex(pd.date_range(end='2024-12-31', periods=quarters, freq='QE')[::-1])
+    for name, (items, rows) in STATEMENT_ROWS.items():
+        scale = revenue if name == 'balance_sheet' else revenue / 4
+        statements[f'quarterly_{name}'] = _statement(rng, items, rows, quarter_ends, scale)
+    statements['quarterly_cashflow'].loc['Free Cash Flow'] = revenue / 4 * rng.uniform(-0.05, 0.25, quarters)
+    return {'info': info, 'financials': statements['income_stmt'].copy(), **statements}
+
+def synthetic_fixtures(count=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f'SYN{i:04d}': synthetic_record(rng, f'SYN{i:04d}') for i in range(count)}
+
+def record_fixtures(tickers, path=DEFAULT_FIXTURE_PATH, **fetch_kwargs):
+    """Fetch every cached field for `tickers` from Yahoo and save them as a fixture file."""
+    from bulk_fetch import bulk_fetch
+
+    stocks, errors = bulk_fetch(tickers, **fetch_kwargs)
+    records = {ticker: {field: getattr(stock, field) for field in CACHED_FIELDS}
+               for ticker, stock in stocks.items() if ticker not in errors}
+    save_fixtures(records, path)
+    return records, errors
+
+def save_fixtures(records, path=DEFAULT_FIXTURE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, 'wb') as f:
+        pickle.dump(records, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_fixtures(path=DEFAULT_FIXTURE_PATH):
+    """Recorded fixtures from `path`, or deterministic synthetic ones when none were recorded."""
+    if path and os.path.exists(path):
+        with gzip.open(path, 'rb') as f:
+            return pickle.load(f)
+    return synthetic_fixtures()
+
+def fixture_universe(records, size):
+    """`size` FixtureTickers cycling through the records, each under a distinct symbol."""
+    names = list(records)
+    return [FixtureTicker(f'{names[i % len(names)]}.{i // len(names)}', records[names[i % len(names)]])
+            for i in range(size)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or generate benchmark fixtures")
+    parser.add_argument('mode', choices=['record', 'synthetic'])
+    parser.add_argument('tickers', nargs='?', help="ticker file for 'record' (one per line)")
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--output', default=DEFAULT_FIXTURE_PATH)
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        from pipeline import read_tickers
+
+        records, errors = record_fixtures(read_tickers(args.tickers), args.output)
+        print(f"Recorded {len(records)} tickers to {args.output} ({len(errors)} failed)")
+    else:
+        save_fixtures(synthetic_fixtures(args.count), args.output)
+        print(f"Wrote {args.count} synthetic tickers to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import contextvars
+import io
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_cache import CACHED_FIELDS, CachedTicker
+from instrumentation import FETCH, count, span
+
+DEFAULT_TIMEOUT = 10
+
+# Process-wide ceiling on tickers fetched from Yahoo per second (bursts up to twice that).
+# A ticker's fields share one token (see data_provider.TICKER_CHARGE_WINDOW), so a cold
+# 500-ticker watchlist is throttled to about 50 s whatever the number of fields.
+DEFAULT_RATE_LIMIT = float(os.environ.get('FETCH_RATE_LIMIT', 10))
+
+# HTTP statuses worth retrying: rate limited or a server-side failure
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter: `rate` requests/second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Process-wide token bucket in front of Yahoo, charged once per ticker (DEFAULT_RATE_LIMIT per second)."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(DEFAULT_RATE_LIMIT, 2 * DEFAULT_RATE_LIMIT)
+        return _rate_limiter
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session(pool_size=32):
+    """Process-wide requests session with a pooled connection adapter."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def is_transient(error):
+    """Whether a failed fetch may succeed on retry: timeouts, dropped connections, 429 and 5xx.
+
+    Anything else (404, an unknown ticker, a missing field) fails the same
+    way every time.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    # requests and yfinance are only checked once something has imported them
+    requests = sys.modules.get('requests')
+    if requests is not None and isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    return type(error).__name__ == 'YFRateLimitError'
+
+def call_with_retry(fetch, retries=3, backoff=0.5, rate_limiter=None):
+    """Call fetch(), retrying transient failures (see is_transient) with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return fetch()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            count('fetch_retries')
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+def make_http_fetcher(base_url, session=None, timeout=DEFAULT_TIMEOUT):
+    """Fetcher that reads fields from a JSON HTTP endpoint: GET {base_url}/{ticker}/{field}.
+
+    `info` is returned as a dict and statements as DataFrames (pandas 'split'
+    orient), which lets bulk_fetch run against a local stub server.
+    """
+    session = session or get_http_session()
+
+    def fetch(ticker, field):
+        count('network_calls')
+        with span(f'http {field}', FETCH, ticker=ticker):
+            response = session.get(f"{base_url.rstrip('/')}/{ticker}/{field}", timeout=timeout)
+        response.raise_for_status()
+        if field == 'info':
+            return response.json()
+        return pd.read_json(io.StringIO(response.text), orient='split')
+
+    return fetch
+
+def bulk_fetch(tickers, fields=CACHED_FIELDS, max_workers=16, rate_limiter=None, retries=3, backoff=0.5,
+               fetch=None, cache=None):
+    """Load `fields` for many tickers concurrently.
+
+    Every (ticker, field) pair is one task on a bounded thread pool, retried
+    independently on transient errors. By default fields go through the
+    fundamentals cache; pass `fetch(ticker, field)` to read from elsewhere.
+    Yahoo requests are throttled by the process-wide limiter (see
+    get_rate_limiter) while cache hits are not; `rate_limiter` additionally
+    throttles every task of this call.
+
+    Returns (stocks, errors): CachedTicker objects with the fetched fields
+    already loaded, and a {ticker: {field: exception}} dict of failures.
+    """
+    stocks = {ticker: CachedTicker(ticker, cache) for ticker in dict.fromkeys(t.upper() for t in tickers)}
+    errors = {}
+
+    def load(stock, field):
+        if fetch is None:
+            return call_with_retry(lambda: getattr(stock, field), retries, backoff, rate_limiter)
+        value = call_with_retry(lambda: fetch(stock.ticker, field), retries, backoff, rate_limiter)
+        stock._values[field] = value
+        return value
+
+    # Each task runs in a copy of the caller's context so spans land in the caller's tracer
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(contextvars.copy_context().run, load, stock, field): (stock.ticker, field)
+                   for stock in stocks.values() for field in fields}
+        for future in as_completed(futures):
+            ticker, field = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                errors.setdefault(ticker, {})[field] = e
+
+    return stocks, errors
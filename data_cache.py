@@ -0,0 +1,243 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from data_provider import get_data_provider
+from instrumentation import count
+
+# Ticker attributes the analysis modules read
+CACHED_FIELDS = ('info', 'financials', 'cashflow', 'balance_sheet', 'income_stmt',
+                 'quarterly_income_stmt', 'quarterly_balance_sheet', 'quarterly_cashflow')
+
+# Time-to-live per field in seconds: quotes go stale fast, annual statements rarely change
+FIELD_TTLS = {
+    'info': 15 * 60,
+    'financials': 7 * 24 * 3600,
+    'cashflow': 7 * 24 * 3600,
+    'balance_sheet': 7 * 24 * 3600,
+    'income_stmt': 7 * 24 * 3600,
+    'quarterly_income_stmt': 24 * 3600,
+    'quarterly_balance_sheet': 24 * 3600,
+    'quarterly_cashflow': 24 * 3600,
+}
+
+# Hits record their access time in memory; the buffer is written when it reaches this
+# many entries, this many seconds after the last write, or before an insert evicts
+TOUCH_FLUSH_SIZE = 1024
+TOUCH_FLUSH_INTERVAL = 30
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'FUNDAMENTALS_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fundamentals_cache.sqlite'))
+
+class FundamentalsCache:
+    """SQLite-backed cache of per-ticker info dicts and statement frames.
+
+    Entries expire per field (see FIELD_TTLS) and the least recently used
+    entries are evicted once max_entries or max_bytes is exceeded. Access
+    times of hits are buffered (see TOUCH_FLUSH_SIZE), so a warm read is a
+    single SELECT rather than a write.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttls=None, max_entries=20_000, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.ttls = dict(FIELD_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # (ticker, field) -> last access not yet written
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' ticker TEXT NOT NULL, field TEXT NOT NULL, fetched_at REAL NOT NULL,'
+            ' last_access REAL NOT NULL, size INTEGER NOT NULL, payload BLOB NOT NULL,'
+            ' PRIMARY KEY (ticker, field))')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self._conn.commit()
+
+    def get(self, ticker, field):
+        """Return the cached value, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at, payload FROM entries WHERE ticker = ? AND field = ?',
+                                     (ticker, field)).fetchone()
+            if row is None or now - row[0] > self.ttls.get(field, 0):
+                self.misses += 1
+                count('cache_misses')
+                return None
+            self._touched[ticker, field] = now
+            if len(self._touched) >= TOUCH_FLUSH_SIZE or time.monotonic() - self._flushed_at >= TOUCH_FLUSH_INTERVAL:
+                self._flush_touches()
+                self._conn.commit()
+            self.hits += 1
+        count('cache_hits')
+        return pickle.loads(row[1])
+
+    def fetched_at(self, ticker, field):
+        """Timestamp of the cached value (None if not cached)."""
+        with self._lock:
+            row = self._conn.execute('SELECT fetched_at FROM entries WHERE ticker = ? AND field = ?',
+                                     (ticker, field)).fetchone()
+        return row[0] if row else None
+
+    def put(self, ticker, field, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._touched.pop((ticker, field), None)
+            self._conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                               (ticker, field, now, now, len(payload), payload))
+            self._flush_touches()
+            self._evict()
+            self._conn.commit()
+
+    def get_or_fetch(self, ticker, field, fetch):
+        """Serve from cache, otherwise call fetch() and store its result."""
+        value = self.get(ticker, field)
+        if value is None:
+            value = fetch()
+            self.put(ticker, field, value)
+        return value
+
+    def _flush_touches(self):
+        """Write buffered access times (caller holds the lock and commits)."""
+        if self._touched:
+            self._conn.executemany('UPDATE entries SET last_access = ? WHERE ticker = ? AND field = ?',
+                                   [(at, ticker, field) for (ticker, field), at in self._touched.items()])
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    def _evict(self):
+        """Drop least recently used entries until both size limits hold."""
+        entries, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT ticker, field, size FROM entries ORDER BY last_access').fetchall()
+        for ticker, field, size in rows:
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE ticker = ? AND field = ?', (ticker, field))
+            entries -= 1
+            total -= size
+
+    def invalidate(self, ticker, field=None):
+        with self._lock:
+            if field is None:
+                self._conn.execute('DELETE FROM entries WHERE ticker = ?', (ticker,))
+            else:
+                self._conn.execute('DELETE FROM entries WHERE ticker = ? AND field = ?', (ticker, field))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.commit()
+            self._touched.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters plus current size of the store."""
+        with self._lock:
+            entries, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': total,
+        }
+
+class CachedTicker:
+    """Drop-in stand-in for yf.Ticker that reads fundamentals through a FundamentalsCache.
+
+    The upstream (see data_provider) is only called on a cache miss, so a
+    warm cache serves every field without touching the network. Providers
+    with `cached = False` (replay) are read directly. A fetched `info`
+    also updates the ticker's peer statistics (PeerStats.observe).
+    """
+
+    def __init__(self, ticker, cache=None):
+        self.ticker = ticker.upper()
+        self._cache = cache or get_cache()
+        self._values = {}
+
+    def _fetch(self, provider, field):
+        value = provider.fetch(self.ticker, field)
+        if field == 'info':
+            from peer_stats import get_peer_stats  # pandas-heavy; only needed once something is fetched
+
+            get_peer_stats().observe(self.ticker, value)
+        return value
+
+    def _get(self, field):
+        # Memoize per instance, like yf.Ticker does, so repeated reads in one render stay in memory
+        if field not in self._values:
+            provider = get_data_provider()
+            if provider.cached:
+                self._values[field] = self._cache.get_or_fetch(self.ticker, field,
+                                                               lambda: self._fetch(provider, field))
+            else:
+                self._values[field] = self._fetch(provider, field)
+        return self._values[field]
+
+    def data_timestamp(self, fields=CACHED_FIELDS):
+        """Latest fetch time among the cached fields (None if none are cached)."""
+        timestamps = [self._cache.fetched_at(self.ticker, field) for field in fields]
+        timestamps = [ts for ts in timestamps if ts is not None]
+        return max(timestamps) if timestamps else None
+
+    @property
+    def info(self):
+        return self._get('info')
+
+    @property
+    def financials(self):
+        return self._get('financials')
+
+    @property
+    def cashflow(self):
+        return self._get('cashflow')
+
+    @property
+    def balance_sheet(self):
+        return self._get('balance_sheet')
+
+    @property
+    def income_stmt(self):
+        return self._get('income_stmt')
+
+    @property
+    def quarterly_income_stmt(self):
+        return self._get('quarterly_income_stmt')
+
+    @property
+    def quarterly_balance_sheet(self):
+        return self._get('quarterly_balance_sheet')
+
+    @property
+    def quarterly_cashflow(self):
+        return self._get('quarterly_cashflow')
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide default cache."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FundamentalsCache()
+        return _default_cache
+
+def get_cached_ticker(ticker):
+    return CachedTicker(ticker)
@@ -0,0 +1,241 @@
+"""Pluggable upstream for fundamentals and Treasury rates: live, recording or replay.
+
+Everything that leaves the process (Yahoo fields behind CachedTicker and
+the Treasury yield-curve download) goes through the process-wide provider:
+
+- LiveProvider: Yahoo via yfinance and treasury.gov (the default).
+- RecordingProvider: live, plus every response written to a gzip snapshot.
+- ReplayProvider: serves recorded snapshots only, with no network access.
+
+Select one with DATA_PROVIDER=live|record|replay and DATA_SNAPSHOT_PATH
+(default data/snapshots), or call set_data_provider(). A replay reads the
+yield curve recorded under the snapshot directory and never writes the
+live one. Record a universe and replay it:
+
+    python data_provider.py tickers.txt
+    DATA_PROVIDER=replay streamlit run streamlit_app.py
+"""
+import argparse
+import gzip
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import FETCH, count, span
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ('live', 'record', 'replay')
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    'DATA_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshots'))
+
+# Fields of one ticker requested within this many seconds share one rate-limit token
+TICKER_CHARGE_WINDOW = 60
+
+class SnapshotMissing(LookupError):
+    """A replayed request that was never recorded."""
+
+class LiveProvider:
+    """Yahoo Finance fields and treasury.gov yield curves."""
+
+    # Responses go through the on-disk fundamentals cache
+    cached = True
+
+    def __init__(self, max_tickers=1024):
+        self.max_tickers = max_tickers
+        # ticker -> [yf.Ticker, time of its last rate-limit charge]; reused so related fields share Yahoo's requests
+        self._tickers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ticker(self, ticker):
+        """The shared yf.Ticker and whether this request starts a new charge (see TICKER_CHARGE_WINDOW)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tickers.get(ticker)
+            if entry is None:
+                import yfinance as yf  # only needed for live requests
+                entry = self._tickers[ticker] = [yf.Ticker(ticker), None]
+                if len(self._tickers) > self.max_tickers:
+                    self._tickers.popitem(last=False)
+            else:
+                self._tickers.move_to_end(ticker)
+            charge = entry[1] is None or now - entry[1] >= TICKER_CHARGE_WINDOW
+            if charge:
+                entry[1] = now
+        return entry[0], charge
+
+    def fetch(self, ticker, field):
+        from bulk_fetch import get_rate_limiter  # bulk_fetch imports this module via data_cache
+
+        live, charge = self._ticker(ticker)
+        if charge:
+            get_rate_limiter().acquire()
+        count('network_calls')
+        with span(f'yahoo {field}', FETCH, ticker=ticker):
+            return getattr(live, field)
+
+    def treasury_year(self, year):
+        from yield_curve import fetch_treasury_year
+
+        return fetch_treasury_year(year)
+
+def _snapshot_path(root, kind, key, name):
+    return os.path.join(root, kind, str(key), f'{name}.pkl.gz')
+
+def curve_snapshot_path(root=DEFAULT_SNAPSHOT_PATH):
+    """Merged yield-curve CSV stored next to the recorded Treasury years (read by replays)."""
+    return os.path.join(root, 'yield_curve.csv')
+
+def write_snapshot(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so concurrent readers never see a partial file
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def read_snapshot(path):
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+class RecordingProvider:
+    """Wraps a provider and writes every successful response to a snapshot under `root`.
+
+    Layout: fundamentals/<TICKER>/<field>.pkl.gz and treasury/<year>/curve.pkl.gz.
+    Requests bypass the fundamentals cache so that every response is
+    recorded. Failed requests are not (replay then raises SnapshotMissing).
+    """
+
+    cached = False
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_PATH, inner=None):
+        self.root = root
+        self.inner = inner or LiveProvider()
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def _record(self, path, value):
+        write_snapshot(path, value)
+        with self._lock:
+            self.recorded += 1
+        return value
+
+    def fetch(self, ticker, field):
+        return self._record(_snapshot_path(self.root, 'fundamentals', ticker.upper(), field),
+                            self.inner.fetch(ticker, field))
+
+    def treasury_year(self, year):
+        return self._record(_snapshot_path(self.root, 'treasury', year, 'curve'), self.inner.treasury_year(year))
+
+class ReplayProvider:
+    """Serves snapshots recorded by RecordingProvider; never touches the network.
+
+    Decoded snapshots are kept in a bounded in-memory LRU, so repeated
+    requests cost a dict lookup. Responses bypass the fundamentals cache
+    (`cached = False`), which keeps replayed data out of the live cache.
+    """
+
+    cached = False
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_PATH, max_entries=100_000):
+        self.root = root
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, path):
+        with self._lock:
+            value = self._entries.get(path)
+            if value is not None:
+                self._entries.move_to_end(path)
+                return value
+        try:
+            value = read_snapshot(path)
+        except FileNotFoundError:
+            raise SnapshotMissing(f"no recorded snapshot at {path}") from None
+        with self._lock:
+            self._entries[path] = value
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def fetch(self, ticker, field):
+        count('replayed_calls')
+        return self._load(_snapshot_path(self.root, 'fundamentals', ticker.upper(), field))
+
+    def treasury_year(self, year):
+        return self._load(_snapshot_path(self.root, 'treasury', year, 'curve'))
+
+    def tickers(self):
+        """Tickers with at least one recorded field."""
+        directory = os.path.join(self.root, 'fundamentals')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def treasury_years(self):
+        """Years with a recorded Treasury yield curve."""
+        directory = os.path.join(self.root, 'treasury')
+        return sorted(int(year) for year in os.listdir(directory)) if os.path.isdir(directory) else []
+
+def make_provider(kind, root=DEFAULT_SNAPSHOT_PATH):
+    if kind == 'live':
+        return LiveProvider()
+    if kind == 'record':
+        return RecordingProvider(root)
+    if kind == 'replay':
+        return ReplayProvider(root)
+    raise ValueError(f"unknown data provider {kind!r}, choose from {PROVIDERS}")
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_data_provider():
+    """Process-wide provider, chosen by DATA_PROVIDER (default 'live')."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = make_provider(os.environ.get('DATA_PROVIDER', 'live'))
+            logger.info("Data provider: %s", type(_provider).__name__)
+        return _provider
+
+def set_data_provider(provider):
+    """Replace the process-wide provider (e.g. a ReplayProvider in a load test); returns the previous one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
+
+def main(argv=None):
+    from bulk_fetch import bulk_fetch
+    from data_cache import CACHED_FIELDS
+    from pipeline import read_tickers
+    from yield_curve import DEFAULT_START_YEAR, YieldCurveService
+
+    parser = argparse.ArgumentParser(description="Record fundamentals and Treasury yield curves for offline replay")
+    parser.add_argument('tickers', help="text file with one ticker per line, or CSV with a 'ticker' column")
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT_PATH, help="snapshot directory")
+    parser.add_argument('--fields', nargs='+', choices=CACHED_FIELDS, default=list(CACHED_FIELDS))
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--start-year', type=int, default=DEFAULT_START_YEAR,
+                        help="first year of yield curve to record")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    recorder = RecordingProvider(args.output)
+    set_data_provider(recorder)
+    _, errors = bulk_fetch(read_tickers(args.tickers), fields=args.fields, max_workers=args.workers)
+    for ticker, failed in errors.items():
+        logger.warning("Not recorded %s: %s", ticker, ", ".join(sorted(failed)))
+
+    # A fresh service (no stored curve) fetches, and so records, the full history
+    service = YieldCurveService(path=curve_snapshot_path(args.output), start_year=args.start_year)
+    if not service.refresh():
+        logger.warning("Yield curve not recorded: %s", service.last_error)
+    logger.info("Recorded %d responses to %s", recorder.recorded, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dtf import batch_advanced_dcf, calculate_wacc, get_dcf_inputs
+from financial_statements import ttm_value
+from instrumentation import traced
+
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+def slider_axis(start, stop, step):
+    """Grid axis with the same values a Streamlit slider produces for (start, stop, step)."""
+    count = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(count), 10)
+
+def axis_index(axis, value):
+    """Index of the grid point closest to a slider value."""
+    return int(np.abs(np.asarray(axis) - value).argmin())
+
+def dcf_sensitivity_grid(latest_fcf, net_debt, shares_outstanding, short_term_growths, waccs,
+                         long_term_growths, years_short=5, years_total=10):
+    """Evaluate the DCF over the full short-growth x WACC x terminal-growth grid.
+
+    Returns (fair_prices, projected_fcfs) with shapes (S, W, L) and
+    (S, W, L, years_total), so any slider combination is a plain index lookup.
+    """
+    short_term_growths = np.asarray(short_term_growths, dtype=float)
+    waccs = np.asarray(waccs, dtype=float)
+    long_term_growths = np.asarray(long_term_growths, dtype=float)
+    shape = (len(short_term_growths), len(waccs), len(long_term_growths))
+
+    sg, w, lg = np.meshgrid(short_term_growths, waccs, long_term_growths, indexing='ij')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fair_prices, projected_fcfs = batch_advanced_dcf(latest_fcf, sg.ravel(), lg.ravel(), w.ravel(),
+                                                         net_debt, shares_outstanding,
+                                                         years_short, years_total)
+
+    # A terminal growth at or above WACC has no finite Gordon value
+    fair_prices[lg.ravel() >= w.ravel()] = np.nan
+
+    return fair_prices.reshape(shape), projected_fcfs.reshape(shape + (years_total,))
+
+def _monte_carlo_chunk(args):
+    """Draw one chunk of parameter samples and value them (runs in a worker process)."""
+    (seed, n_samples, latest_fcf, net_debt, shares_outstanding,
+     short_term_growth, long_term_growth, wacc,
+     short_term_growth_std, long_term_growth_std, wacc_std,
+     years_short, years_total) = args
+    rng = np.random.default_rng(seed)
+
+    sg = rng.normal(short_term_growth, short_term_growth_std, n_samples)
+    lg = rng.normal(long_term_growth, long_term_growth_std, n_samples)
+    w = rng.normal(wacc, wacc_std, n_samples)
+
+    # Keep only economically meaningful draws
+    valid = (sg > -1) & (lg > -1) & (w > 0) & (w > lg)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        fair_prices, _ = batch_advanced_dcf(latest_fcf, sg[valid], lg[valid], w[valid],
+                                            net_debt, shares_outstanding, years_short, years_total)
+    # Zero shares or an overflowing terminal value give no usable price
+    return fair_prices[np.isfinite(fair_prices)]
+
+@traced()
+def monte_carlo_dcf(latest_fcf, net_debt, shares_outstanding, short_term_growth, long_term_growth, wacc,
+                    n_samples=100_000, short_term_growth_std=0.03, long_term_growth_std=0.005, wacc_std=0.01,
+                    seed=None, processes=None, chunk_size=50_000, percentiles=DEFAULT_PERCENTILES,
+                    years_short=5, years_total=10):
+    """Monte Carlo DCF: sample growth, terminal growth and WACC around the given point.
+
+    Samples are drawn in fixed-size chunks, each with its own child seed, so the
+    result for a given seed is the same whether or not a process pool is used.
+    Set processes to run the chunks across a ProcessPoolExecutor. Draws
+    without a finite fair price are dropped; when none is left the
+    statistics are NaN and valid_samples is 0.
+    """
+    if n_samples < 1 or chunk_size < 1:
+        raise ValueError(f"n_samples and chunk_size must be at least 1, got {n_samples} and {chunk_size}")
+    child_seeds = np.random.SeedSequence(seed).spawn(-(-n_samples // chunk_size))
+    chunks = []
+    for i, child_seed in enumerate(child_seeds):
+        size = min(chunk_size, n_samples - i * chunk_size)
+        chunks.append((child_seed, size, latest_fcf, net_debt, shares_outstanding,
+                       short_term_growth, long_term_growth, wacc,
+                       short_term_growth_std, long_term_growth_std, wacc_std,
+                       years_short, years_total))
+
+    if processes and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_monte_carlo_chunk, chunks))
+    else:
+        results = [_monte_carlo_chunk(chunk) for chunk in chunks]
+
+    fair_prices = np.concatenate(results)
+    if len(fair_prices):
+        values = np.percentile(fair_prices, percentiles)
+        mean, std = float(fair_prices.mean()), float(fair_prices.std())
+    else:
+        values, mean, std = np.full(len(percentiles), np.nan), np.nan, np.nan
+    return {
+        'fair_prices': fair_prices,
+        'percentiles': dict(zip(percentiles, values)),
+        'mean': mean,
+        'std': std,
+        'valid_samples': len(fair_prices),
+        'total_samples': n_samples,
+    }
+
+@traced()
+def build_dcf_scenarios(stock, risk_free_rate, short_growth_axis, long_growth_axis, premium_axis,
+                        default_premium=0.06, default_short_growth=0.1, default_long_growth=0.02,
+                        fcf_basis='annual'):
+    """Everything the DCF sliders can select, computed once per ticker and risk-free rate.
+
+    WACC is evaluated for every premium on premium_axis and the DCF for the
+    full grid; the Monte Carlo run is centred on the default assumptions.
+    fcf_basis picks the starting FCF (see dtf.get_dcf_inputs).
+    """
+    wacc_warnings = []
+    wacc_results = [calculate_wacc(stock, risk_free_rate, premium, on_error=wacc_warnings.append)
+                    for premium in premium_axis]
+    scenarios = {'wacc_warnings': list(dict.fromkeys(wacc_warnings)),
+                 'waccs': [w for w, _ in wacc_results], 'betas': [b for _, b in wacc_results]}
+
+    dcf_inputs = get_dcf_inputs(stock, fcf_basis)
+    if dcf_inputs is not None:
+        scenarios['latest_fcf'] = dcf_inputs[0]
+        # get_dcf_inputs falls back to the annual FCF without four consecutive quarters
+        ttm_available = fcf_basis == 'ttm' and ttm_value(stock, 'cash_flow', 'Free Cash Flow') is not None
+        scenarios['fcf_basis'] = 'ttm' if ttm_available else 'annual'
+        scenarios['fair_prices'], scenarios['projected_fcfs'] = dcf_sensitivity_grid(
+            *dcf_inputs, short_growth_axis, scenarios['waccs'], long_growth_axis)
+        default_wacc = scenarios['waccs'][axis_index(premium_axis, default_premium)]
+        scenarios['monte_carlo'] = monte_carlo_dcf(*dcf_inputs, default_short_growth, default_long_growth,
+                                                   default_wacc, seed=0)
+    return scenarios
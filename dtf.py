@@ -1,9 +1,19 @@
-import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
+from functools import lru_cache
 
-# Function to get industry-specific beta (simplified mapping)
-@st.cache_data
+import numpy as np
+from financial_statements import ttm_value
+from instrumentation import count, traced
+from peer_stats import get_peer_stats
+from yield_curve import get_yield_curve_service
+
+logger = logging.getLogger(__name__)
+
+# Industry beta fallback when the peer universe has too few peers for a ticker
+@lru_cache(maxsize=None)
 def get_industry_beta(industry):
     industry_betas = {
         'Technology': 1.25, 'Financial Services': 1.15, 'Healthcare': 0.95,
@@ -12,76 +22,207 @@ def get_industry_beta(industry):
     }
     return industry_betas.get(industry, industry_betas['Default'])
 
-# Function to get risk-free rate (10-year Treasury yield)
-@st.cache_data
-def get_risk_free_rate():
-    try:
-        url = "https://www.treasury.gov/resource-center/data-chart-center/interest-rates/pages/TextView.aspx?data=yield"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        table = soup.find('table', {'class': 't-chart'})
-        latest_yield = float(table.find_all('tr')[-1].find_all('td')[-1].text) / 100
-        return latest_yield
-    except:
-        return 0.03  # Default to 3% if scraping fails
-
-# Calculate WACC
-def calculate_wacc(stock, risk_free_rate, market_risk_premium=0.06):
+class RiskFreeRateUnavailable(LookupError):
+    """No Treasury observation on or before the requested date."""
+
+# Function to get risk-free rate (10-year Treasury yield), optionally point-in-time
+def get_risk_free_rate(as_of=None):
+    """10-year Treasury yield on the last observation at or before `as_of`, or None if the curve has none."""
+    return get_yield_curve_service().rate(as_of, '10 Yr')
+
+def require_risk_free_rate(as_of=None):
+    """Like get_risk_free_rate, but loads the curve synchronously when it does not cover `as_of`.
+
+    For batch jobs and background page jobs: raises RiskFreeRateUnavailable
+    instead of valuing with a missing or stale rate.
+    """
+    service = get_yield_curve_service()
+    service.ensure(as_of)
+    rate = service.rate(as_of, '10 Yr')
+    if rate is None:
+        when = 'today' if as_of is None else f'on or before {as_of}'
+        error = f": {service.last_error}" if service.last_error else ""
+        raise RiskFreeRateUnavailable(f"Risk-free rate unavailable {when}, no Treasury yield observation{error}")
+    return rate
+
+# WACC inputs that only change when the underlying info/financials change
+WaccComponents = namedtuple('WaccComponents', ['company_beta', 'industry_beta', 'total_debt',
+                                               'interest_expense', 'tax_rate', 'market_cap'])
+
+_COMPONENT_CACHE_SIZE = 1024
+_component_cache = OrderedDict()
+_component_cache_lock = threading.Lock()
+_component_stats = {'hits': 0, 'misses': 0}
+
+def _read_wacc_components(stock):
+    info = stock.info
+    financials = stock.financials
+    fallback_beta = get_industry_beta(info.get('industry', 'Default'))
+    return WaccComponents(
+        company_beta=info.get('beta', 1.0),
+        industry_beta=get_peer_stats().industry_beta(info, default=fallback_beta),
+        total_debt=info.get('totalDebt', 0),
+        interest_expense=financials.loc['Interest Expense'].iloc[0] if 'Interest Expense' in financials.index else 0,
+        tax_rate=info.get('effectiveTaxRate', 0.21),
+        market_cap=info.get('marketCap', 0),
+    )
+
+def _data_timestamp(stock):
+    # Cache-backed tickers know when their data was fetched; live tickers are assumed to change daily
+    if hasattr(stock, 'data_timestamp'):
+        return stock.data_timestamp(('info', 'financials'))
+    return date.today().isoformat()
+
+def get_wacc_components(stock):
+    """WACC inputs for a ticker, memoized by (ticker, data timestamp).
+
+    A cached entry is reused while its peer unlevered beta (the only peer
+    statistic the components read) is unchanged, so refreshing one peer
+    group does not invalidate every other ticker's components.
+    """
+    ticker = getattr(stock, 'ticker', None)
+    if ticker is None:
+        return _read_wacc_components(stock)
+
+    peers = get_peer_stats()
+    key = (ticker, _data_timestamp(stock))
+    with _component_cache_lock:
+        entry = _component_cache.get(key)
+        if entry is not None and peers.stat('unlevered_beta', *entry[1]) == entry[2]:
+            _component_cache.move_to_end(key)
+            _component_stats['hits'] += 1
+            count('wacc_cache_hits')
+            return entry[0]
+        _component_stats['misses'] += 1
+        count('wacc_cache_misses')
+
+    info = stock.info
+    peer_key = (info.get('sector'), info.get('industry'))
+    unlevered = peers.stat('unlevered_beta', *peer_key)
+    components = _read_wacc_components(stock)
+    with _component_cache_lock:
+        _component_cache[key] = (components, peer_key, unlevered)
+        _component_cache.move_to_end(key)
+        if len(_component_cache) > _COMPONENT_CACHE_SIZE:
+            _component_cache.popitem(last=False)
+    return components
+
+@lru_cache(maxsize=4096)
+def combine_wacc(components, risk_free_rate, market_risk_premium=0.06):
+    """Cheap recombination of cached components with the market inputs."""
+    adjusted_beta = (components.company_beta + components.industry_beta) / 2
+    cost_of_equity = risk_free_rate + (adjusted_beta * market_risk_premium)
+
+    total_debt = components.total_debt
+    cost_of_debt = abs(components.interest_expense / total_debt) if total_debt > 0 else 0.05
+
+    market_cap = components.market_cap
+    total_value = market_cap + total_debt
+    equity_weight = market_cap / total_value if total_value > 0 else 0.8
+    debt_weight = total_debt / total_value if total_value > 0 else 0.2
+
+    wacc = (equity_weight * cost_of_equity) + (debt_weight * cost_of_debt * (1 - components.tax_rate))
+    return wacc if wacc > 0 else 0.08, adjusted_beta
+
+def _hit_rate(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+def wacc_cache_stats():
+    """Hit/miss counters for the component cache and the recombination cache."""
+    with _component_cache_lock:
+        hits, misses, size = _component_stats['hits'], _component_stats['misses'], len(_component_cache)
+    combine = combine_wacc.cache_info()
+    return {
+        'components': {'hits': hits, 'misses': misses, 'size': size, 'hit_rate': _hit_rate(hits, misses)},
+        'combine': {'hits': combine.hits, 'misses': combine.misses, 'size': combine.currsize,
+                    'hit_rate': _hit_rate(combine.hits, combine.misses)},
+    }
+
+# Calculate WACC; on_error receives the fallback message (the app passes st.warning)
+@traced()
+def calculate_wacc(stock, risk_free_rate, market_risk_premium=0.06, on_error=logger.warning):
     try:
-        company_beta = stock.info.get('beta', 1.0)
-        industry_beta = get_industry_beta(stock.info.get('industry', 'Default'))
-        adjusted_beta = (company_beta + industry_beta) / 2
-        cost_of_equity = risk_free_rate + (adjusted_beta * market_risk_premium)
-        
-        total_debt = stock.info.get('totalDebt', 0)
-        interest_expense = stock.financials.loc['Interest Expense'].iloc[0] if 'Interest Expense' in stock.financials.index else 0
-        cost_of_debt = abs(interest_expense / total_debt) if total_debt > 0 else 0.05
-        tax_rate = stock.info.get('effectiveTaxRate', 0.21)
-        
-        market_cap = stock.info.get('marketCap', 0)
-        total_value = market_cap + total_debt
-        equity_weight = market_cap / total_value if total_value > 0 else 0.8
-        debt_weight = total_debt / total_value if total_value > 0 else 0.2
-        
-        wacc = (equity_weight * cost_of_equity) + (debt_weight * cost_of_debt * (1 - tax_rate))
-        return wacc if wacc > 0 else 0.08, adjusted_beta
+        return combine_wacc(get_wacc_components(stock), risk_free_rate, market_risk_premium)
     except Exception as e:
-        st.warning(f"WACC calculation failed: {str(e)}. Using default 8%")
+        on_error(f"WACC calculation failed: {str(e)}. Using default 8%")
         return 0.08, 1.0
 
+# Discount factors (1 + wacc) ** year, built once per distinct WACC.
+# Uses Python's pow rather than np.power so the factors are bit-identical
+# to the scalar formula (NumPy's SIMD pow can differ in the last ulp).
+def discount_factors(wacc, years_total):
+    unique_waccs, inverse = np.unique(wacc, return_inverse=True)
+    exponents = np.arange(1, years_total + 1)
+    table = np.frompyfunc(pow, 2, 1)((1 + unique_waccs)[:, None], exponents).astype(float)
+    return table[inverse.reshape(-1)]
+
+# Vectorized DCF over a batch of tickers
+def batch_advanced_dcf(latest_fcf, short_term_growth, long_term_growth, wacc, net_debt,
+                       shares_outstanding, years_short=5, years_total=10, discount=None):
+    """Project FCFs and fair prices for many tickers in one NumPy pass.
+
+    Every argument broadcasts to a 1-D array of length N. `discount` may
+    pass precomputed (N, years_total) factors for `wacc` (e.g. shared with
+    other models). Returns (fair_prices, projected_fcfs) with shapes (N,)
+    and (N, years_total).
+    """
+    latest_fcf, short_term_growth, long_term_growth, wacc, net_debt, shares_outstanding = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(x, dtype=float)) for x in
+          (latest_fcf, short_term_growth, long_term_growth, wacc, net_debt, shares_outstanding)))
+
+    # Growth-fade matrix: flat short-term growth, then a linear fade to long-term growth
+    years = np.arange(years_total)
+    fade_steps = (years - years_short + 1)[years_short:]
+    growth = np.empty((len(latest_fcf), years_total))
+    growth[:, :years_short] = short_term_growth[:, None]
+    growth[:, years_short:] = short_term_growth[:, None] - ((short_term_growth - long_term_growth)[:, None] *
+                                                            fade_steps / (years_total - years_short))
+
+    # Compound from the latest FCF (same multiplication order as a running product)
+    factors = np.concatenate([latest_fcf[:, None], 1 + growth], axis=1)
+    projected_fcfs = np.cumprod(factors, axis=1)[:, 1:]
+
+    if discount is None:
+        discount = discount_factors(wacc, years_total)
+    present_values = projected_fcfs / discount
+
+    terminal_value = projected_fcfs[:, -1] * (1 + long_term_growth) / (wacc - long_term_growth)
+    pv_terminal = terminal_value / discount[:, -1]
+
+    # Sequential sum keeps results identical to summing the yearly PVs in order
+    enterprise_value = np.cumsum(present_values, axis=1)[:, -1] + pv_terminal
+    equity_value = enterprise_value - net_debt
+    fair_prices = equity_value / shares_outstanding
+
+    return fair_prices, projected_fcfs
+
+# Starting free cash flow for the DCF: latest annual statement or trailing twelve months
+FCF_BASES = ('annual', 'ttm')
+
+# Inputs the DCF needs from a ticker: latest FCF, net debt and shares outstanding.
+# fcf_basis='ttm' sums the last four quarters and falls back to the annual FCF without them.
+def get_dcf_inputs(stock, fcf_basis='annual'):
+    latest_fcf = ttm_value(stock, 'cash_flow', 'Free Cash Flow') if fcf_basis == 'ttm' else None
+    if latest_fcf is None:
+        cash_flow = stock.cashflow.loc['Free Cash Flow'].dropna()
+        if len(cash_flow) < 1:
+            return None
+        latest_fcf = cash_flow.iloc[0]
+
+    net_debt = stock.info.get('totalDebt', 0) - stock.info.get('totalCash', 0)
+    return latest_fcf, net_debt, stock.info['sharesOutstanding']
+
 # Enhanced DCF Valuation
-def calculate_advanced_dcf(stock, short_term_growth, long_term_growth, wacc, years_short=5, years_total=10):
-    print("Inside calc advanced dcf")
-    print(stock.cashflow)
-    cash_flow = stock.cashflow.loc['Free Cash Flow'].dropna()
-    if len(cash_flow) < 1:
+@traced()
+def calculate_advanced_dcf(stock, short_term_growth, long_term_growth, wacc, years_short=5, years_total=10,
+                           fcf_basis='annual'):
+    dcf_inputs = get_dcf_inputs(stock, fcf_basis)
+    if dcf_inputs is None:
         return None, None, None
-    
-    latest_fcf = cash_flow.iloc[0]
-    projected_fcfs = []
-    present_values = []
-    current_fcf = latest_fcf
-    
-    for year in range(years_short):
-        current_fcf *= (1 + short_term_growth)
-        pv = current_fcf / ((1 + wacc) ** (year + 1))
-        projected_fcfs.append(current_fcf)
-        present_values.append(pv)
-    
-    for year in range(years_short, years_total):
-        growth_rate = short_term_growth - ((short_term_growth - long_term_growth) * 
-                                          (year - years_short + 1) / (years_total - years_short))
-        current_fcf *= (1 + growth_rate)
-        pv = current_fcf / ((1 + wacc) ** (year + 1))
-        projected_fcfs.append(current_fcf)
-        present_values.append(pv)
-    
-    terminal_value = projected_fcfs[-1] * (1 + long_term_growth) / (wacc - long_term_growth)
-    pv_terminal = terminal_value / ((1 + wacc) ** years_total)
-    
-    enterprise_value = sum(present_values) + pv_terminal
-    net_debt = stock.info.get('totalDebt', 0) - stock.info.get('totalCash', 0)
-    equity_value = enterprise_value - net_debt
-    fair_price = equity_value / stock.info['sharesOutstanding']
-    
-    return fair_price, projected_fcfs, wacc
\ No newline at end of file
+
+    latest_fcf, net_debt, shares_outstanding = dcf_inputs
+    fair_prices, projected_fcfs = batch_advanced_dcf(latest_fcf, short_term_growth, long_term_growth,
+                                                     wacc, net_debt, shares_outstanding,
+                                                     years_short, years_total)
+
+    return float(fair_prices[0]), projected_fcfs[0].tolist(), wacc
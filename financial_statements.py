@@ -1,7 +1,10 @@
 import pandas as pd
-import yfinance as yf
-import streamlit as st
 import numpy as np
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from instrumentation import RENDER, traced
 
 def format_currency(value):
     """Format currency values with B/M suffix."""
@@ -26,60 +29,234 @@ def get_color_style(value):
         return 'color: red'
     return 'color: white'
 
-def get_income_statement(stock):
-    """Get and format income statement data."""
-    # stock = yf.Ticker(ticker)
-    income_stmt = stock.income_stmt
+# Formatted output per statement frame, keyed on its contents (bounded LRU)
+_FORMAT_CACHE = OrderedDict()
+_FORMAT_CACHE_SIZE = 64
+_format_lock = threading.Lock()
 
-    if income_stmt.empty:
-        return pd.DataFrame()
-    
-    # Convert index to dates and sort columns
-    income_stmt.columns = pd.to_datetime(income_stmt.columns).strftime('%Y-%m-%d')
-    income_stmt = income_stmt.sort_index()
+def _frame_key(values, df):
+    return (hashlib.sha1(np.ascontiguousarray(values).tobytes()).hexdigest(),
+            tuple(df.index), tuple(df.columns))
 
-        # Format values
-    formatted_income_stmt = income_stmt.map(format_currency)
+def format_currency_frame(df):
+    """Vectorized format_currency: B/M/raw buckets from NumPy masks, same strings as the per-cell path."""
+    values = df.to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        billions = np.abs(values) >= 1e9
+        millions = ~billions & (np.abs(values) >= 1e6)
+    scaled = np.where(billions, values / 1e9, np.where(millions, values / 1e6, values))
+    suffix = np.select([billions, millions], ['B', 'M'], '')
+    # One C-level formatting pass over flat lists (faster than np.char.mod)
+    text = np.array(list(map('${:.2f}{}'.format, scaled.ravel().tolist(), suffix.ravel().tolist())),
+                    dtype=object).reshape(values.shape)
+    text[np.isnan(values)] = '-'
+    return pd.DataFrame(text, index=df.index, columns=df.columns)
 
-    # Store original values for coloring
-    return income_stmt, formatted_income_stmt
+def color_style_frame(df):
+    """Vectorized get_color_style: CSS color class for every cell."""
+    values = df.to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        styles = np.select([values > 0, values < 0], ['color: green', 'color: red'], 'color: white')
+    return pd.DataFrame(styles.astype(object), index=df.index, columns=df.columns)
 
+@traced(RENDER)
+def format_statement(df):
+    """Formatted strings and color styles for a statement, computed once per distinct frame."""
+    key = _frame_key(df.to_numpy(dtype=float, na_value=np.nan), df)
+    with _format_lock:
+        result = _FORMAT_CACHE.get(key)
+        if result is not None:
+            _FORMAT_CACHE.move_to_end(key)
+            return result
+    result = format_currency_frame(df), color_style_frame(df)
+    with _format_lock:
+        _FORMAT_CACHE[key] = result
+        _FORMAT_CACHE.move_to_end(key)
+        if len(_FORMAT_CACHE) > _FORMAT_CACHE_SIZE:
+            _FORMAT_CACHE.popitem(last=False)
+    return result
 
-def get_balance_sheet(stock):
-    """Get and format balance sheet data."""
-    # stock = yf.Ticker(ticker)
-    bs = stock.balance_sheet
-    
-    if bs.empty:
-        return pd.DataFrame()
-        
-    # Convert index to dates and sort columns
-    bs.columns = pd.to_datetime(bs.columns).strftime('%Y-%m-%d')
-    bs = bs.sort_index()
-    
-    # Format values
-    formatted_bs = bs.map(format_currency)
-    
-    # Store original values for coloring
-    return bs, formatted_bs
+@traced(RENDER)
+def style_statement(df):
+    """Styler showing the formatted statement colored by the sign of the raw values."""
+    formatted, styles = format_statement(df)
+    return formatted.style.apply(lambda _: styles, axis=None)
 
-def get_cash_flow(stock):
-    """Get and format cash flow statement."""
-    # stock = yf.Ticker(ticker)
-    cf = stock.cashflow
-    
-    if cf.empty:
+# Statement -> (annual field, quarterly field) on a yf.Ticker-like object
+STATEMENT_SOURCES = {
+    'income_stmt': ('income_stmt', 'quarterly_income_stmt'),
+    'balance_sheet': ('balance_sheet', 'quarterly_balance_sheet'),
+    'cash_flow': ('cashflow', 'quarterly_cashflow'),
+}
+# Flow statements sum over a period; balance sheet items are point-in-time
+FLOW_STATEMENTS = ('income_stmt', 'cash_flow')
+PERIODS = ('annual', 'quarterly', 'ttm')
+
+# Rows of history the widest rolling window looks back over (4 quarters for YoY)
+WINDOW_LOOKBACK = 4
+# Four quarters must span at most this long to be summed into a TTM value
+_MAX_TTM_SPAN = np.timedelta64(300, 'D')
+
+# Date-indexed statement histories and their rolling windows (bounded LRUs)
+_HISTORY_CACHE = OrderedDict()
+_WINDOW_CACHE = OrderedDict()
+_HISTORY_CACHE_SIZE = 256
+_history_lock = threading.Lock()
+
+def _read_only(frame):
+    # A frame over a read-only array: in-place writes raise instead of changing shared history
+    values = frame.to_numpy(dtype=float, copy=True)
+    values.flags.writeable = False
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns, copy=False)
+
+def to_history(statement):
+    """Statement (items x period columns, any order) as a float frame of periods (ascending) x items."""
+    if statement is None or statement.empty:
+        return _read_only(pd.DataFrame(np.empty((0, 0)), index=pd.DatetimeIndex([], name='period')))
+    values = statement.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    dates = pd.to_datetime(statement.columns)
+    order = np.argsort(dates.values, kind='stable')
+    return _read_only(pd.DataFrame(values.T[order], index=dates[order].rename('period'), columns=statement.index))
+
+def _history_key(stock, field):
+    ticker = getattr(stock, 'ticker', None)
+    if ticker is None:
+        return None
+    # Cache-backed tickers and snapshots know when their data was fetched; live tickers change daily
+    if hasattr(stock, 'data_timestamp'):
+        return ticker, field, stock.data_timestamp((field,))
+    return ticker, field, date.today().isoformat()
+
+def _lru_put(cache, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > _HISTORY_CACHE_SIZE:
+        cache.popitem(last=False)
+
+def statement_history(stock, statement, period='annual'):
+    """Date-indexed history (periods ascending x items) of 'income_stmt', 'balance_sheet' or 'cash_flow'.
+
+    Built once per ticker, field and data timestamp and never mutated (the
+    values are read-only); callers get a shallow copy they may relabel.
+    period='ttm' returns trailing-twelve-month values from the quarterly statement.
+    """
+    if period == 'ttm':
+        return period_windows(stock, statement, 'quarterly')['ttm']
+    annual_field, quarterly_field = STATEMENT_SOURCES[statement]
+    field = quarterly_field if period == 'quarterly' else annual_field
+    frame = getattr(stock, field, None)
+    key = _history_key(stock, field)
+    with _history_lock:
+        history = _HISTORY_CACHE.get(key) if key is not None else None
+        if history is not None:
+            _HISTORY_CACHE.move_to_end(key)
+    if history is None:
+        history = to_history(frame)
+        if key is not None:
+            with _history_lock:
+                _lru_put(_HISTORY_CACHE, key, history)
+    return history.copy(deep=False)
+
+def growth(history, periods):
+    """Period-over-period growth (x - x[-periods]) / |x[-periods]|; NaN where the base is 0 or missing."""
+    previous = history.shift(periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (history - previous) / previous.abs()
+    return result.where(np.isfinite(result.to_numpy()))
+
+def compute_windows(history, statement, period='quarterly'):
+    """Rolling computations over a date-indexed history, vectorized across all items.
+
+    Returns {'yoy', 'avg'} for annual histories and additionally
+    {'qoq', 'ttm'} for quarterly ones. 'avg' is the mean over the last
+    year (four quarters, or two annual periods). TTM sums the last four
+    quarters of flow statements (NaN unless they are consecutive and
+    complete) and is the latest quarter for the balance sheet.
+    """
+    quarterly = period == 'quarterly'
+    per_year = 4 if quarterly else 1
+    windows = {'yoy': growth(history, per_year), 'avg': history.rolling(max(per_year, 2)).mean()}
+    if quarterly:
+        windows['qoq'] = growth(history, 1)
+        if statement in FLOW_STATEMENTS:
+            dates = history.index.values
+            consecutive = np.zeros(len(dates), dtype=bool)
+            consecutive[3:] = dates[3:] - dates[:-3] <= _MAX_TTM_SPAN
+            windows['ttm'] = history.rolling(4).sum().where(np.broadcast_to(consecutive[:, None], history.shape))
+        else:
+            windows['ttm'] = history
+    return {name: _read_only(window) for name, window in windows.items()}
+
+def _same_history(old, new):
+    n = len(old)
+    return (len(new) >= n and new.columns.equals(old.columns) and new.index[:n].equals(old.index)
+            and np.array_equal(new.to_numpy()[:n], old.to_numpy(), equal_nan=True))
+
+def extend_windows(previous_history, previous_windows, history, statement, period='quarterly'):
+    """Windows for `history`, reusing `previous_windows` when it only appends new periods.
+
+    Only the new rows (plus WINDOW_LOOKBACK rows of context) are computed;
+    restated history or a changed item set falls back to a full recompute.
+    """
+    if previous_windows is None or not len(previous_history) or not _same_history(previous_history, history):
+        return compute_windows(history, statement, period)
+    n = len(previous_history)
+    if len(history) == n:
+        return previous_windows
+    start = max(0, n - WINDOW_LOOKBACK)
+    tail = compute_windows(history.iloc[start:], statement, period)
+    return {name: _read_only(pd.concat([previous_windows[name], window.iloc[n - start:]]))
+            for name, window in tail.items()}
+
+def period_windows(stock, statement, period='quarterly'):
+    """Rolling windows (see compute_windows) of a statement, updated incrementally as periods arrive."""
+    history = statement_history(stock, statement, period)
+    key = (getattr(stock, 'ticker', None), statement, period)
+    with _history_lock:
+        previous_history, previous_windows = _WINDOW_CACHE.get(key, (None, None))
+    windows = extend_windows(previous_history, previous_windows, history, statement, period)
+    if key[0] is not None and windows is not previous_windows:
+        with _history_lock:
+            _lru_put(_WINDOW_CACHE, key, (history, windows))
+    return {name: window.copy(deep=False) for name, window in windows.items()}
+
+def ttm_value(stock, statement, item):
+    """Latest trailing-twelve-month value of one line item, or None without four consecutive quarters."""
+    ttm = statement_history(stock, statement, 'ttm')
+    if item not in ttm.columns:
+        return None
+    values = ttm[item].dropna()
+    return float(values.iloc[-1]) if len(values) else None
+
+def _display_statement(history):
+    # Items as rows (sorted), periods as columns newest first, as yfinance shows them
+    statement = history.T.iloc[:, ::-1].sort_index()
+    statement.columns = statement.columns.strftime('%Y-%m-%d')
+    return statement
+
+def _load_statement(stock, statement, period):
+    history = statement_history(stock, statement, period)
+    if history.empty:
         return pd.DataFrame()
-        
-    # Convert index to dates and sort columns
-    cf.columns = pd.to_datetime(cf.columns).strftime('%Y-%m-%d')
-    cf = cf.sort_index()
-    
-    # Format values
-    formatted_cf = cf.map(format_currency)
-    
-    return cf, formatted_cf
+    display = _display_statement(history)
+    return display, format_statement(display)[0]
+
+@traced()
+def get_income_statement(stock, period='annual'):
+    """Get and format income statement data ('annual', 'quarterly' or 'ttm')."""
+    return _load_statement(stock, 'income_stmt', period)
 
+@traced()
+def get_balance_sheet(stock, period='annual'):
+    """Get and format balance sheet data ('annual', 'quarterly' or 'ttm')."""
+    return _load_statement(stock, 'balance_sheet', period)
+
+@traced()
+def get_cash_flow(stock, period='annual'):
+    """Get and format cash flow statement ('annual', 'quarterly' or 'ttm')."""
+    return _load_statement(stock, 'cash_flow', period)
+
+@traced()
 def get_financial_ratios(stock):
     """Calculate and format key financial ratios."""
     # stock = yf.Ticker(ticker)
@@ -105,17 +282,51 @@ def get_financial_ratios(stock):
         }
     }
     
-    # Convert to DataFrame
-    ratios_df = pd.DataFrame({
-        'Category': [cat for cat, metrics in ratios.items() for _ in metrics],
-        'Metric': [metric for _, metrics in ratios.items() for metric in metrics.keys()],
-        'Value': [value for _, metrics in ratios.items() for value in metrics.values()]
-    })
+    # Convert to DataFrame in a single pass over the nested dict
+    ratios_df = pd.DataFrame(
+        [(cat, metric, value) for cat, metrics in ratios.items() for metric, value in metrics.items()],
+        columns=['Category', 'Metric', 'Value']
+    )
     
     return ratios_df
 
-def display_financial_statements(stock):
-    """Display all financial statements in a tabbed interface."""
+def get_ratio_history(store, ticker):
+    """Precomputed multi-year ratio time series for a ticker from a StatementStore."""
+    history = store.ratio_history(ticker)
+    history.index = history.index.strftime('%Y-%m-%d')
+    return history.T
+
+def load_financial_statements(stock, period='annual'):
+    """Load and format every statement tab once; each entry is (result, exception)."""
+    loaders = {
+        'income_stmt': lambda stock: get_income_statement(stock, period),
+        'balance_sheet': lambda stock: get_balance_sheet(stock, period),
+        'cash_flow': lambda stock: get_cash_flow(stock, period),
+        'ratios': get_financial_ratios,
+    }
+    statements = {}
+    for name, loader in loaders.items():
+        try:
+            statements[name] = (loader(stock), None)
+        except Exception as e:
+            statements[name] = (None, e)
+    return statements
+
+def _loaded(statements, name):
+    result, error = statements[name]
+    if error is not None:
+        raise error
+    return result
+
+def display_financial_statements(stock, statements=None):
+    """Display all financial statements in a tabbed interface.
+
+    Pass the output of load_financial_statements to render without refetching.
+    """
+    import streamlit as st  # UI-only dependency; the rest of the module runs headless
+
+    if statements is None:
+        statements = load_financial_statements(stock)
     
     # Create tabs
     tab1, tab2, tab3, tab4 = st.tabs(["Income Statement","Balance Sheet", "Cash Flow", "Financial Ratios"])
@@ -123,11 +334,11 @@ def display_financial_statements(stock):
     with tab1:
         st.write("### Income Statement")
         try:
-            income_stmt, formatted_income_stmt = get_income_statement(stock)
+            income_stmt, formatted_income_stmt = _loaded(statements, 'income_stmt')
             if not income_stmt.empty:
                 # Apply color styling
                 st.dataframe(
-                    formatted_income_stmt.style.apply(lambda x: [get_color_style(v) for v in income_stmt[x.name]], axis=0),
+                    style_statement(income_stmt),
                     use_container_width=True
                 )
             else:
@@ -138,11 +349,11 @@ def display_financial_statements(stock):
     with tab2:
         st.write("### Balance Sheet")
         try:
-            bs, formatted_bs = get_balance_sheet(stock)
+            bs, formatted_bs = _loaded(statements, 'balance_sheet')
             if not bs.empty:
                 # Apply color styling
                 st.dataframe(
-                    formatted_bs.style.apply(lambda x: [get_color_style(v) for v in bs[x.name]], axis=0),
+                    style_statement(bs),
                     use_container_width=True
                 )
             else:
@@ -153,11 +364,11 @@ def display_financial_statements(stock):
     with tab3:
         st.write("### Cash Flow Statement")
         try:
-            cf, formatted_cf = get_cash_flow(stock)
+            cf, formatted_cf = _loaded(statements, 'cash_flow')
             if not cf.empty:
                 # Apply color styling
                 st.dataframe(
-                    formatted_cf.style.apply(lambda x: [get_color_style(v) for v in cf[x.name]], axis=0),
+                    style_statement(cf),
                     use_container_width=True
                 )
             else:
@@ -168,7 +379,7 @@ def display_financial_statements(stock):
     with tab4:
         st.write("### Financial Ratios")
         try:
-            ratios_df = get_financial_ratios(stock)
+            ratios_df = _loaded(statements, 'ratios')
             if not ratios_df.empty:
                 # Format and display ratios
                 st.dataframe(
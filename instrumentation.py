@@ -0,0 +1,123 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Span categories used across the app
+FETCH = 'fetch'
+COMPUTE = 'compute'
+RENDER = 'render'
+
+class Tracer:
+    """Collects timing spans and counters.
+
+    Spans are (name, category, start, duration, thread) records kept in a
+    bounded deque; counters are named integers such as network calls and
+    cache hits. Both can be summarized per name or exported as a Chrome
+    trace (chrome://tracing, Perfetto) for a timeline view.
+    """
+
+    def __init__(self, max_spans=50_000):
+        self.spans = deque(maxlen=max_spans)
+        self.counters = Counter()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category=COMPUTE, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            record = {'name': name, 'category': category, 'start': start - self._origin,
+                      'duration': end - start, 'thread': threading.get_ident(), 'args': args}
+            with self._lock:
+                self.spans.append(record)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self._origin = time.perf_counter()
+
+    def summary(self):
+        """Per-span-name latency breakdown: calls, total/mean/max ms, slowest first."""
+        import pandas as pd
+
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return pd.DataFrame(columns=['category', 'calls', 'total_ms', 'mean_ms', 'max_ms'])
+        frame = pd.DataFrame(spans)
+        frame['ms'] = frame['duration'] * 1e3
+        summary = frame.groupby(['name', 'category'])['ms'].agg(calls='count', total_ms='sum', mean_ms='mean',
+                                                                max_ms='max')
+        return summary.reset_index('category').sort_values('total_ms', ascending=False)
+
+    def to_chrome_trace(self):
+        """Trace Event Format dict: one complete ('X') event per span, counters as metadata."""
+        with self._lock:
+            spans, counters = list(self.spans), dict(self.counters)
+        pid = os.getpid()
+        events = [{'name': s['name'], 'cat': s['category'], 'ph': 'X', 'pid': pid, 'tid': s['thread'],
+                   'ts': s['start'] * 1e6, 'dur': s['duration'] * 1e6,
+                   'args': {key: str(value) for key, value in s['args'].items()}}
+                  for s in spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': counters}}
+
+    def export(self, path):
+        """Write the Chrome trace JSON to `path`."""
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+_global_tracer = Tracer()
+_current_tracer = contextvars.ContextVar('tracer', default=_global_tracer)
+
+def get_tracer():
+    """Tracer for the current context (a per-run tracer if one is active, else the process-wide one)."""
+    return _current_tracer.get()
+
+@contextmanager
+def use_tracer(tracer):
+    """Record spans and counters into `tracer` for the duration of the block.
+
+    Worker threads only see it when started through contextvars.copy_context().run.
+    """
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+def start_trace():
+    """Make a fresh tracer current for the rest of this context (e.g. one Streamlit script run)."""
+    tracer = Tracer()
+    _current_tracer.set(tracer)
+    return tracer
+
+def span(name, category=COMPUTE, **args):
+    return get_tracer().span(name, category, **args)
+
+def count(name, n=1):
+    get_tracer().count(name, n)
+
+def traced(category=COMPUTE, name=None):
+    """Decorator wrapping every call of a function in a span."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
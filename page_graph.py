@@ -0,0 +1,48 @@
+class PageGraph:
+    """Dependency-tracked, memoized page computations.
+
+    Each node declares the inputs it is keyed on and the nodes it depends on.
+    Results live in `state` (e.g. st.session_state), so they survive
+    Streamlit reruns: a node only re-executes when one of its inputs changed
+    or one of its dependencies was recomputed. Values passed as `uses` are
+    handed to the node function but are not part of its key (e.g. the
+    ticker object, keyed instead by its symbol and data version).
+    """
+
+    def __init__(self, state, namespace='_page_graph'):
+        if namespace not in state:
+            state[namespace] = {'nodes': {}, 'next_version': 0}
+        self._state = state[namespace]
+        self._memo = self._state['nodes']  # name -> (key, version, result)
+        self._nodes = {}
+        self.executed = []  # nodes recomputed during this script run
+
+    def node(self, name, inputs=(), deps=(), uses=()):
+        """Decorator registering fn(**inputs, **uses, **dep results) as node `name`."""
+        def register(fn):
+            self._nodes[name] = (fn, tuple(inputs), tuple(deps), tuple(uses))
+            return fn
+        return register
+
+    def get(self, name, **values):
+        """Result of node `name`, recomputing it (and stale dependencies) only when needed."""
+        fn, inputs, deps, uses = self._nodes[name]
+        dep_results = {dep: self.get(dep, **values) for dep in deps}
+        key = (tuple(values[i] for i in inputs), tuple(self._memo[dep][1] for dep in deps))
+
+        entry = self._memo.get(name)
+        if entry is None or entry[0] != key:
+            result = fn(**{i: values[i] for i in inputs + uses}, **dep_results)
+            # Versions are unique per graph, so dependents notice even an invalidated-then-rebuilt node
+            entry = (key, self._state['next_version'], result)
+            self._state['next_version'] += 1
+            self._memo[name] = entry
+            self.executed.append(name)
+        return entry[2]
+
+    def invalidate(self, name=None):
+        """Drop one node's memoized result, or all of them."""
+        if name is None:
+            self._memo.clear()
+        else:
+            self._memo.pop(name, None)
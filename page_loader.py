@@ -0,0 +1,87 @@
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from dcf_scenarios import build_dcf_scenarios
+from dtf import require_risk_free_rate
+from financial_statements import PERIODS, load_financial_statements
+from instrumentation import FETCH, span
+from shared_fetch import get_shared_fetcher
+from stock_analysis import get_stock_info
+from valuation import get_valuation_points
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor(max_workers=32):
+    """Process-wide pool for page jobs (survives Streamlit reruns, shared by sessions)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='page-loader')
+        return _executor
+
+def _overview(fetcher, ticker):
+    # Only needs `info`, so it lands as soon as the quote does
+    with span('info', FETCH, ticker=ticker):
+        stock = SimpleNamespace(ticker=ticker, info=fetcher.get(ticker, 'info'))
+    return {'stock_info': get_stock_info(stock), 'valuation_points': get_valuation_points(stock)}
+
+def _snapshot(fetcher, ticker):
+    with span('snapshot', FETCH, ticker=ticker):
+        return fetcher.get_snapshot(ticker)
+
+def _statements(fetcher, ticker):
+    # Every period view, so switching annual/quarterly/TTM is just a lookup
+    snapshot = _snapshot(fetcher, ticker)
+    return {period: load_financial_statements(snapshot, period) for period in PERIODS}
+
+def _scenarios(fetcher, ticker, axes, fcf_basis):
+    # Blocks this job only while the stored curve is stale; no rate fails the DCF section
+    risk_free_rate = require_risk_free_rate()
+    scenarios = build_dcf_scenarios(_snapshot(fetcher, ticker), risk_free_rate, *axes, fcf_basis=fcf_basis)
+    return dict(scenarios, risk_free_rate=risk_free_rate)
+
+PAGE_JOBS = ('overview', 'stock', 'statements', 'scenarios')
+
+def start_page_jobs(ticker, axes, fetcher=None, executor=None, fcf_basis='annual', only=PAGE_JOBS):
+    """Start every fetch/compute a page needs in parallel; returns {job name: Future}.
+
+    The jobs are independent: each pulls what it needs through the shared
+    fetcher, which coalesces overlapping fields into one upstream call,
+    so the overview is ready after the `info` fetch alone while the
+    statements and DCF scenarios wait only on the statement fields.
+    `axes` are the (short growth, long growth, premium) slider axes and
+    `fcf_basis` the DCF's starting FCF ('annual' or 'ttm'). `only` limits
+    the jobs started (e.g. when precomputed results stand in for the rest).
+    """
+    fetcher = fetcher or get_shared_fetcher()
+    executor = executor or get_executor()
+    ticker = ticker.upper()
+    jobs = {
+        'overview': (_overview, fetcher, ticker),
+        'stock': (_snapshot, fetcher, ticker),
+        'statements': (_statements, fetcher, ticker),
+        'scenarios': (_scenarios, fetcher, ticker, axes, fcf_basis),
+    }
+    # Each job runs in a copy of the caller's context so its spans land in the page's tracer
+    return {name: executor.submit(contextvars.copy_context().run, *jobs[name]) for name in only}
+
+def render_as_ready(jobs, sections):
+    """Call each section's render() as soon as all of its jobs are done, fastest first.
+
+    `sections` maps a section name to (job names, render); a section whose
+    jobs are already done (e.g. on a rerun) renders immediately. Sections
+    are rendered from the calling thread, so render() may use Streamlit.
+    """
+    pending = dict(sections)
+    while pending:
+        ready = [name for name, (needs, _) in pending.items() if all(jobs[job].done() for job in needs)]
+        if not ready:
+            waiting = {jobs[job] for needs, _ in pending.values() for job in needs if not jobs[job].done()}
+            wait(waiting, return_when=FIRST_COMPLETED)
+            continue
+        for name in ready:
+            _, render = pending.pop(name)
+            render()
@@ -0,0 +1,277 @@
+"""Sector and industry peer statistics over a universe of cached fundamentals.
+
+Builds per-sector and per-industry percentiles of the info metrics (and
+unlevered betas) that valuation points, WACC and the comparison table use
+as peer context. Build or refresh the universe with:
+
+    python peer_stats.py tickers.txt
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Info fields summarized per peer group ('unlevered_beta' is derived)
+PEER_METRICS = ['marketCap', 'trailingPE', 'forwardPE', 'pegRatio', 'priceToBook', 'dividendYield',
+                'profitMargins', 'operatingMargins', 'returnOnEquity', 'returnOnAssets', 'debtToEquity',
+                'currentRatio', 'revenueGrowth', 'earningsGrowth', 'beta', 'unlevered_beta']
+_INFO_KEYS = [key for key in PEER_METRICS if key != 'unlevered_beta'] + ['totalDebt', 'effectiveTaxRate']
+
+PEER_LEVELS = ('sector', 'industry')
+
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+STAT_NAMES = ('p10', 'p25', 'median', 'p75', 'p90')
+
+# Groups with fewer members fall back to the wider level (industry -> sector -> caller default)
+MIN_PEERS = 5
+
+DEFAULT_TAX_RATE = 0.21
+
+DEFAULT_PEER_STATS_PATH = os.environ.get(
+    'PEER_STATS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'peer_universe.parquet'))
+
+# Seconds between checks of the universe file for a rebuild (see get_peer_stats)
+RELOAD_INTERVAL = 60
+
+def unlever_beta(beta, debt, equity, tax_rate):
+    """Hamada unlevered beta, beta / (1 + (1 - t) * D/E), over arrays; NaN without a market cap."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        debt_to_equity = np.where(equity > 0, debt / equity, np.nan)
+    return beta / (1 + (1 - tax_rate) * debt_to_equity)
+
+def relever_beta(unlevered_beta, debt, equity, tax_rate):
+    debt_to_equity = debt / equity if equity > 0 else 0.0
+    return unlevered_beta * (1 + (1 - tax_rate) * debt_to_equity)
+
+def build_peer_frame(infos):
+    """Build the universe rows (ticker x sector/industry/metrics) from {ticker: info dict}."""
+    frame = pd.DataFrame.from_dict(
+        {ticker: {key: info.get(key) for key in PEER_LEVELS + tuple(_INFO_KEYS)} for ticker, info in infos.items()},
+        orient='index', columns=list(PEER_LEVELS) + _INFO_KEYS)
+    frame[_INFO_KEYS] = frame[_INFO_KEYS].apply(pd.to_numeric, errors='coerce').astype(float)
+    frame[list(PEER_LEVELS)] = frame[list(PEER_LEVELS)].fillna('Unknown').astype(str)
+    frame['unlevered_beta'] = unlever_beta(frame['beta'].to_numpy(), frame['totalDebt'].fillna(0).to_numpy(),
+                                           frame['marketCap'].to_numpy(),
+                                           frame['effectiveTaxRate'].fillna(DEFAULT_TAX_RATE).to_numpy())
+    return frame
+
+def group_stats(frame, level):
+    """Percentiles of every metric for every group in one grouped pass: group x (metric, stat)."""
+    columns = pd.MultiIndex.from_product([PEER_METRICS, STAT_NAMES]).append(pd.MultiIndex.from_tuples([('count', '')]))
+    if frame.empty:
+        return pd.DataFrame(columns=columns, dtype=float)
+    grouped = frame.groupby(level)[PEER_METRICS]
+    stats = grouped.quantile(list(PERCENTILES)).unstack()
+    stats.columns = pd.MultiIndex.from_tuples([(metric, STAT_NAMES[PERCENTILES.index(q)])
+                                               for metric, q in stats.columns])
+    stats[('count', '')] = grouped.size()
+    return stats[columns]
+
+def _to_lookup(level, stats):
+    for name, row in zip(stats.index, stats.to_numpy()):
+        values = iter(row)
+        group = {}
+        for metric, stat in stats.columns:
+            group.setdefault(metric, {})[stat] = float(next(values))
+        group['count'] = int(group.pop('count')[''])
+        yield (level, name), group
+
+class PeerStats:
+    """Per-sector and per-industry peer statistics over a universe of tickers.
+
+    `universe` holds one row per ticker; `stats[level]` the percentiles
+    of every metric per group. update() upserts refreshed tickers and
+    recomputes only the groups they are (or were) in; observe() does so
+    for a member whose info was just refetched, and reload_if_changed()
+    picks up a rebuilt universe file. Lookups read a
+    {(level, group): {metric: {stat: value}}} dict, so they are O(1).
+    `version` increases on every change so dependent caches can key on it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.universe = build_peer_frame({})
+        self.stats = {level: group_stats(self.universe, level) for level in PEER_LEVELS}
+        self.version = 0
+        self.mtime = None  # of the universe file when last loaded
+        self._lookup = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    @classmethod
+    def from_infos(cls, infos):
+        peers = cls()
+        peers.update(infos)
+        return peers
+
+    def __len__(self):
+        return len(self.universe)
+
+    def load(self, path=None):
+        """Replace the universe with the rows stored at `path` and recompute every group."""
+        path = path or self.path
+        mtime = os.path.getmtime(path)
+        universe = pd.read_parquet(path)
+        stats = {level: group_stats(universe, level) for level in PEER_LEVELS}
+        lookup = {key: group for level in PEER_LEVELS for key, group in _to_lookup(level, stats[level])}
+        with self._lock:
+            self.universe, self.stats, self._lookup = universe, stats, lookup
+            self.mtime = mtime
+            self.version += 1
+
+    def reload_if_changed(self):
+        """Reload when the universe file was rewritten (e.g. by the refresh CLI); returns whether it was."""
+        if not self.path or not os.path.exists(self.path) or os.path.getmtime(self.path) == self.mtime:
+            return False
+        self.load()
+        logger.info("Reloaded peer universe from %s: %d tickers", self.path, len(self))
+        return True
+
+    def update(self, infos):
+        """Upsert {ticker: info} (or prebuilt universe rows) and recompute the affected groups.
+
+        Tickers whose rows did not change are ignored, so refreshing an
+        unchanged ticker keeps `version` (and caches keyed on it) intact.
+        """
+        rows = infos if isinstance(infos, pd.DataFrame) else build_peer_frame(infos)
+        with self._lock:
+            universe = self.universe
+            known = rows.index.intersection(universe.index)
+            if len(known):
+                unchanged = (rows.loc[known] == universe.loc[known, rows.columns]) \
+                    | (rows.loc[known].isna() & universe.loc[known, rows.columns].isna())
+                rows = rows.drop(known[unchanged.all(axis=1).to_numpy()])
+            if rows.empty:
+                return False
+            previous = universe[universe.index.isin(rows.index)]
+            universe = pd.concat([universe[~universe.index.isin(rows.index)], rows]) if len(universe) else rows
+
+            stats, lookup = dict(self.stats), dict(self._lookup)
+            for level in PEER_LEVELS:
+                touched = set(rows[level]) | set(previous[level])
+                recomputed = group_stats(universe[universe[level].isin(touched)], level)
+                kept = stats[level][~stats[level].index.isin(touched)]
+                stats[level] = pd.concat([kept, recomputed]) if len(kept) else recomputed
+                for group in touched:
+                    lookup.pop((level, group), None)
+                lookup.update(_to_lookup(level, recomputed))
+
+            self.universe, self.stats, self._lookup = universe, stats, lookup
+            self.version += 1
+        return True
+
+    def observe(self, ticker, info):
+        """Fold a freshly fetched info into the universe if `ticker` is a member; returns whether stats changed."""
+        if ticker not in self.universe.index:
+            return False
+        return self.update({ticker: info})
+
+    def group(self, level, name):
+        """All statistics of one group ({metric: {stat: value}, 'count': n}), or None."""
+        return self._lookup.get((level, name))
+
+    def peer_group(self, sector=None, industry=None, min_peers=MIN_PEERS):
+        """The industry group if it has at least `min_peers` members, else the sector group, else None."""
+        lookup = self._lookup
+        for level, name in (('industry', industry), ('sector', sector)):
+            group = lookup.get((level, name))
+            if group is not None and group['count'] >= min_peers:
+                return group
+        return None
+
+    def stat(self, metric, sector=None, industry=None, stat='median', default=None):
+        """One peer statistic for a ticker's industry/sector, or `default` without enough peers."""
+        group = self.peer_group(sector, industry)
+        if group is None:
+            return default
+        value = group[metric][stat]
+        return default if np.isnan(value) else value
+
+    def percentile_rank(self, metric, value, sector=None, industry=None):
+        """Approximate percentile (0-100) of `value` among its peers, interpolated between the stored percentiles."""
+        group = self.peer_group(sector, industry)
+        if group is None or value is None or np.isnan(value):
+            return None
+        points = [group[metric][stat] for stat in STAT_NAMES]
+        if np.isnan(points).any():
+            return None
+        return float(np.interp(value, points, [q * 100 for q in PERCENTILES]))
+
+    def industry_beta(self, info, default=None):
+        """Median unlevered beta of the ticker's peers, relevered at the ticker's own debt/equity."""
+        unlevered = self.stat('unlevered_beta', info.get('sector'), info.get('industry'))
+        if unlevered is None:
+            return default
+        return relever_beta(unlevered, info.get('totalDebt') or 0, info.get('marketCap') or 0,
+                            info.get('effectiveTaxRate') or DEFAULT_TAX_RATE)
+
+    def median_frame(self, infos):
+        """Peer medians aligned to {ticker: info} (ticker x metric), NaN where a ticker has too few peers."""
+        empty = dict.fromkeys(PEER_METRICS, np.nan)
+        rows = {}
+        for ticker, info in infos.items():
+            group = self.peer_group(info.get('sector'), info.get('industry'))
+            rows[ticker] = {metric: group[metric]['median'] for metric in PEER_METRICS} if group else empty
+        return pd.DataFrame.from_dict(rows, orient='index', columns=PEER_METRICS)
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.universe.to_parquet(path)
+
+    def refresh(self, tickers, **fetch_kwargs):
+        """Fetch info for `tickers` (through the fundamentals cache) and fold them into the universe."""
+        from bulk_fetch import bulk_fetch
+
+        stocks, errors = bulk_fetch(tickers, fields=('info',), **fetch_kwargs)
+        for ticker, failed in errors.items():
+            logger.warning("Skipping %s: %s", ticker, next(iter(failed.values())))
+        return self.update({ticker: stock.info for ticker, stock in stocks.items() if ticker not in errors})
+
+_peer_stats = None
+_peer_stats_checked = 0.0
+_peer_stats_lock = threading.Lock()
+
+def get_peer_stats():
+    """Process-wide peer statistics, loaded from DEFAULT_PEER_STATS_PATH (empty until a universe is built).
+
+    Members are updated as their info is refetched (see data_cache), and the
+    file is checked for a rebuild at most every RELOAD_INTERVAL seconds.
+    """
+    global _peer_stats, _peer_stats_checked
+    with _peer_stats_lock:
+        now = time.monotonic()
+        if _peer_stats is None:
+            _peer_stats = PeerStats(DEFAULT_PEER_STATS_PATH)
+            _peer_stats_checked = now
+        elif now - _peer_stats_checked >= RELOAD_INTERVAL:
+            _peer_stats_checked = now
+            _peer_stats.reload_if_changed()
+        return _peer_stats
+
+def main(argv=None):
+    from pipeline import read_tickers
+
+    parser = argparse.ArgumentParser(description="Build or refresh the sector/industry peer universe")
+    parser.add_argument('tickers', help="text file with one ticker per line, or CSV with a 'ticker' column")
+    parser.add_argument('--output', default=DEFAULT_PEER_STATS_PATH)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    peers = PeerStats(args.output)
+    peers.refresh(read_tickers(args.tickers), max_workers=args.workers)
+    peers.save()
+    logger.info("Peer universe: %d tickers, %d sectors, %d industries", len(peers),
+                len(peers.stats['sector']), len(peers.stats['industry']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Headless batch valuation pipeline (no Streamlit).
+
+Runs fetch -> WACC -> DCF -> valuation points -> risk factors for a list of
+tickers across a process pool and appends results to CSV or Parquet as they
+complete. Re-running with the same output resumes: tickers that already
+succeeded are skipped, failed ones are retried.
+
+    python pipeline.py tickers.txt results.csv --workers 8
+"""
+import argparse
+import glob
+import logging
+import os
+from types import SimpleNamespace
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from data_cache import get_cached_ticker
+from dtf import FCF_BASES, RiskFreeRateUnavailable, calculate_advanced_dcf, calculate_wacc, require_risk_free_rate
+from risk_analysis import build_risk_frame, score_risk_factors
+from valuation import get_valuation_points
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {'short_term_growth': 0.1, 'long_term_growth': 0.02, 'market_risk_premium': 0.06,
+                  'fcf_basis': 'annual'}
+
+# Fixed output schema so every appended batch lines up, including all-error batches
+_EMPTY_STOCK = SimpleNamespace(info={})
+RESULT_COLUMNS = (['ticker', 'error', 'risk_free_rate', 'wacc', 'wacc_fallback', 'adjusted_beta',
+                   'fair_price', 'current_price', 'upside']
+                  + [f'valuation {point}' for point in get_valuation_points(_EMPTY_STOCK)]
+                  + list(score_risk_factors(build_risk_frame({'': _EMPTY_STOCK.info})).columns))
+
+def read_tickers(path):
+    """Tickers from a text file (one per line) or a CSV with a 'ticker' column."""
+    if path.endswith('.csv'):
+        tickers = pd.read_csv(path)['ticker']
+    else:
+        with open(path) as f:
+            tickers = [line.strip() for line in f]
+    return list(dict.fromkeys(t.strip().upper() for t in tickers if t and not t.startswith('#')))
+
+def analyze_ticker(ticker, risk_free_rate, short_term_growth, long_term_growth, market_risk_premium,
+                   fcf_basis='annual'):
+    """Run every analysis stage for one ticker and return a flat result row."""
+    row = {'ticker': ticker, 'error': None}
+    try:
+        stock = get_cached_ticker(ticker)
+        info = stock.info
+
+        wacc_errors = []
+        wacc, adjusted_beta = calculate_wacc(stock, risk_free_rate, market_risk_premium,
+                                             on_error=wacc_errors.append)
+        fair_price, _, _ = calculate_advanced_dcf(stock, short_term_growth, long_term_growth, wacc,
+                                                  fcf_basis=fcf_basis)
+        current_price = info.get('currentPrice')
+
+        row.update({
+            'risk_free_rate': risk_free_rate,
+            'wacc': wacc,
+            'wacc_fallback': bool(wacc_errors),
+            'adjusted_beta': adjusted_beta,
+            'fair_price': fair_price,
+            'current_price': current_price,
+            'upside': fair_price / current_price - 1 if fair_price is not None and current_price else None,
+        })
+        row.update({f'valuation {point}': text for point, text in get_valuation_points(stock).items()})
+        row.update(score_risk_factors(build_risk_frame({ticker: info})).iloc[0].to_dict())
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+class ResultWriter:
+    """Append-only result sink with resume support.
+
+    CSV output is a single file appended per batch; Parquet output is a
+    directory of part files (Parquet files can't be appended to).
+    """
+
+    def __init__(self, output, fmt=None):
+        self.output = output
+        self.fmt = fmt or ('parquet' if output.endswith('.parquet') or os.path.isdir(output) else 'csv')
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.output, 'part-*.parquet')))
+
+    def completed(self):
+        """Tickers that already have a successful result."""
+        if self.fmt == 'csv':
+            if not os.path.exists(self.output):
+                return set()
+            done = pd.read_csv(self.output, usecols=['ticker', 'error'])
+        else:
+            parts = self._parts()
+            if not parts:
+                return set()
+            done = pd.concat(pd.read_parquet(part, columns=['ticker', 'error']) for part in parts)
+        return set(done.loc[done['error'].isna(), 'ticker'])
+
+    def write(self, rows):
+        frame = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        if self.fmt == 'csv':
+            frame.to_csv(self.output, mode='a', index=False, header=not os.path.exists(self.output))
+        else:
+            os.makedirs(self.output, exist_ok=True)
+            frame.to_parquet(os.path.join(self.output, f'part-{len(self._parts()):05d}.parquet'), index=False)
+
+def run_pipeline(tickers, output, fmt=None, workers=None, batch_size=25, as_of=None, **params):
+    """Value `tickers` on a process pool, streaming results to `output` in batches.
+
+    At most 2 * workers tickers are in flight, so memory stays bounded for
+    any universe size. The yield curve is loaded first if it does not cover
+    `as_of`; raises RiskFreeRateUnavailable when there is still no rate.
+    Returns a summary dict.
+    """
+    params = dict(DEFAULT_PARAMS, **params)
+    risk_free_rate = require_risk_free_rate(as_of)
+    writer = ResultWriter(output, fmt)
+    done = writer.completed()
+    pending = [ticker for ticker in tickers if ticker not in done]
+    logger.info("%d tickers, %d already done, risk-free rate %.4f", len(tickers), len(done), risk_free_rate)
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    batch, failed = [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        remaining = iter(pending)
+        in_flight = set()
+        while True:
+            for ticker in remaining:
+                in_flight.add(pool.submit(analyze_ticker, ticker, risk_free_rate, **params))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = future.result()
+                failed += row['error'] is not None
+                batch.append(row)
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                batch = []
+    if batch:
+        writer.write(batch)
+
+    return {'total': len(tickers), 'skipped': len(done), 'processed': len(pending), 'failed': failed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch DCF / valuation / risk pipeline")
+    parser.add_argument('tickers', help="text file with one ticker per line, or CSV with a 'ticker' column")
+    parser.add_argument('output', help="results .csv file, or .parquet directory")
+    parser.add_argument('--format', choices=['csv', 'parquet'])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--as-of', help="point-in-time date for the risk-free rate (YYYY-MM-DD)")
+    parser.add_argument('--short-term-growth', type=float, default=DEFAULT_PARAMS['short_term_growth'])
+    parser.add_argument('--long-term-growth', type=float, default=DEFAULT_PARAMS['long_term_growth'])
+    parser.add_argument('--market-risk-premium', type=float, default=DEFAULT_PARAMS['market_risk_premium'])
+    parser.add_argument('--fcf-basis', choices=FCF_BASES, default=DEFAULT_PARAMS['fcf_basis'],
+                        help="start the DCF from the latest annual or the trailing-twelve-month FCF")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        summary = run_pipeline(read_tickers(args.tickers), args.output, fmt=args.format, workers=args.workers,
+                               batch_size=args.batch_size, as_of=args.as_of,
+                               short_term_growth=args.short_term_growth, long_term_growth=args.long_term_growth,
+                               market_risk_premium=args.market_risk_premium, fcf_basis=args.fcf_basis)
+    except RiskFreeRateUnavailable as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    logger.info("Done: %s", summary)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Portfolio valuation: per-position DCF, WACC and risk, aggregated over holdings.
+
+Positions are valued once per ticker (cached by data timestamp and DCF
+assumptions); the aggregation over share counts is a separate, cheap step,
+so changing weights never revalues a position.
+
+    python portfolio.py holdings.csv --output positions.csv
+"""
+import argparse
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from bulk_fetch import bulk_fetch
+from dtf import FCF_BASES, batch_advanced_dcf, calculate_wacc, get_dcf_inputs, require_risk_free_rate
+from instrumentation import traced
+from risk_analysis import QUANT_RISK_FACTORS, RISK_LEVELS, build_risk_frame, risk_score_matrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {'short_term_growth': 0.1, 'long_term_growth': 0.02, 'market_risk_premium': 0.06,
+                  'fcf_basis': 'annual'}
+
+# Fields a position valuation reads (quarterly cash flow only for the TTM basis)
+POSITION_FIELDS = ('info', 'financials', 'cashflow', 'quarterly_cashflow')
+
+# Overall risk bucket from the summed factor scores (0-8): upper bounds of Low and Moderate
+RISK_BUCKET_BOUNDS = (2, 4)
+
+POSITION_COLUMNS = (['error', 'name', 'sector', 'industry', 'current_price', 'fair_price', 'upside', 'wacc',
+                     'adjusted_beta', 'wacc_fallback']
+                    + [f'{name}_risk' for name in QUANT_RISK_FACTORS] + ['risk_score', 'risk_bucket'])
+
+_POSITION_CACHE_SIZE = 10_000
+_position_cache = OrderedDict()  # (ticker, data timestamp, assumptions) -> position row
+_position_cache_lock = threading.Lock()
+
+def read_holdings(path_or_buffer):
+    """Shares per ticker from a CSV with 'ticker' and 'shares' columns (duplicate tickers are summed)."""
+    holdings = pd.read_csv(path_or_buffer, usecols=['ticker', 'shares'])
+    holdings['ticker'] = holdings['ticker'].astype(str).str.strip().str.upper()
+    holdings['shares'] = pd.to_numeric(holdings['shares'], errors='coerce').fillna(0.0)
+    return holdings[holdings['ticker'] != ''].groupby('ticker', sort=False)['shares'].sum()
+
+def _position_key(stock, assumptions):
+    timestamp = stock.data_timestamp(POSITION_FIELDS) if hasattr(stock, 'data_timestamp') else None
+    return stock.ticker, timestamp or date.today().isoformat(), assumptions
+
+def _risk_bucket(score):
+    return RISK_LEVELS[np.searchsorted(RISK_BUCKET_BOUNDS, score)]
+
+def _value_batch(stocks, risk_free_rate, short_term_growth, long_term_growth, market_risk_premium, fcf_basis):
+    """Position rows for {ticker: stock}: one batched DCF and one vectorized risk scoring for all of them."""
+    rows = {ticker: dict.fromkeys(POSITION_COLUMNS) for ticker in stocks}
+    scored, dcf_tickers, dcf_inputs = [], [], []
+    for ticker, stock in stocks.items():
+        row = rows[ticker]
+        try:
+            info = stock.info
+            scored.append(ticker)
+            row.update(name=info.get('longName', ticker), sector=info.get('sector', 'Unknown'),
+                       industry=info.get('industry', 'Unknown'), current_price=info.get('currentPrice'))
+            wacc_errors = []
+            row['wacc'], row['adjusted_beta'] = calculate_wacc(stock, risk_free_rate, market_risk_premium,
+                                                               on_error=wacc_errors.append)
+            row['wacc_fallback'] = bool(wacc_errors)
+            inputs = get_dcf_inputs(stock, fcf_basis)
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+            continue
+        if inputs is None:
+            row['error'] = "No free cash flow data"
+            continue
+        dcf_tickers.append(ticker)
+        dcf_inputs.append(inputs + (row['wacc'],))
+
+    if dcf_tickers:
+        latest_fcf, net_debt, shares_outstanding, wacc = np.array(dcf_inputs, dtype=float).T
+        fair_prices, _ = batch_advanced_dcf(latest_fcf, short_term_growth, long_term_growth, wacc,
+                                            net_debt, shares_outstanding)
+        for ticker, fair_price in zip(dcf_tickers, fair_prices):
+            current_price = rows[ticker]['current_price']
+            rows[ticker]['fair_price'] = fair_price if np.isfinite(fair_price) else None
+            if rows[ticker]['fair_price'] is not None and current_price:
+                rows[ticker]['upside'] = fair_price / current_price - 1
+
+    if scored:
+        matrix = risk_score_matrix(build_risk_frame({ticker: stocks[ticker].info for ticker in scored}))
+        totals = matrix.sum(axis=1).to_numpy()
+        for ticker, levels, total, bucket in zip(matrix.index, RISK_LEVELS[matrix.to_numpy()], totals,
+                                                 _risk_bucket(totals)):
+            rows[ticker].update({f'{name}_risk': level for name, level in zip(matrix.columns, levels)})
+            rows[ticker].update(risk_score=int(total), risk_bucket=bucket)
+    return rows
+
+@traced()
+def value_positions(tickers, risk_free_rate=None, short_term_growth=0.1, long_term_growth=0.02,
+                    market_risk_premium=0.06, fcf_basis='annual', fetch=None, max_workers=16):
+    """Per-position valuation table (ticker x POSITION_COLUMNS) for any number of tickers.
+
+    Fields are fetched concurrently; tickers already valued for the same
+    data timestamp and assumptions come from a process-wide cache, and the
+    rest are valued in one batched DCF pass. Failed tickers keep a row
+    with their error.
+    """
+    risk_free_rate = require_risk_free_rate() if risk_free_rate is None else risk_free_rate
+    assumptions = (risk_free_rate, short_term_growth, long_term_growth, market_risk_premium, fcf_basis)
+    fields = POSITION_FIELDS if fcf_basis == 'ttm' else POSITION_FIELDS[:-1]
+    stocks, errors = bulk_fetch(tickers, fields=fields, fetch=fetch, max_workers=max_workers)
+
+    rows, misses = {}, {}
+    for ticker, stock in stocks.items():
+        if ticker in errors:
+            field = next(field for field in fields if field in errors[ticker])
+            error = errors[ticker][field]
+            rows[ticker] = dict.fromkeys(POSITION_COLUMNS, None)
+            rows[ticker]['error'] = f"{field}: {type(error).__name__}: {error}"
+            continue
+        key = _position_key(stock, assumptions)
+        with _position_cache_lock:
+            row = _position_cache.get(key)
+            if row is not None:
+                _position_cache.move_to_end(key)
+        if row is None:
+            misses[ticker] = (key, stock)
+        else:
+            rows[ticker] = row
+
+    if misses:
+        valued = _value_batch({ticker: stock for ticker, (_, stock) in misses.items()}, *assumptions)
+        with _position_cache_lock:
+            for ticker, (key, _) in misses.items():
+                rows[ticker] = _position_cache[key] = valued[ticker]
+                if len(_position_cache) > _POSITION_CACHE_SIZE:
+                    _position_cache.popitem(last=False)
+    logger.debug("Valued %d positions (%d from cache)", len(rows), len(rows) - len(misses))
+
+    positions = pd.DataFrame.from_dict({ticker: rows[ticker] for ticker in stocks}, orient='index',
+                                       columns=POSITION_COLUMNS)
+    numeric = ['current_price', 'fair_price', 'upside', 'wacc', 'adjusted_beta', 'risk_score']
+    positions[numeric] = positions[numeric].apply(pd.to_numeric, errors='coerce')
+    positions.index.name = 'ticker'
+    return positions
+
+@traced()
+def aggregate_portfolio(holdings, positions, top=10):
+    """Weights, weighted upside, sector exposure, risk concentration and risk scores for {ticker: shares}.
+
+    Only reads `positions` (see value_positions), so re-running after a
+    change of share counts is a handful of vectorized pandas operations.
+    Upside is weighted over the positions that have a fair value. Empty
+    holdings give zero totals and a NaN upside.
+    """
+    shares = pd.Series(holdings, dtype=float)
+    shares.index = shares.index.astype(str).str.upper()
+    frame = positions.reindex(shares.index)
+    frame.insert(0, 'shares', shares)
+    frame['market_value'] = frame['shares'] * frame['current_price']
+    total_value = frame['market_value'].sum()
+    frame['weight'] = frame['market_value'] / total_value if total_value else np.nan
+
+    valued = frame['fair_price'].notna() & (frame['market_value'] > 0)
+    valued_weight = frame.loc[valued, 'weight'].sum()
+    weights = frame['weight'].fillna(0)
+    summary = {
+        'positions': len(frame),
+        'valued_positions': int(valued.sum()),
+        'market_value': total_value,
+        'fair_value': (frame['shares'] * frame['fair_price'])[valued].sum(),
+        'weighted_upside': (frame.loc[valued, 'weight'] * frame.loc[valued, 'upside']).sum() / valued_weight
+                           if valued_weight else np.nan,
+        'valued_weight': valued_weight,
+        'weighted_wacc': (weights * frame['wacc'].fillna(0)).sum(),
+        'top_weight': weights.nlargest(top).sum(),
+        # Herfindahl index of the weights and the equivalent number of equal-weight positions
+        'hhi': (weights ** 2).sum(),
+    }
+    summary['effective_positions'] = 1 / summary['hhi'] if summary['hhi'] else np.nan
+
+    sector_exposure = frame.groupby(frame['sector'].fillna('Unknown'))['weight'].sum().sort_values(ascending=False)
+    # Weight in each Low/Moderate/High level per risk factor, plus the overall bucket
+    risk_columns = {name: f'{name}_risk' for name in QUANT_RISK_FACTORS}
+    risk_columns['overall'] = 'risk_bucket'
+    risk_exposure = pd.DataFrame({
+        name: frame.groupby(column)['weight'].sum().reindex(RISK_LEVELS, fill_value=0.0)
+        for name, column in risk_columns.items()}).T
+    frame = frame.sort_values('weight', ascending=False)
+    # 0/1/2 score per factor for every scored position, largest weight first (see create_risk_heatmap)
+    levels = {level: score for score, level in enumerate(RISK_LEVELS)}
+    risk_scores = frame[[f'{name}_risk' for name in QUANT_RISK_FACTORS]].dropna().apply(
+        lambda column: column.map(levels))
+    risk_scores.columns = list(QUANT_RISK_FACTORS)
+    return {'positions': frame, 'summary': summary, 'sector_exposure': sector_exposure,
+            'risk_exposure': risk_exposure, 'risk_scores': risk_scores.astype(int)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Value a portfolio of holdings and aggregate its exposures")
+    parser.add_argument('holdings', help="CSV with 'ticker' and 'shares' columns")
+    parser.add_argument('--output', help="write the per-position table to this CSV")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--as-of', help="point-in-time date for the risk-free rate (YYYY-MM-DD)")
+    parser.add_argument('--short-term-growth', type=float, default=DEFAULT_PARAMS['short_term_growth'])
+    parser.add_argument('--long-term-growth', type=float, default=DEFAULT_PARAMS['long_term_growth'])
+    parser.add_argument('--market-risk-premium', type=float, default=DEFAULT_PARAMS['market_risk_premium'])
+    parser.add_argument('--fcf-basis', choices=FCF_BASES, default=DEFAULT_PARAMS['fcf_basis'])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    holdings = read_holdings(args.holdings)
+    positions = value_positions(holdings.index, require_risk_free_rate(args.as_of), args.short_term_growth,
+                                args.long_term_growth, args.market_risk_premium, args.fcf_basis,
+                                max_workers=args.workers)
+    portfolio = aggregate_portfolio(holdings, positions)
+    if args.output:
+        portfolio['positions'].to_csv(args.output)
+
+    summary = portfolio['summary']
+    logger.info("%d positions (%d valued), market value %s, DCF fair value %s, weighted upside %.1f%%",
+                summary['positions'], summary['valued_positions'], f"${summary['market_value']:,.0f}",
+                f"${summary['fair_value']:,.0f}", summary['weighted_upside'] * 100)
+    logger.info("Top %d weight %.1f%%, effective positions %.1f", 10, summary['top_weight'] * 100,
+                summary['effective_positions'])
+    logger.info("Sector exposure:\n%s", portfolio['sector_exposure'].map('{:.1%}'.format).to_string())
+    logger.info("Risk concentration (share of market value):\n%s",
+                portfolio['risk_exposure'].map('{:.1%}'.format).to_string())
+
+if __name__ == '__main__':
+    main()
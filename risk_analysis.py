@@ -1,27 +1,79 @@
-def get_risk_factors(stock):
-    """Analyze 12 risk factors for the stock."""
-    info = stock.info
-    
-    beta = info.get('beta', 0)
-    debt_to_equity = info.get('debtToEquity', 0)
-    current_ratio = info.get('currentRatio', 0)
-    
-    risk_factors = {
-        "1. Market Risk": f"Beta: {beta:.2f}" + (" - High volatility" if beta > 1.5 else " - Moderate volatility" if beta > 1 else " - Low volatility"),
+import numpy as np
+import pandas as pd
+from instrumentation import traced
+
+# Quantitative risk factors: name -> (info key, (moderate, high) thresholds, higher_is_riskier)
+QUANT_RISK_FACTORS = {
+    'market': ('beta', (1, 1.5), True),
+    'leverage': ('debtToEquity', (1, 2), True),
+    'liquidity': ('currentRatio', (2, 1), False),
+    'dividend': ('payoutRatio', (0.5, 0.8), True),
+}
+
+RISK_LEVELS = np.array(['Low', 'Moderate', 'High'])
+
+def build_risk_frame(infos):
+    """Columnar table of the info fields used for risk scoring, one row per ticker."""
+    keys = [key for key, _, _ in QUANT_RISK_FACTORS.values()]
+    frame = pd.DataFrame.from_dict(
+        {ticker: {key: info.get(key) for key in keys + ['sector', 'country']} for ticker, info in infos.items()},
+        orient='index', columns=keys + ['sector', 'country'])
+    frame[keys] = frame[keys].apply(pd.to_numeric, errors='coerce').fillna(0).astype(float)
+    frame[['sector', 'country']] = frame[['sector', 'country']].fillna('Unknown')
+    return frame
+
+def score_risk_factors(frame):
+    """Score every quantitative risk factor for all rows with vectorized comparisons.
+
+    Returns a numeric, sortable frame: the raw value and a 0/1/2
+    (low/moderate/high) score per factor, plus 'total_score'.
+    """
+    scores = {}
+    for name, (key, (moderate, high), higher_is_riskier) in QUANT_RISK_FACTORS.items():
+        values = frame[key].to_numpy(dtype=float)
+        if higher_is_riskier:
+            score = (values > moderate).astype(int) + (values > high)
+        else:
+            score = (values < moderate).astype(int) + (values < high)
+        scores[name] = values
+        scores[f'{name}_score'] = score
+    result = pd.DataFrame(scores, index=frame.index)
+    result['total_score'] = result[[f'{name}_score' for name in QUANT_RISK_FACTORS]].sum(axis=1)
+    return result
+
+def risk_score_matrix(frame):
+    """Ticker x factor matrix of 0/1/2 scores (e.g. for a portfolio heatmap)."""
+    scores = score_risk_factors(frame)
+    return scores[[f'{name}_score' for name in QUANT_RISK_FACTORS]].rename(
+        columns=lambda column: column.removesuffix('_score'))
+
+def risk_labels(scores):
+    """Low/Moderate/High bucket labels for a scored frame."""
+    return pd.DataFrame({name: RISK_LEVELS[scores[f'{name}_score'].to_numpy()] for name in QUANT_RISK_FACTORS},
+                        index=scores.index)
+
+def render_risk_factors(row, scores):
+    """Render one ticker's scores as the 12 risk-factor strings."""
+    beta_level, leverage_level, liquidity_level, dividend_level = (
+        RISK_LEVELS[int(scores[f'{name}_score'])] for name in QUANT_RISK_FACTORS)
+    volatility = {'High': ' - High volatility', 'Moderate': ' - Moderate volatility', 'Low': ' - Low volatility'}
+
+    return {
+        "1. Market Risk": f"Beta: {scores['market']:.2f}" + volatility[beta_level],
         
-        "2. Financial Leverage": f"Debt/Equity: {debt_to_equity:.2f}" + (" - High risk" if debt_to_equity > 2 else " - Moderate risk" if debt_to_equity > 1 else " - Low risk"),
+        "2. Financial Leverage": f"Debt/Equity: {scores['leverage']:.2f} - {leverage_level} risk",
         
-        "3. Liquidity Risk": f"Current Ratio: {current_ratio:.2f}" + (" - High risk" if current_ratio < 1 else " - Moderate risk" if current_ratio < 2 else " - Low risk"),
+        "3. Liquidity Risk": f"Current Ratio: {scores['liquidity']:.2f} - {liquidity_level} risk",
         
         "4. Industry Competition": "Analysis based on market position and industry dynamics",
         
-        "5. Regulatory Risk": f"Sector: {info.get('sector', 'Unknown')} - Regulatory environment assessment",
+        "5. Regulatory Risk": f"Sector: {row['sector']} - Regulatory environment assessment",
         
         "6. Management Risk": "Based on corporate governance and management history",
         
         "7. Economic Sensitivity": "Cyclical nature and economic dependence analysis",
         
-        "8. Geographic Risk": f"Based on {info.get('country', 'Unknown')} operations",
+        "8. Geographic Risk": f"Based on {row['country']} operations",
         
         "9. Currency Risk": "International operations exposure assessment",
         
@@ -29,8 +81,12 @@ def get_risk_factors(stock):
         
         "11. ESG Risk": "Environmental, Social, and Governance considerations",
         
-        "12. Dividend Risk": f"Payout Ratio: {info.get('payoutRatio', 0)*100:.2f}%" + 
-                            (" - High risk" if info.get('payoutRatio', 0) > 0.8 else " - Moderate risk" if info.get('payoutRatio', 0) > 0.5 else " - Low risk")
+        "12. Dividend Risk": f"Payout Ratio: {scores['dividend']*100:.2f}% - {dividend_level} risk"
     }
-    
-    return risk_factors
+
+@traced()
+def get_risk_factors(stock):
+    """Analyze 12 risk factors for the stock."""
+    frame = build_risk_frame({'stock': stock.info})
+    scores = score_risk_factors(frame)
+    return render_risk_factors(frame.iloc[0], scores.iloc[0])
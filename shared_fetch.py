@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from bulk_fetch import bulk_fetch
+from data_cache import CACHED_FIELDS, FIELD_TTLS, CachedTicker
+from instrumentation import count
+from snapshot import FundamentalsSnapshot
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers for the key share its result."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, shared): shared is True when this caller waited on someone else's call."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result(), False
+
+def _fetch_through_cache(ticker, field):
+    return getattr(CachedTicker(ticker), field)
+
+class SharedFetcher:
+    """Process-wide fetch layer shared by every Streamlit session.
+
+    Results are kept in a bounded LRU keyed by (ticker, field) with the
+    per-field TTLs of the fundamentals cache. Misses go through a
+    SingleFlight, so N sessions asking for the same ticker at once cause
+    one upstream call. `fetch(ticker, field)` defaults to the on-disk
+    cache backed by Yahoo; pass bulk_fetch.make_http_fetcher(...) to run
+    against a stub server.
+    """
+
+    def __init__(self, fetch=None, max_entries=4096, ttls=None):
+        self.fetch = fetch or _fetch_through_cache
+        self.max_entries = max_entries
+        self.ttls = dict(FIELD_TTLS, **(ttls or {}))
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        # Counters per kind of entry: 'field' (upstream fetches) and 'snapshot' (built from fields)
+        self._stats = {kind: dict.fromkeys(('requests', 'hits', 'coalesced', 'upstream_calls', 'upstream_errors'), 0)
+                       for kind in ('field', 'snapshot')}
+
+    def _lookup(self, key, ttl, stats):
+        with self._lock:
+            stats['requests'] += 1
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] <= ttl:
+                self._entries.move_to_end(key)
+                stats['hits'] += 1
+                return True, entry[0]
+        return False, None
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key, ttl, fn, kind):
+        stats = self._stats[kind]
+        found, value = self._lookup(key, ttl, stats)
+        if found:
+            return value
+
+        def upstream():
+            # A caller that lost the race to a finished flight finds the value stored
+            found, value = self._peek(key, ttl)
+            if found:
+                return value
+            with self._lock:
+                stats['upstream_calls'] += 1
+            count(f'shared_{kind}_upstream')
+            try:
+                value = fn()
+            except Exception:
+                with self._lock:
+                    stats['upstream_errors'] += 1
+                raise
+            self._store(key, value)
+            return value
+
+        value, shared = self._flight.do(key, upstream)
+        if shared:
+            with self._lock:
+                stats['coalesced'] += 1
+            count(f'shared_{kind}_coalesced')
+        return value
+
+    def _peek(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] <= ttl:
+            return True, entry[0]
+        return False, None
+
+    def get(self, ticker, field):
+        """One field for one ticker (same signature as bulk_fetch's `fetch`)."""
+        ticker = ticker.upper()
+        return self._load((ticker, field), self.ttls.get(field, 0), lambda: self.fetch(ticker, field), 'field')
+
+    def get_snapshot(self, ticker, fields=CACHED_FIELDS):
+        """FundamentalsSnapshot for `ticker`, built once and shared by every session asking for it."""
+        ticker = ticker.upper()
+        ttl = min(self.ttls.get(field, 0) for field in fields)
+
+        def build():
+            stocks, errors = bulk_fetch([ticker], fields=fields, fetch=self.get, max_workers=len(fields))
+            if ticker in errors:
+                raise next(iter(errors[ticker].values()))
+            return FundamentalsSnapshot.from_ticker(stocks[ticker], as_of=time.time())
+
+        return self._load((ticker, 'snapshot'), ttl, build, 'snapshot')
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == ticker.upper()]:
+                    del self._entries[key]
+
+    def stats(self):
+        """Per-kind request, hit, coalescing and upstream counters.
+
+        `deduplicated` counts requests served without their own upstream
+        call (LRU hits plus requests coalesced onto an in-flight call).
+        """
+        with self._lock:
+            stats = {kind: dict(counters) for kind, counters in self._stats.items()}
+            stats['entries'] = len(self._entries)
+        for kind in ('field', 'snapshot'):
+            counters = stats[kind]
+            counters['deduplicated'] = counters['requests'] - counters['upstream_calls']
+            counters['dedup_rate'] = counters['deduplicated'] / counters['requests'] if counters['requests'] else 0.0
+        return stats
+
+_shared_fetcher = None
+_shared_fetcher_lock = threading.Lock()
+
+def get_shared_fetcher():
+    """Process-wide SharedFetcher (one per Streamlit server)."""
+    global _shared_fetcher
+    with _shared_fetcher_lock:
+        if _shared_fetcher is None:
+            _shared_fetcher = SharedFetcher()
+        return _shared_fetcher
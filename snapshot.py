@@ -0,0 +1,221 @@
+import pickle
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+# Numeric `info` fields the analysis modules read, in a fixed order (the snapshot's schema)
+INFO_FIELDS = (
+    'currentPrice', 'marketCap', 'sharesOutstanding', 'beta', 'trailingPE', 'forwardPE', 'pegRatio',
+    'priceToBook', 'dividendYield', 'payoutRatio', 'fiftyTwoWeekHigh', 'fiftyTwoWeekLow',
+    'totalRevenue', 'totalDebt', 'totalCash', 'totalAssets', 'totalCurrentLiabilities', 'inventory',
+    'netReceivables', 'freeCashflow', 'operatingCashflow', 'netIncome', 'netIncomeToCommon',
+    'grossProfits', 'operatingIncome', 'grossMargins', 'operatingMargins', 'profitMargins',
+    'revenueGrowth', 'earningsGrowth', 'returnOnEquity', 'returnOnAssets', 'currentRatio',
+    'quickRatio', 'debtToEquity', 'effectiveTaxRate',
+)
+INFO_TEXT_FIELDS = ('longName', 'sector', 'industry', 'country')
+
+# Fields Yahoo reports as integers; read back as int so formatting matches yf.Ticker.info
+INFO_INTEGER_FIELDS = frozenset({
+    'marketCap', 'sharesOutstanding', 'totalRevenue', 'totalDebt', 'totalCash', 'totalAssets',
+    'totalCurrentLiabilities', 'inventory', 'netReceivables', 'freeCashflow', 'operatingCashflow',
+    'netIncome', 'netIncomeToCommon', 'grossProfits', 'operatingIncome',
+})
+
+# `financials` is yfinance's alias of the income statement
+STATEMENT_FIELDS = ('income_stmt', 'balance_sheet', 'cashflow',
+                    'quarterly_income_stmt', 'quarterly_balance_sheet', 'quarterly_cashflow')
+
+_HEADER = struct.Struct('<Q')  # length of the pickled layout at the start of a shared block
+_ALIGN = 64
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class StatementMatrix:
+    """One statement as a float matrix (items x periods) with interned row labels."""
+
+    __slots__ = ('items', 'periods', 'values', '_frame')
+
+    def __init__(self, items, periods, values):
+        self.items = tuple(sys.intern(str(item)) for item in items)
+        self.periods = np.asarray(periods, dtype='datetime64[ns]')
+        self.values = values
+        self.values.flags.writeable = False
+        self._frame = None
+
+    @classmethod
+    def from_frame(cls, frame, dtype=np.float64):
+        if frame is None or frame.empty:
+            return cls((), np.array([], dtype='datetime64[ns]'), np.empty((0, 0), dtype=dtype))
+        values = frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=dtype, na_value=np.nan)
+        return cls(frame.index, pd.to_datetime(frame.columns).values, np.ascontiguousarray(values))
+
+    def to_frame(self):
+        """DataFrame view over the (read-only) matrix; callers may rename or reorder it freely."""
+        if not self.items:
+            return pd.DataFrame()
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.values, index=pd.Index(self.items),
+                                       columns=pd.DatetimeIndex(self.periods), copy=False)
+        # Shallow copy: shares the data but not the labels, so callers can't alter the cached frame
+        return self._frame.copy(deep=False)
+
+class FundamentalsSnapshot:
+    """Compact, immutable fundamentals for one ticker.
+
+    Numeric `info` fields live in one array following INFO_FIELDS; each
+    statement is a StatementMatrix. The object exposes the same attributes
+    as yf.Ticker (info, financials, cashflow, balance_sheet, income_stmt),
+    so every analysis function accepts it, and it can be pickled or placed
+    in shared memory (to_shared_memory / attach) and read without copying.
+    """
+
+    __slots__ = ('ticker', 'as_of', 'info_values', 'info_text', 'statements', '_info', '_shm')
+
+    def __init__(self, ticker, as_of, info_values, info_text, statements, shm=None):
+        self.ticker = ticker
+        self.as_of = as_of
+        self.info_values = info_values
+        self.info_values.flags.writeable = False
+        self.info_text = dict(info_text)
+        self.statements = dict(statements)
+        self._info = None
+        self._shm = shm  # keeps an attached shared-memory block alive as long as the snapshot
+
+    @classmethod
+    def from_ticker(cls, stock, as_of=None, dtype=np.float64):
+        """Snapshot a yf.Ticker-like object (use float32 matrices to halve statement memory)."""
+        info = stock.info
+        if as_of is None and hasattr(stock, 'data_timestamp'):
+            as_of = stock.data_timestamp()
+        if as_of is None:
+            as_of = time.time()
+        return cls(
+            stock.ticker, as_of,
+            np.array([_to_float(info.get(field)) for field in INFO_FIELDS], dtype=np.float64),
+            {field: sys.intern(str(info[field])) for field in INFO_TEXT_FIELDS if info.get(field) is not None},
+            {field: StatementMatrix.from_frame(getattr(stock, field, None), dtype) for field in STATEMENT_FIELDS},
+        )
+
+    def data_timestamp(self, fields=None):
+        return self.as_of
+
+    @property
+    def info(self):
+        """Read-only info mapping; missing fields are absent so info.get(key, default) behaves as usual."""
+        if self._info is None:
+            info = {field: int(value) if field in INFO_INTEGER_FIELDS and value.is_integer() else float(value)
+                    for field, value in zip(INFO_FIELDS, self.info_values) if not np.isnan(value)}
+            info.update(self.info_text)
+            self._info = MappingProxyType(info)
+        return self._info
+
+    @property
+    def income_stmt(self):
+        return self.statements['income_stmt'].to_frame()
+
+    @property
+    def financials(self):
+        return self.statements['income_stmt'].to_frame()
+
+    @property
+    def balance_sheet(self):
+        return self.statements['balance_sheet'].to_frame()
+
+    @property
+    def cashflow(self):
+        return self.statements['cashflow'].to_frame()
+
+    @property
+    def quarterly_income_stmt(self):
+        return self.statements['quarterly_income_stmt'].to_frame()
+
+    @property
+    def quarterly_balance_sheet(self):
+        return self.statements['quarterly_balance_sheet'].to_frame()
+
+    @property
+    def quarterly_cashflow(self):
+        return self.statements['quarterly_cashflow'].to_frame()
+
+    @property
+    def nbytes(self):
+        """Bytes held by the numeric arrays."""
+        return self.info_values.nbytes + sum(m.values.nbytes + m.periods.nbytes for m in self.statements.values())
+
+    def __reduce__(self):
+        return (_rebuild, (self.ticker, self.as_of, np.array(self.info_values), self.info_text,
+                           {field: (m.items, m.periods, np.array(m.values)) for field, m in self.statements.items()}))
+
+    def to_shared_memory(self, name=None):
+        """Copy the snapshot into one shared-memory block; other processes attach() to it by name.
+
+        The caller owns the returned SharedMemory and must unlink() it when done.
+        """
+        arrays = [('info', self.info_values)]
+        arrays += [(field, m.values) for field, m in self.statements.items()]
+        offsets, position = {}, 0
+        for key, array in arrays:
+            offsets[key] = (position, array.dtype.str, array.shape)
+            position += -(-array.nbytes // _ALIGN) * _ALIGN
+
+        layout = pickle.dumps({
+            'ticker': self.ticker, 'as_of': self.as_of, 'info_text': self.info_text, 'offsets': offsets,
+            'statements': {field: (m.items, m.periods) for field, m in self.statements.items()},
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        data_start = -(-(_HEADER.size + len(layout)) // _ALIGN) * _ALIGN
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(data_start + position, 1))
+        _HEADER.pack_into(shm.buf, 0, len(layout))
+        shm.buf[_HEADER.size:_HEADER.size + len(layout)] = layout
+        for key, array in arrays:
+            offset, _, _ = offsets[key]
+            target = np.ndarray(array.shape, array.dtype, buffer=shm.buf, offset=data_start + offset)
+            target[...] = array
+        return shm
+
+    @classmethod
+    def attach(cls, name):
+        """Snapshot whose arrays are zero-copy views into the shared-memory block `name`."""
+        shm = _attach_untracked(name)
+        (layout_size,) = _HEADER.unpack_from(shm.buf, 0)
+        layout = pickle.loads(bytes(shm.buf[_HEADER.size:_HEADER.size + layout_size]))
+        data_start = -(-(_HEADER.size + layout_size) // _ALIGN) * _ALIGN
+
+        def view(key):
+            offset, dtype, shape = layout['offsets'][key]
+            return np.ndarray(shape, np.dtype(dtype), buffer=shm.buf, offset=data_start + offset)
+
+        statements = {field: StatementMatrix(items, periods, view(field))
+                      for field, (items, periods) in layout['statements'].items()}
+        return cls(layout['ticker'], layout['as_of'], view('info'), layout['info_text'], statements, shm=shm)
+
+def _rebuild(ticker, as_of, info_values, info_text, statements):
+    return FundamentalsSnapshot(ticker, as_of, info_values, info_text,
+                                {field: StatementMatrix(*parts) for field, parts in statements.items()})
+
+_attach_lock = threading.Lock()
+
+def _attach_untracked(name):
+    # Attaching must not register the block with the resource tracker, otherwise it is
+    # unlinked when the attaching process exits (Python < 3.13 has no track=False).
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        with _attach_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
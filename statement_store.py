@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+STATEMENTS = ('income_stmt', 'balance_sheet', 'cashflow')
+
+FACT_COLUMNS = ['ticker', 'statement', 'item', 'period', 'value']
+
+# Derived ratios: name -> (numerator item, denominator item)
+RATIO_DEFINITIONS = {
+    'gross_margin': ('Gross Profit', 'Total Revenue'),
+    'operating_margin': ('Operating Income', 'Total Revenue'),
+    'net_margin': ('Net Income', 'Total Revenue'),
+    'roe': ('Net Income', 'Stockholders Equity'),
+    'roa': ('Net Income', 'Total Assets'),
+    'current_ratio': ('Current Assets', 'Current Liabilities'),
+    'debt_to_equity': ('Total Debt', 'Stockholders Equity'),
+    'asset_turnover': ('Total Revenue', 'Total Assets'),
+    'inventory_turnover': ('Cost Of Revenue', 'Inventory'),
+    'receivables_turnover': ('Total Revenue', 'Accounts Receivable'),
+    'fcf_margin': ('Free Cash Flow', 'Total Revenue'),
+    'fcf_conversion': ('Free Cash Flow', 'Net Income'),
+}
+
+def _empty_facts():
+    return pd.DataFrame({'ticker': pd.Series(dtype=object), 'statement': pd.Series(dtype=object),
+                         'item': pd.Series(dtype=object), 'period': pd.Series(dtype='datetime64[ns]'),
+                         'value': pd.Series(dtype=float)})
+
+def _empty_keys():
+    return pd.MultiIndex.from_arrays([pd.Index([], dtype=object), pd.DatetimeIndex([])],
+                                     names=['ticker', 'period'])
+
+def normalize_statement(ticker, statement, frame):
+    """Melt a yfinance statement (items x period columns) into long fact rows."""
+    if frame is None or frame.empty:
+        return _empty_facts()
+    long = frame.rename_axis('item').reset_index().melt(id_vars='item', var_name='period', value_name='value')
+    long['period'] = pd.to_datetime(long['period'])
+    long['value'] = pd.to_numeric(long['value'], errors='coerce')
+    long = long.dropna(subset=['value'])
+    long.insert(0, 'statement', statement)
+    long.insert(0, 'ticker', ticker)
+    return long[FACT_COLUMNS]
+
+def compute_ratios(facts):
+    """Ratio table indexed by (ticker, period), computed column-wise from long facts."""
+    wide = facts.pivot_table(index=['ticker', 'period'], columns='item', values='value', aggfunc='last')
+    ratios = {}
+    for name, (numerator, denominator) in RATIO_DEFINITIONS.items():
+        if numerator in wide and denominator in wide:
+            den = wide[denominator].to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratios[name] = np.where(den != 0, wide[numerator].to_numpy(dtype=float) / den, np.nan)
+        else:
+            ratios[name] = np.full(len(wide), np.nan)
+    return pd.DataFrame(ratios, index=wide.index)
+
+class StatementStore:
+    """Long/columnar warehouse of statement facts with precomputed ratio time series.
+
+    Facts are one row per (ticker, statement, item, period). Ratios are
+    recomputed on ingest only for the (ticker, period) pairs that changed
+    and kept sorted by (ticker, period), so history and cross-sectional
+    queries are index lookups. Both tables persist as Parquet in `path`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.facts = _empty_facts()
+        self.ratios = pd.DataFrame({name: pd.Series(dtype=float) for name in RATIO_DEFINITIONS},
+                                   index=_empty_keys())
+        if path and os.path.exists(os.path.join(path, 'facts.parquet')):
+            self.facts = pd.read_parquet(os.path.join(path, 'facts.parquet'))
+            self.ratios = pd.read_parquet(os.path.join(path, 'ratios.parquet'))
+
+    def ingest(self, ticker, income_stmt=None, balance_sheet=None, cashflow=None):
+        """Upsert one ticker's statements; returns the (ticker, period) keys whose ratios changed."""
+        return self._upsert(self._normalize(ticker, income_stmt, balance_sheet, cashflow))
+
+    def ingest_stock(self, stock):
+        """Ingest all three annual statements from a ticker-like object."""
+        return self.ingest(stock.ticker, stock.income_stmt, stock.balance_sheet, stock.cashflow)
+
+    def ingest_many(self, stocks):
+        """Ingest the annual statements of many ticker-like objects in one upsert.
+
+        Prefer this over repeated ingest_stock() when loading a universe:
+        the stored tables are merged, concatenated and sorted once per batch.
+        """
+        parts = [self._normalize(stock.ticker, stock.income_stmt, stock.balance_sheet, stock.cashflow)
+                 for stock in stocks]
+        parts = [part for part in parts if not part.empty]
+        return self._upsert(pd.concat(parts, ignore_index=True) if parts else _empty_facts())
+
+    @staticmethod
+    def _normalize(ticker, income_stmt, balance_sheet, cashflow):
+        frames = dict(zip(STATEMENTS, (income_stmt, balance_sheet, cashflow)))
+        parts = [normalize_statement(ticker, statement, frame)
+                 for statement, frame in frames.items() if frame is not None and not frame.empty]
+        return pd.concat(parts, ignore_index=True) if parts else _empty_facts()
+
+    def _upsert(self, new_facts):
+        if new_facts.empty:
+            return _empty_keys()
+        # Only the incoming tickers' rows are compared and rewritten
+        key_cols = ['ticker', 'statement', 'item', 'period']
+        in_batch = self.facts['ticker'].isin(new_facts['ticker'].unique())
+        existing = self.facts[in_batch]
+
+        # Skip periods that are already stored with identical values
+        merged = new_facts.merge(existing, on=key_cols, how='left', suffixes=('', '_old'))
+        changed = merged[merged['value'] != merged['value_old']]
+        if changed.empty:
+            return _empty_keys()
+
+        changed_keys = pd.MultiIndex.from_frame(changed[['ticker', 'period']].drop_duplicates())
+        replaced = pd.MultiIndex.from_frame(existing[key_cols]).isin(pd.MultiIndex.from_frame(new_facts[key_cols]))
+        batch_facts = pd.concat([existing[~replaced], new_facts], ignore_index=True)
+        others = self.facts[~in_batch]
+        self.facts = pd.concat([others, batch_facts], ignore_index=True) if len(others) else batch_facts
+
+        # Recompute ratios only for the touched (ticker, period) pairs
+        touched = pd.MultiIndex.from_frame(batch_facts[['ticker', 'period']]).isin(changed_keys)
+        new_ratios = compute_ratios(batch_facts[touched])
+        kept_ratios = self.ratios[~self.ratios.index.isin(changed_keys)]
+        self.ratios = (pd.concat([kept_ratios, new_ratios]) if len(kept_ratios) else new_ratios).sort_index()
+        return changed_keys
+
+    def ratio_history(self, ticker, ratios=None):
+        """Ratio time series for one ticker (periods as rows)."""
+        history = self.ratios.xs(ticker, level='ticker')
+        return history if ratios is None else history[ratios]
+
+    def cross_section(self, ratio, period=None):
+        """One ratio across all tickers, at `period` or each ticker's latest period."""
+        if period is not None:
+            return self.ratios.xs(pd.Timestamp(period), level='period')[ratio]
+        latest = self.ratios.groupby(level='ticker').tail(1)
+        return latest[ratio].droplevel('period')
+
+    def statement(self, ticker, statement):
+        """Rebuild a wide (items x periods) statement for one ticker from the facts."""
+        rows = self.facts[(self.facts['ticker'] == ticker) & (self.facts['statement'] == statement)]
+        return rows.pivot(index='item', columns='period', values='value').sort_index(axis=1, ascending=False)
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+        self.facts.to_parquet(os.path.join(path, 'facts.parquet'), index=False)
+        self.ratios.to_parquet(os.path.join(path, 'ratios.parquet'))
@@ -1,6 +1,26 @@
+import logging
+
+import numpy as np
 import pandas as pd
-import yfinance as yf
+from bulk_fetch import bulk_fetch
+from instrumentation import traced
+from peer_stats import get_peer_stats
+
+logger = logging.getLogger(__name__)
 
+# Comparison/screening metrics: display name -> (info key, display formatter)
+COMPARISON_METRICS = {
+    "Market Cap": ["marketCap", lambda x: f"${x:,.0f}"],
+    "P/E Ratio": ["trailingPE", lambda x: f"{x:.2f}"],
+    "Forward P/E": ["forwardPE", lambda x: f"{x:.2f}"],
+    "PEG Ratio": ["pegRatio", lambda x: f"{x:.2f}"],
+    "Price to Book": ["priceToBook", lambda x: f"{x:.2f}"],
+    "Dividend Yield": ["dividendYield", lambda x: f"{x*100:.2f}%"],
+    "Profit Margin": ["profitMargins", lambda x: f"{x*100:.2f}%"],
+    "Operating Margin": ["operatingMargins", lambda x: f"{x*100:.2f}%"]
+}
+
+@traced()
 def get_stock_info(stock):
     """Extract key stock information."""
     info = stock.info
@@ -18,27 +38,73 @@ def get_stock_info(stock):
         "52 Week Low": f"${info.get('fiftyTwoWeekLow', 0):.2f}"
     }
 
-def compare_stocks(ticker1, ticker2):
-    """Compare two stocks based on key metrics."""
-    stock1 = yf.Ticker(ticker1)
-    stock2 = yf.Ticker(ticker2)
-    
-    metrics = {
-        "Market Cap": ["marketCap", lambda x: f"${x:,}"],
-        "P/E Ratio": ["trailingPE", lambda x: f"{x:.2f}"],
-        "Forward P/E": ["forwardPE", lambda x: f"{x:.2f}"],
-        "PEG Ratio": ["pegRatio", lambda x: f"{x:.2f}"],
-        "Price to Book": ["priceToBook", lambda x: f"{x:.2f}"],
-        "Dividend Yield": ["dividendYield", lambda x: f"{x*100:.2f}%"],
-        "Profit Margin": ["profitMargins", lambda x: f"{x*100:.2f}%"],
-        "Operating Margin": ["operatingMargins", lambda x: f"{x*100:.2f}%"]
-    }
-    
-    comparison_data = {}
-    for metric, (key, formatter) in metrics.items():
-        comparison_data[metric] = {
-            ticker1: formatter(stock1.info.get(key, 0)),
-            ticker2: formatter(stock2.info.get(key, 0))
-        }
-    
-    return pd.DataFrame(comparison_data).T
+def build_metrics_frame(infos):
+    """Build one numeric DataFrame (ticker x info key) from {ticker: info dict}.
+
+    Missing or non-numeric values become NaN so the frame can be sorted,
+    filtered and ranked directly; formatting is left to format_metrics_frame.
+    """
+    keys = [key for key, _ in COMPARISON_METRICS.values()]
+    frame = pd.DataFrame.from_dict(
+        {ticker: {key: info.get(key) for key in keys} for ticker, info in infos.items()},
+        orient='index', columns=keys)
+    return frame.apply(pd.to_numeric, errors='coerce').astype(float)
+
+def load_metrics_frame(tickers, **fetch_kwargs):
+    """Fetch info for any number of tickers concurrently and build the numeric metrics frame."""
+    stocks, errors = bulk_fetch(tickers, fields=('info',), **fetch_kwargs)
+    return build_metrics_frame({ticker: stock.info for ticker, stock in stocks.items() if ticker not in errors})
+
+def screen_stocks(frame, expr=None, sort_by=None, ascending=True, top=None):
+    """Filter and sort a metrics frame.
+
+    `expr` is either a DataFrame.query string over the info keys
+    (e.g. "trailingPE < 15 and dividendYield > 0.02") or a boolean mask.
+    """
+    if expr is not None:
+        frame = frame.query(expr) if isinstance(expr, str) else frame[expr]
+    if sort_by is not None:
+        frame = frame.sort_values(sort_by, ascending=ascending, na_position='last')
+    if top is not None:
+        frame = frame.head(top)
+    return frame
+
+def rank_stocks(frame, weights):
+    """Composite percentile score from {info key: weight}.
+
+    A positive weight favours high values, a negative weight favours low
+    values (e.g. {'trailingPE': -1, 'profitMargins': 1}). Missing metrics
+    score as the median. Returns the frame with a 'score' column, best first.
+    """
+    score = np.zeros(len(frame))
+    for key, weight in weights.items():
+        pct = frame[key].rank(pct=True, ascending=weight > 0).fillna(0.5).to_numpy()
+        score += abs(weight) * pct
+    return frame.assign(score=score / sum(abs(w) for w in weights.values())).sort_values('score', ascending=False)
+
+def format_metrics_frame(frame, peer_medians=None):
+    """Render a numeric metrics frame as display strings (metrics as rows, tickers as columns).
+
+    With `peer_medians` (PeerStats.median_frame) each metric is followed by
+    a "(peer median)" row; tickers without enough peers show "N/A" there.
+    """
+    formatted = {}
+    for metric, (key, formatter) in COMPARISON_METRICS.items():
+        formatted[metric] = [formatter(value) for value in frame[key].fillna(0)]
+        if peer_medians is not None:
+            formatted[f"{metric} (peer median)"] = [
+                "N/A" if pd.isna(value) else formatter(value) for value in peer_medians[key].reindex(frame.index)]
+    return pd.DataFrame(formatted, index=frame.index).T
+
+def compare_stocks(*tickers, peers=None):
+    """Compare any number of stocks based on key metrics, with peer medians from the peer universe.
+
+    Tickers whose info could not be fetched are logged and left out.
+    """
+    peers = peers if peers is not None else get_peer_stats()
+    stocks, errors = bulk_fetch(tickers, fields=('info',))
+    for ticker, failed in errors.items():
+        logger.warning("Skipping %s: %s", ticker, next(iter(failed.values())))
+    infos = {ticker: stock.info for ticker, stock in stocks.items() if ticker not in errors}
+    frame = build_metrics_frame(infos)
+    return format_metrics_frame(frame, peers.median_frame(infos) if len(peers) else None)
@@ -1,13 +1,28 @@
-import altair as alt
+import json
+import logging
+
+import numpy as np
 import pandas as pd
 import streamlit as st
-import yfinance as yf
-import plotly.graph_objects as go
-from stock_analysis import get_stock_info, compare_stocks
-from valuation import calculate_dtf_valuation, get_valuation_points
-from financial_statements import display_financial_statements, get_color_style
-from visualization import create_metrics_pie_chart
-from dtf import calculate_advanced_dcf, calculate_wacc, get_risk_free_rate, get_industry_beta
+from financial_statements import PERIODS, display_financial_statements
+from dcf_scenarios import slider_axis, axis_index
+from dtf import FCF_BASES, RiskFreeRateUnavailable
+from page_graph import PageGraph
+from page_loader import PAGE_JOBS, render_as_ready, start_page_jobs
+from portfolio import aggregate_portfolio, read_holdings, value_positions
+from shared_fetch import get_shared_fetcher
+from valuation_ensemble import DEFAULT_WEIGHTS, blend, value_ensemble
+from valuation_snapshots import get_snapshot_store, is_default, monte_carlo_summary
+from visualization import create_risk_heatmap
+from instrumentation import RENDER, span, start_trace
+
+# Heavy/optional dependencies (plotly, yfinance, requests) are imported at first use,
+# see benchmarks/bench_startup.py for the tracked import and first-render times.
+
+logger = logging.getLogger(__name__)
+
+# Spans and counters for this script run (shown in the debug panel)
+tracer = start_trace()
 
 # Show the page title and description.
 st.set_page_config(page_title="Fundamental analysis", page_icon="&star;", layout="wide")
@@ -20,80 +35,347 @@ st.write(
     """
 )
 
-# Function to get stock data
-# @st.cache_data
-def get_stock_data(ticker):
-    stock = yf.Ticker(ticker)
-    return stock
+# DCF slider grids (the sliders index into results precomputed over these axes)
+GROWTH_STEP = 0.01
+PREMIUM_STEP = 0.01
+SHORT_GROWTH_AXIS = slider_axis(0.0, 0.3, GROWTH_STEP)
+LONG_GROWTH_AXIS = slider_axis(0.0, 0.1, GROWTH_STEP)
+PREMIUM_AXIS = slider_axis(0.04, 0.08, PREMIUM_STEP)
+PAGE_AXES = (SHORT_GROWTH_AXIS, LONG_GROWTH_AXIS, PREMIUM_AXIS)
+
+SINGLE_STOCK, PORTFOLIO = "Single stock", "Portfolio"
+MODES = (SINGLE_STOCK, PORTFOLIO)
+
+PERIOD_LABELS = {'annual': "Annual", 'quarterly': "Quarterly", 'ttm': "Trailing twelve months"}
+FCF_BASIS_LABELS = {'annual': "Latest annual", 'ttm': "Trailing twelve months"}
+
+ENSEMBLE_LABELS = {'dcf': "DCF", 'dtf': "DTF", 'pe_multiple': "Peer P/E", 'pb_multiple': "Peer P/B"}
+
+PORTFOLIO_COLUMNS = ['name', 'sector', 'shares', 'weight', 'current_price', 'fair_price', 'upside', 'wacc',
+                     'risk_bucket', 'error']
+PORTFOLIO_FORMATS = {'shares': '{:,.0f}', 'weight': '{:.2%}', 'current_price': '${:.2f}', 'fair_price': '${:.2f}',
+                     'upside': '{:.1%}', 'wacc': '{:.2%}'}
 
-stock_info={}
-stock={}
 if 'set_ticker' not in st.session_state:
     st.session_state.set_ticker = False
 
-if 'stock' not in st.session_state:
-    st.session_state.stock = {}
+# Background jobs of the analysed ticker (see page_loader.start_page_jobs)
+if 'page_jobs' not in st.session_state:
+    st.session_state.page_jobs = {}
 
- # Sidebar for input
-with st.sidebar:
-    st.header("Stock Selection")
-    ticker = st.text_input("Enter Stock Ticker:", value="").upper()
+# Precomputed default-assumption results of the analysed ticker, if any (see valuation_snapshots.py)
+if 'materialized' not in st.session_state:
+    st.session_state.materialized = None
+
+# Bumped on every "Analyze Stock" so a re-analysis refreshes all sections
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = 0
+
+# Page sections as a dependency graph memoized in session state: a rerun only
+# re-executes the nodes whose inputs changed (e.g. a slider move only reaches
+# the DCF lookup and its chart).
+graph = PageGraph(st.session_state)
+
+# The data nodes take their results from the background jobs started by "Analyze Stock";
+# once memoized, reruns no longer touch the jobs. With a precomputed snapshot row the
+# overview and the default-assumption DCF come from the row, and the scenarios job
+# only starts once a slider leaves the defaults.
+@graph.node('stock_info', inputs=('ticker', 'data_version'), uses=('jobs', 'materialized'))
+def stock_info_node(ticker, data_version, jobs, materialized):
+    if materialized is not None:
+        return materialized['stock_info']
+    return jobs['overview'].result()['stock_info']
+
+@graph.node('valuation_points', inputs=('ticker', 'data_version'), uses=('jobs', 'materialized'))
+def valuation_points_node(ticker, data_version, jobs, materialized):
+    if materialized is not None:
+        return materialized['valuation_points']
+    return jobs['overview'].result()['valuation_points']
+
+@graph.node('statements', inputs=('ticker', 'data_version'), uses=('jobs',))
+def statements_node(ticker, data_version, jobs):
+    return jobs['statements'].result()
+
+@graph.node('scenarios', inputs=('ticker', 'data_version'), uses=('jobs',))
+def scenarios_node(ticker, data_version, jobs):
+    return jobs['scenarios'].result()
+
+@graph.node('dcf', inputs=('ticker', 'data_version', 'short_term_growth', 'long_term_growth', 'market_risk_premium'),
+            uses=('jobs', 'materialized'))
+def dcf_node(ticker, data_version, short_term_growth, long_term_growth, market_risk_premium, jobs, materialized):
+    if materialized is not None and is_default(short_term_growth, long_term_growth, market_risk_premium):
+        return materialized['dcf']
+    scenarios = jobs['scenarios'].result()
+    premium_idx = axis_index(PREMIUM_AXIS, market_risk_premium)
+    result = {'wacc': scenarios['waccs'][premium_idx], 'adjusted_beta': scenarios['betas'][premium_idx],
+              'fair_price': None, 'projected_fcfs': None,
+              'current_price': jobs['stock'].result().info.get('currentPrice')}
+    if 'fair_prices' in scenarios:
+        grid_idx = (axis_index(SHORT_GROWTH_AXIS, short_term_growth), premium_idx,
+                    axis_index(LONG_GROWTH_AXIS, long_term_growth))
+        result['fair_price'] = scenarios['fair_prices'][grid_idx]
+        result['projected_fcfs'] = list(scenarios['projected_fcfs'][grid_idx])
+    return result
+
+# Per-model fair values; the blend weights are applied outside the node, so moving them is free
+@graph.node('ensemble', inputs=('ticker', 'data_version', 'short_term_growth', 'long_term_growth',
+                                 'market_risk_premium'), uses=('jobs', 'materialized'))
+def ensemble_node(ticker, data_version, short_term_growth, long_term_growth, market_risk_premium, jobs, materialized):
+    if materialized is not None and is_default(short_term_growth, long_term_growth, market_risk_premium):
+        return materialized['ensemble']
+    scenarios = jobs['scenarios'].result()
+    stock = jobs['stock'].result()
+    return value_ensemble({stock.ticker: stock}, scenarios['risk_free_rate'], short_term_growth, long_term_growth,
+                          market_risk_premium, scenarios.get('fcf_basis', 'annual'))
+
+@graph.node('dcf_chart', deps=('dcf',))
+def dcf_chart_node(dcf):
+    import plotly.graph_objects as go
+
+    fig_dcf = go.Figure()
+    fig_dcf.add_trace(go.Scatter(x=list(range(1, 11)), y=dcf['projected_fcfs'], 
+                               mode='lines+markers', name='Projected FCF'))
+    fig_dcf.update_layout(title="Projected Free Cash Flows (10 Years)", 
+                        xaxis_title="Year", yaxis_title="FCF ($)")
+    return fig_dcf
+
+# Monte Carlo at the default assumptions: stored as a histogram in snapshot rows
+@graph.node('monte_carlo', inputs=('ticker', 'data_version'), uses=('jobs', 'materialized'))
+def monte_carlo_node(ticker, data_version, jobs, materialized):
+    if materialized is not None:
+        return materialized.get('monte_carlo')
+    monte_carlo = jobs['scenarios'].result().get('monte_carlo')
+    return monte_carlo_summary(monte_carlo) if monte_carlo is not None else None
+
+@graph.node('monte_carlo_chart', deps=('monte_carlo',))
+def monte_carlo_chart_node(monte_carlo):
+    import plotly.graph_objects as go
+
+    counts, edges = monte_carlo['histogram']
+    return go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges)))
+
+# Portfolio mode: positions are valued once per set of tickers; editing share counts
+# only reruns the aggregation (and value_positions caches each ticker across runs).
+@graph.node('portfolio_positions', inputs=('holding_tickers', 'data_version', 'fcf_basis'))
+def portfolio_positions_node(holding_tickers, data_version, fcf_basis):
+    return value_positions(holding_tickers, fcf_basis=fcf_basis, fetch=get_shared_fetcher().get)
+
+@graph.node('portfolio', inputs=('holding_shares',), deps=('portfolio_positions',))
+def portfolio_node(holding_shares, portfolio_positions):
+    return aggregate_portfolio(dict(holding_shares), portfolio_positions)
 
-    if st.button("Analyze Stock"):
-        st.session_state.set_ticker=True
+def render_portfolio_page():
+    holdings = st.session_state.get('holdings')
+    if holdings is None:
+        st.subheader("Upload holdings (ticker, shares) to analyze a portfolio..")
+        return
+
+    st.subheader("Holdings")
+    edited = st.data_editor(holdings.reset_index(), num_rows='dynamic', hide_index=True,
+                            key=f"holdings_{st.session_state.data_version}")
+    edited = edited.dropna(subset=['ticker'])
+    shares = pd.to_numeric(edited['shares'], errors='coerce').fillna(0.0).groupby(
+        edited['ticker'].astype(str).str.strip().str.upper(), sort=False).sum()
+    if shares.empty:
+        st.info("No holdings: add rows with a ticker and a share count")
+        return
+    inputs = {'holding_tickers': tuple(shares.index), 'holding_shares': tuple(shares.items()),
+              'data_version': st.session_state.data_version, 'fcf_basis': st.session_state.portfolio_fcf_basis}
+    with st.spinner("Valuing positions..."):
         try:
-            with st.spinner('Fetching stock data...'):
-                # stock = yf.Ticker(ticker)
-                stock = get_stock_data(ticker)
-                st.session_state.stock=stock
-                info = stock.info
-                print(info)
-                # Store analysis data for export
-            stock_info = get_stock_info(stock)
-            valuation_points = get_valuation_points(stock)
+            portfolio = graph.get('portfolio', **inputs)
+        except RiskFreeRateUnavailable as e:
+            st.error(str(e))
+            return
+
+    summary = portfolio['summary']
+    columns = st.columns(4)
+    columns[0].metric("Market Value", f"${summary['market_value']:,.0f}")
+    columns[1].metric("DCF Fair Value", f"${summary['fair_value']:,.0f}")
+    columns[2].metric("Weighted Upside", f"{summary['weighted_upside']:.1%}")
+    columns[3].metric("Effective Positions", f"{summary['effective_positions']:.1f}")
+    st.write(f"{summary['valued_positions']} of {summary['positions']} positions valued "
+             f"({summary['valued_weight']:.1%} of market value); "
+             f"top 10 weight {summary['top_weight']:.1%}, weighted WACC {summary['weighted_wacc']:.2%}")
 
+    st.subheader("Sector Exposure")
+    st.bar_chart(portfolio['sector_exposure'])
+    st.subheader("Risk Concentration (share of market value)")
+    st.dataframe(portfolio['risk_exposure'].style.format('{:.1%}'), use_container_width=True)
+    if len(portfolio['risk_scores']):
+        st.plotly_chart(create_risk_heatmap(portfolio['risk_scores']), use_container_width=True)
+    st.subheader("Positions")
+    st.dataframe(portfolio['positions'][PORTFOLIO_COLUMNS].style.format(PORTFOLIO_FORMATS, na_rep='-'),
+                 use_container_width=True)
+
+# Renders a section into its placeholder, or the error of the job it depends on
+def render_section(slot, title, render):
+    with slot.container(), span(title, RENDER):
+        try:
+            render()
         except Exception as e:
-            print(e)
-            st.error(f"Error analyzing stock: {str(e)}")
+            logger.exception("%s failed", title)
+            st.error(f"Error loading {title.lower()}: {str(e)}")
+
+ # Sidebar for input
+with st.sidebar:
+    mode = st.radio("Mode", MODES, horizontal=True)
+    fcf_basis = st.radio("DCF starting free cash flow", FCF_BASES, format_func=FCF_BASIS_LABELS.get,
+                         help="Trailing twelve months sums the last four reported quarters")
 
-if st.session_state.set_ticker:
+    if mode == SINGLE_STOCK:
+        st.header("Stock Selection")
+        ticker = st.text_input("Enter Stock Ticker:", value="").upper()
+
+        if st.button("Analyze Stock"):
+            if ticker:
+                # Info, statements, the risk-free rate and WACC/DCF inputs are fetched in
+                # parallel in the background; each section below appears as its data lands.
+                # Fetches go through a process-wide fetcher, so concurrent sessions analysing
+                # the same ticker share one upstream call (see shared_fetch.py).
+                st.session_state.set_ticker = True
+                st.session_state.ticker = ticker
+                st.session_state.data_version += 1
+                st.session_state.page_fcf_basis = fcf_basis
+                # A current snapshot row replaces the overview and DCF scenario jobs at default values
+                st.session_state.materialized = get_snapshot_store().current(ticker, fcf_basis)
+                st.session_state.page_jobs = start_page_jobs(
+                    ticker, PAGE_AXES, fcf_basis=fcf_basis,
+                    only=('stock', 'statements') if st.session_state.materialized is not None else PAGE_JOBS)
+            else:
+                st.error("Enter a ticker to analyze")
+    else:
+        st.header("Portfolio")
+        holdings_file = st.file_uploader("Holdings CSV (ticker, shares)", type='csv')
+
+        if st.button("Analyze Portfolio"):
+            if holdings_file is not None:
+                try:
+                    st.session_state.holdings = read_holdings(holdings_file)
+                    st.session_state.portfolio_fcf_basis = fcf_basis
+                    st.session_state.data_version += 1
+                except (ValueError, KeyError) as e:
+                    st.error(f"Could not read holdings: {e}")
+            else:
+                st.error("Upload a holdings CSV to analyze")
+
+    show_debug_panel = st.checkbox("Show performance panel", value=False)
+
+if mode == PORTFOLIO:
+    render_portfolio_page()
+elif st.session_state.set_ticker:
 # Main content area with two columns
     with st.container():
-        stock = st.session_state.stock
-        st.subheader("Basic Stock Information")
-        info_df = pd.DataFrame(list(stock_info.items()), columns=["Metric", "Value"])
-        st.dataframe(info_df, use_container_width=True, hide_index=True)
+        jobs = st.session_state.page_jobs
+        materialized = st.session_state.materialized
+        page_inputs = {'ticker': st.session_state.ticker, 'data_version': st.session_state.data_version,
+                       'jobs': jobs, 'materialized': materialized}
+        needs = {'info': [] if materialized is not None else ['overview'], 'statements': ['statements'],
+                 'dcf': [] if materialized is not None else ['scenarios', 'stock']}
 
-        # Financial Statements Section
+        # Placeholders in page order, filled in whichever order the data arrives
+        st.subheader("Basic Stock Information")
+        info_slot = st.empty()
         st.subheader("Financial Statements Analysis")
-        display_financial_statements(stock)
-        
+        statements_slot = st.empty()
         st.subheader("Advanced DCF Valuation with WACC")
-        risk_free_rate = get_risk_free_rate()
-        st.write(f"Current Risk-Free Rate (10Y Treasury): {risk_free_rate:.2%}")
+        dcf_slot = st.empty()
+        for slot, section in ((info_slot, 'info'), (statements_slot, 'statements'), (dcf_slot, 'dcf')):
+            if not all(jobs[job].done() for job in needs[section]):
+                slot.info("Loading...")
 
-        short_term_growth = st.slider("Short-term Growth Rate (5 years)", 0.0, 0.3, 0.1)
-        long_term_growth = st.slider("Long-term Growth Rate", 0.0, 0.1, 0.02)
-        market_risk_premium = st.slider("Market Risk Premium", 0.04, 0.08, 0.06)
-        
-        wacc, adjusted_beta = calculate_wacc(stock, risk_free_rate, market_risk_premium)
-        st.write(f"Adjusted Beta (Company + Industry): {adjusted_beta:.2f}")
-        st.write(f"Calculated WACC: {wacc:.2%}")
-        
-        fair_price, projected_fcfs, wacc = calculate_advanced_dcf(stock, short_term_growth, 
-                                                                long_term_growth, wacc)
-    
-        if fair_price:
-            st.write(f"Current Price: ${stock.info['currentPrice']:.2f}")
-            # st.write(f"Potential Upside/Downside: {((fair_price/stock.info['currentPrice'])-1)*100:.2f}%")
-            st.metric("Estimated Fair Value (DTF)", f"${fair_price:.2f}", f"{((fair_price/stock.info['currentPrice'])-1)*100:.2f}%")
-           
-            fig_dcf = go.Figure()
-            fig_dcf.add_trace(go.Scatter(x=list(range(1, 11)), y=projected_fcfs, 
-                                       mode='lines+markers', name='Projected FCF'))
-            fig_dcf.update_layout(title="Projected Free Cash Flows (10 Years)", 
-                                xaxis_title="Year", yaxis_title="FCF ($)")
-            st.plotly_chart(fig_dcf)
+        def render_info():
+            stock_info = graph.get('stock_info', **page_inputs)
+            info_df = pd.DataFrame(list(stock_info.items()), columns=["Metric", "Value"])
+            st.dataframe(info_df, use_container_width=True, hide_index=True)
+
+        def render_statements():
+            statements = graph.get('statements', **page_inputs)
+            period = st.radio("Period", PERIODS, format_func=PERIOD_LABELS.get, horizontal=True)
+            display_financial_statements(None, statements[period])
+
+        def render_dcf():
+            # WACC for every premium and the full DCF grid are precomputed once per ticker
+            # by the scenarios job; slider moves only index into them. A snapshot row covers
+            # the default values without it. The header is filled in after the sliders, so
+            # the rate and warnings shown come from the same run as the DCF.
+            header = st.container()
+            short_term_growth = st.slider("Short-term Growth Rate (5 years)", 0.0, 0.3, 0.1, step=GROWTH_STEP)
+            long_term_growth = st.slider("Long-term Growth Rate", 0.0, 0.1, 0.02, step=GROWTH_STEP)
+            market_risk_premium = st.slider("Market Risk Premium", 0.04, 0.08, 0.06, step=PREMIUM_STEP)
+            page_inputs.update(short_term_growth=short_term_growth, long_term_growth=long_term_growth,
+                               market_risk_premium=market_risk_premium)
+            precomputed = materialized is not None and is_default(short_term_growth, long_term_growth,
+                                                                  market_risk_premium)
+            if not precomputed and 'scenarios' not in jobs:
+                jobs.update(start_page_jobs(st.session_state.ticker, PAGE_AXES,
+                                            fcf_basis=st.session_state.page_fcf_basis, only=('scenarios',)))
+            if precomputed:
+                scenarios = materialized
+            else:
+                with st.spinner("Computing DCF scenarios..."):
+                    scenarios = graph.get('scenarios', **page_inputs)
+
+            with header:
+                if precomputed:
+                    st.caption(f"Precomputed for the default assumptions as of {materialized['as_of']}; "
+                               "moving a slider computes live")
+                st.write(f"Current Risk-Free Rate (10Y Treasury): {scenarios['risk_free_rate']:.2%}")
+                if 'latest_fcf' in scenarios:
+                    st.write(f"Starting Free Cash Flow ({FCF_BASIS_LABELS[scenarios['fcf_basis']]}): "
+                             f"${scenarios['latest_fcf']:,.0f}")
+
+            for warning in scenarios['wacc_warnings']:
+                st.warning(warning)
+            dcf = graph.get('dcf', **page_inputs)
+            st.write(f"Adjusted Beta (Company + Industry): {dcf['adjusted_beta']:.2f}")
+            st.write(f"Calculated WACC: {dcf['wacc']:.2%}")
+
+            fair_price = dcf['fair_price']
+            if fair_price is not None and np.isnan(fair_price):
+                fair_price = None
+                st.warning("Long-term growth must be below WACC for a terminal value")
+
+            if fair_price:
+                current_price = dcf['current_price']
+                st.write(f"Current Price: ${current_price:.2f}")
+                # st.write(f"Potential Upside/Downside: {((fair_price/current_price)-1)*100:.2f}%")
+                st.metric("Estimated Fair Value (DTF)", f"${fair_price:.2f}", f"{((fair_price/current_price)-1)*100:.2f}%")
+                st.plotly_chart(graph.get('dcf_chart', **page_inputs))
+
+            with st.expander("Valuation model ensemble"):
+                ensemble = graph.get('ensemble', **page_inputs)
+                fair_values = ensemble[list(ENSEMBLE_LABELS)]
+                columns = st.columns(len(ENSEMBLE_LABELS))
+                weights = {name: column.slider(f"{label} weight", 0.0, 1.0, DEFAULT_WEIGHTS[name], step=0.05)
+                           for column, (name, label) in zip(columns, ENSEMBLE_LABELS.items())}
+                blended = blend(fair_values, weights).iloc[0]
+                current_price = ensemble['current_price'].iloc[0]
+                if np.isfinite(blended) and current_price:
+                    st.metric("Blended Fair Value", f"${blended:.2f}", f"{(blended / current_price - 1) * 100:.2f}%")
+                else:
+                    st.warning("No model with a positive weight produced a fair value")
+                st.dataframe(pd.DataFrame({'Model': list(ENSEMBLE_LABELS.values()),
+                                           'Fair Value': [f"${v:.2f}" if np.isfinite(v) else "n/a"
+                                                          for v in fair_values.iloc[0]],
+                                           'Weight': [f"{w:.2f}" for w in weights.values()]}),
+                             hide_index=True)
+
+            monte_carlo = graph.get('monte_carlo', **page_inputs)
+            if monte_carlo is not None:
+                with st.expander("Monte Carlo fair value distribution (default assumptions)"):
+                    st.write(f"{monte_carlo['valid_samples']:,} samples, mean ${monte_carlo['mean']:.2f}")
+                    st.dataframe(pd.DataFrame({'Percentile': [f"P{p}" for p in monte_carlo['percentiles']],
+                                               'Fair Value': [f"${v:.2f}" for v in monte_carlo['percentiles'].values()]}),
+                                 hide_index=True)
+                    st.plotly_chart(graph.get('monte_carlo_chart', **page_inputs))
+
+        render_as_ready(jobs, {
+            'info': (needs['info'], lambda: render_section(info_slot, "Basic stock information", render_info)),
+            'statements': (needs['statements'],
+                           lambda: render_section(statements_slot, "Financial statements", render_statements)),
+            'dcf': (needs['dcf'], lambda: render_section(dcf_slot, "DCF valuation", render_dcf)),
+        })
         # try:
         #     dtf_value = calculate_dtf_valuation(stock)
         #     current_price = info['currentPrice']
@@ -153,6 +435,18 @@ else:
         # st.subheader("Current Valuation")
         
 
+# Per-section latency breakdown for this run (sidebar "Show performance panel")
+if show_debug_panel:
+    with st.expander("Performance", expanded=True):
+        st.write("Counters: " + (", ".join(f"{name} = {value}" for name, value in sorted(tracer.counters.items()))
+                                 or "none"))
+        shared_stats = get_shared_fetcher().stats()['snapshot']
+        st.write(f"Shared fetcher (all sessions): {shared_stats['requests']} snapshot requests, "
+                 f"{shared_stats['upstream_calls']} upstream, {shared_stats['dedup_rate']:.0%} deduplicated")
+        st.dataframe(tracer.summary().round(2), use_container_width=True)
+        st.download_button("Download Chrome trace", json.dumps(tracer.to_chrome_trace()),
+                           file_name="trace.json", mime="application/json")
+
 # Load the data from a CSV. We're caching this so it doesn't reload every time the app
 # reruns (e.g. if the user interacts with the widgets).
 # @st.cache_data
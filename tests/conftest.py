@@ -0,0 +1,53 @@
+"""Shared fixtures: every test runs offline against stub providers and in-memory caches."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_cache
+import data_provider
+import peer_stats
+from data_cache import FundamentalsCache
+from peer_stats import PeerStats
+
+class StubProvider:
+    """Serves {ticker: {field: value}}; a value that is an exception is raised instead."""
+
+    cached = True
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def fetch(self, ticker, field):
+        self.calls.append((ticker, field))
+        value = self.data[ticker][field]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FundamentalsCache(':memory:')
+    monkeypatch.setattr(data_cache, '_default_cache', cache)
+    return cache
+
+@pytest.fixture
+def peers(monkeypatch):
+    """An empty process-wide PeerStats that is never reloaded from disk."""
+    peers = PeerStats()
+    monkeypatch.setattr(peer_stats, '_peer_stats', peers)
+    monkeypatch.setattr(peer_stats, '_peer_stats_checked', float('inf'))
+    return peers
+
+@pytest.fixture
+def provider(monkeypatch, cache, peers):
+    """Install a StubProvider as the process-wide data provider; call it with the data to serve."""
+    def install(data):
+        stub = StubProvider(data)
+        monkeypatch.setattr(data_provider, '_provider', stub)
+        return stub
+    return install
@@ -0,0 +1,80 @@
+import sys
+import time
+import types
+
+import pytest
+
+import bulk_fetch
+import data_provider
+from bulk_fetch import TokenBucket, bulk_fetch as fetch_many, call_with_retry, is_transient
+
+class _HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = types.SimpleNamespace(status_code=status)
+
+@pytest.mark.parametrize('error, transient', [
+    (TimeoutError(), True), (ConnectionError(), True), (_HTTPError(429), True), (_HTTPError(503), True),
+    (_HTTPError(404), False), (KeyError('info'), False), (ValueError(), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+def test_call_with_retry_retries_only_transient_errors():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _HTTPError(503)
+        return 'ok'
+
+    assert call_with_retry(flaky, retries=3, backoff=0) == 'ok' and len(attempts) == 3
+
+    attempts.clear()
+    def missing():
+        attempts.append(1)
+        raise _HTTPError(404)
+
+    with pytest.raises(_HTTPError):
+        call_with_retry(missing, retries=3, backoff=0)
+    assert len(attempts) == 1
+
+def test_bulk_fetch_reports_failures_per_field(cache):
+    def fetch(ticker, field):
+        if ticker == 'BAD' and field == 'financials':
+            raise KeyError(field)
+        return {'ticker': ticker, 'field': field}
+
+    stocks, errors = fetch_many(['good', 'bad', 'GOOD'], fields=('info', 'financials'), fetch=fetch, backoff=0)
+    assert list(stocks) == ['GOOD', 'BAD']
+    assert stocks['GOOD'].info == {'ticker': 'GOOD', 'field': 'info'}
+    assert list(errors) == ['BAD'] and list(errors['BAD']) == ['financials']
+
+def test_live_provider_charges_the_rate_limiter_once_per_ticker(monkeypatch):
+    class Ticker:
+        def __init__(self, symbol):
+            self.info, self.financials, self.cashflow = {'symbol': symbol}, None, None
+
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(Ticker=Ticker))
+    limiter = TokenBucket(1000)
+    acquired = []
+    monkeypatch.setattr(limiter, 'acquire', lambda: acquired.append(1))
+    monkeypatch.setattr(bulk_fetch, '_rate_limiter', limiter)
+
+    provider = data_provider.LiveProvider()
+    for ticker in ('AAA', 'BBB'):
+        for field in ('info', 'financials', 'cashflow'):
+            provider.fetch(ticker, field)
+    assert len(acquired) == 2
+
+    monkeypatch.setattr(data_provider, 'TICKER_CHARGE_WINDOW', 0)
+    provider.fetch('AAA', 'info')
+    assert len(acquired) == 3
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=200, capacity=1)
+    start = time.monotonic()
+    for _ in range(21):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from dcf_scenarios import dcf_sensitivity_grid, monte_carlo_dcf
+from dtf import batch_advanced_dcf
+
+ARGS = (1e9, 2e8, 1e7, 0.1, 0.02, 0.09)
+
+def test_monte_carlo_is_reproducible_for_a_seed():
+    once = monte_carlo_dcf(*ARGS, n_samples=10_000, seed=7, chunk_size=10_000)
+    again = monte_carlo_dcf(*ARGS, n_samples=10_000, seed=7, chunk_size=10_000)
+    np.testing.assert_array_equal(once['fair_prices'], again['fair_prices'])
+    chunked = monte_carlo_dcf(*ARGS, n_samples=10_000, seed=7, chunk_size=3_000)
+    assert chunked['total_samples'] == 10_000
+    assert 0 < chunked['valid_samples'] <= 10_000
+
+def test_monte_carlo_drops_invalid_draws():
+    result = monte_carlo_dcf(*ARGS, n_samples=5_000, seed=1, wacc_std=0.05)
+    assert result['valid_samples'] < result['total_samples']
+    assert np.isfinite(result['fair_prices']).all()
+    assert result['percentiles'][5] <= result['percentiles'][50] <= result['percentiles'][95]
+
+def test_monte_carlo_without_shares_has_no_valid_samples():
+    result = monte_carlo_dcf(1e9, 2e8, 0, 0.1, 0.02, 0.09, n_samples=1_000, seed=0)
+    assert result['valid_samples'] == 0
+    assert np.isnan(result['mean']) and np.isnan(result['std'])
+    assert all(np.isnan(value) for value in result['percentiles'].values())
+
+@pytest.mark.parametrize('n_samples, chunk_size', [(0, 50_000), (-5, 50_000), (100, 0)])
+def test_monte_carlo_rejects_empty_runs(n_samples, chunk_size):
+    with pytest.raises(ValueError):
+        monte_carlo_dcf(*ARGS, n_samples=n_samples, chunk_size=chunk_size)
+
+def test_sensitivity_grid_matches_point_dcf_and_masks_infinite_terminal_values():
+    short, waccs, long = [0.05, 0.1], [0.02, 0.08, 0.1], [0.01, 0.03]
+    prices, projected = dcf_sensitivity_grid(1e9, 2e8, 1e7, short, waccs, long)
+    assert prices.shape == (2, 3, 2) and projected.shape == (2, 3, 2, 10)
+    expected, _ = batch_advanced_dcf(1e9, 0.1, 0.03, 0.08, 2e8, 1e7)
+    assert prices[1, 1, 1] == pytest.approx(expected[0])
+    assert np.isnan(prices[:, 0, 1]).all()  # terminal growth 3% >= WACC 2%
+    assert np.isfinite(prices[:, 0, 0]).all()
@@ -0,0 +1,54 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+import financial_statements
+from financial_statements import format_currency, format_currency_frame, format_statement, get_color_style
+
+def _statement(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.choice([-3e9, -2e6, 0.0, 5.5, 4e6, 7e10, np.nan], size=(4, 3))
+    return pd.DataFrame(values, index=[f'Item {i}' for i in range(4)],
+                        columns=pd.to_datetime(['2023-12-31', '2022-12-31', '2021-12-31']))
+
+def test_format_statement_matches_per_cell_formatting():
+    frame = _statement(0)
+    formatted, styles = format_statement(frame)
+    pd.testing.assert_frame_equal(formatted, frame.apply(lambda column: column.map(format_currency)),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(styles, frame.apply(lambda column: column.map(get_color_style)),
+                                  check_dtype=False)
+
+def test_format_cache_is_safe_under_concurrent_eviction(monkeypatch):
+    # A cache smaller than the working set makes every thread hit, insert and evict
+    monkeypatch.setattr(financial_statements, '_FORMAT_CACHE', financial_statements.OrderedDict())
+    monkeypatch.setattr(financial_statements, '_FORMAT_CACHE_SIZE', 4)
+    frames = [_statement(seed) for seed in range(12)]
+    expected = [format_currency_frame(frame) for frame in frames]
+    errors = []
+
+    def render(offset):
+        try:
+            for i in range(300):
+                index = (i + offset) % len(frames)
+                formatted, _ = format_statement(frames[index])
+                if not formatted.equals(expected[index]):
+                    errors.append(f"wrong result for frame {index}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=render, args=(offset,)) for offset in range(16)]
+    # Switch threads as often as possible so unguarded read-modify-write sequences interleave
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert len(financial_statements._FORMAT_CACHE) <= 4
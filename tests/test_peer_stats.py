@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dtf
+from peer_stats import PeerStats
+
+def _infos(prefix, sector, industry, n=6, beta=1.0):
+    return {f'{prefix}{i}': {'sector': sector, 'industry': industry, 'beta': beta + i / 10, 'marketCap': 1e9,
+                             'totalDebt': 1e8, 'trailingPE': 10.0 + i, 'effectiveTaxRate': 0.2}
+            for i in range(n)}
+
+@pytest.fixture
+def universe():
+    return {**_infos('T', 'Technology', 'Software'), **_infos('E', 'Energy', 'Oil & Gas', beta=0.8)}
+
+def test_update_bumps_version_only_when_rows_change(universe):
+    peers = PeerStats.from_infos(universe)
+    version = peers.version
+    assert not peers.update({'T0': universe['T0']})
+    assert peers.version == version
+    assert peers.update({'T0': dict(universe['T0'], trailingPE=50.0)})
+    assert peers.version == version + 1
+
+def test_update_recomputes_only_the_touched_groups(universe):
+    peers = PeerStats.from_infos(universe)
+    energy = peers.group('industry', 'Oil & Gas')
+    peers.update({'T0': dict(universe['T0'], trailingPE=50.0)})
+    assert peers.group('industry', 'Oil & Gas') is energy
+    assert peers.stat('trailingPE', 'Technology', 'Software') == np.median([50.0, 11, 12, 13, 14, 15])
+
+def test_update_moves_a_ticker_between_groups(universe):
+    peers = PeerStats.from_infos(universe)
+    peers.update({'T0': dict(universe['T0'], sector='Energy', industry='Oil & Gas')})
+    assert peers.group('industry', 'Software')['count'] == 5
+    assert peers.group('industry', 'Oil & Gas')['count'] == 7
+
+def test_observe_ignores_non_members(universe):
+    peers = PeerStats.from_infos(universe)
+    version = peers.version
+    assert not peers.observe('XYZ', universe['T0'])
+    assert peers.version == version and 'XYZ' not in peers.universe.index
+
+def test_groups_below_min_peers_fall_back_to_the_sector(universe):
+    peers = PeerStats.from_infos({**universe, 'N0': dict(universe['T0'], industry='Niche')})
+    assert peers.stat('trailingPE', 'Technology', 'Niche') == peers.group('sector', 'Technology')['trailingPE']['median']
+    assert peers.stat('trailingPE', 'Unknown', 'Niche', default=20) == 20
+
+def test_industry_beta_with_null_tax_rate_uses_the_default(universe):
+    peers = PeerStats.from_infos(universe)
+    info = {'sector': 'Technology', 'industry': 'Software', 'totalDebt': 1e8, 'marketCap': 1e9}
+    assert peers.industry_beta(dict(info, effectiveTaxRate=None)) == pytest.approx(peers.industry_beta(info))
+
+class _Stock:
+    def __init__(self, ticker, info):
+        self.ticker, self.info, self.financials = ticker, info, pd.DataFrame()
+
+    def data_timestamp(self, fields):
+        return 1.0
+
+def test_wacc_components_survive_unrelated_peer_updates(universe, peers, monkeypatch):
+    monkeypatch.setattr(dtf, '_component_cache', dtf.OrderedDict())
+    monkeypatch.setattr(dtf, '_component_stats', {'hits': 0, 'misses': 0})
+    peers.update(universe)
+    stock = _Stock('E0', universe['E0'])
+    first = dtf.get_wacc_components(stock)
+
+    # Another group's betas, and this group's non-beta metrics, do not affect the components
+    peers.update({'T1': dict(universe['T1'], beta=3.0), 'E1': dict(universe['E1'], trailingPE=99.0)})
+    assert dtf.get_wacc_components(stock) is first
+    assert dtf._component_stats == {'hits': 1, 'misses': 1}
+
+    peers.update({'E1': dict(universe['E1'], beta=3.0)})
+    assert dtf.get_wacc_components(stock).industry_beta != first.industry_beta
+    assert dtf._component_stats == {'hits': 1, 'misses': 2}
@@ -0,0 +1,29 @@
+import logging
+
+from stock_analysis import build_metrics_frame, compare_stocks, rank_stocks, screen_stocks
+
+INFOS = {
+    'AAA': {'marketCap': 3e12, 'trailingPE': 30.0, 'profitMargins': 0.25, 'dividendYield': 0.005},
+    'BBB': {'marketCap': 2e11, 'trailingPE': 12.0, 'profitMargins': 0.1, 'dividendYield': 0.03},
+    'CCC': {'marketCap': 5e9, 'trailingPE': 'n/a', 'profitMargins': None},
+}
+
+def test_compare_stocks_skips_and_logs_failed_tickers(provider, peers, caplog):
+    stub = provider({'AAA': {'info': INFOS['AAA']}, 'BBB': {'info': KeyError('no such ticker')},
+                     'CCC': {'info': INFOS['CCC']}})
+    with caplog.at_level(logging.WARNING, logger='stock_analysis'):
+        table = compare_stocks('aaa', 'bbb', 'ccc', peers=peers)
+    assert list(table.columns) == ['AAA', 'CCC']
+    assert table.loc['Market Cap', 'AAA'] == '$3,000,000,000,000'
+    assert 'BBB' in caplog.text
+    # Non-transient failures are not retried and nothing is fetched twice
+    assert stub.calls.count(('BBB', 'info')) == 1
+    assert stub.calls.count(('AAA', 'info')) == 1
+
+def test_metrics_frame_is_numeric_and_screenable():
+    frame = build_metrics_frame(INFOS)
+    assert frame.loc['CCC'].drop('marketCap').isna().all()
+    cheap = screen_stocks(frame, 'trailingPE < 20')
+    assert list(cheap.index) == ['BBB']
+    ranked = rank_stocks(frame, {'trailingPE': -1, 'profitMargins': 1})
+    assert ranked.index[0] in ('AAA', 'BBB') and ranked.index[-1] == 'CCC'
@@ -1,60 +1,85 @@
-def calculate_dtf_valuation(stock):
-    """Calculate Discounted Cash Flow (DTF) valuation with comprehensive financial data."""
-    info = stock.info
-
-    # Get comprehensive financial data
-    free_cash_flow = info.get('freeCashflow', 0)
-    operating_cash_flow = info.get('operatingCashflow', 0)
-    historical_growth = info.get('earningsGrowth', 0)
-    profit_margin = info.get('profitMargins', 0)
+import numpy as np
+
+from dtf import discount_factors
+from instrumentation import traced
+from peer_stats import get_peer_stats
+
+# Info fields the DTF model reads, with the defaults used when a field is missing
+DTF_FIELDS = {
+    'freeCashflow': 0, 'operatingCashflow': 0, 'earningsGrowth': 0, 'profitMargins': 0, 'beta': 1,
+    'debtToEquity': 0, 'sharesOutstanding': 1, 'returnOnEquity': 0, 'currentRatio': 0,
+}
+DTF_YEARS = 5
+
+def _to_float(value, default):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if np.isnan(value) else value
+
+def dtf_columns(infos):
+    """Column arrays of DTF_FIELDS (missing or non-numeric values take the field default) for a list of info dicts."""
+    return {key: np.array([_to_float(info.get(key, default), default) for info in infos], dtype=float)
+            for key, default in DTF_FIELDS.items()}
+
+def dtf_discount_rates(columns):
+    """Risk-adjusted discount rate: 10% base, +2% for beta > 1.5, +1% for debt/equity > 2."""
+    beta = np.asarray(columns['beta'], dtype=float)
+    debt_to_equity = np.asarray(columns['debtToEquity'], dtype=float)
+    return 0.1 + np.where(beta > 1.5, 0.02, 0) + np.where(debt_to_equity > 2, 0.01, 0)
+
+def batch_dtf_valuation(columns, discount=None):
+    """DTF fair values for many tickers in one NumPy pass (calculate_dtf_valuation is the one-ticker case).
+
+    `columns` maps each DTF_FIELDS key to an array (a DataFrame works);
+    `discount` may pass precomputed (N, DTF_YEARS) factors for
+    dtf_discount_rates(columns), e.g. shared with other models.
+    """
+    col = {key: np.asarray(columns[key], dtype=float) for key in DTF_FIELDS}
+    profit_margin = col['profitMargins']
 
     # Use the better of operating cash flow or free cash flow
-    base_cash_flow = max(free_cash_flow, operating_cash_flow)
-
-    # Adjust growth rate based on historical performance and margins
-    base_growth_rate = historical_growth if historical_growth > 0 else 0.1
-    adjusted_growth_rate = min(base_growth_rate * (1 + profit_margin), 0.15)  # Cap at 15%
+    base_cash_flow = np.maximum(col['freeCashflow'], col['operatingCashflow'])
 
-    # Risk-adjusted discount rate based on company metrics
-    base_discount_rate = 0.1  # 10% base rate
-    risk_premium = 0.02 if info.get('beta', 1) > 1.5 else 0  # Add premium for high beta
-    debt_premium = 0.01 if info.get('debtToEquity', 0) > 2 else 0  # Add premium for high debt
-    discount_rate = base_discount_rate + risk_premium + debt_premium
+    # Adjust growth rate based on historical performance and margins, capped at 15%
+    base_growth_rate = np.where(col['earningsGrowth'] > 0, col['earningsGrowth'], 0.1)
+    adjusted_growth_rate = np.minimum(base_growth_rate * (1 + profit_margin), 0.15)
 
-    # Project cash flows for 5 years with adjusted growth
-    projected_cf = []
-    for i in range(1, 6):
-        cf = base_cash_flow * (1 + adjusted_growth_rate)**i
-        projected_cf.append(cf)
+    discount_rate = dtf_discount_rates(col)
+    if discount is None:
+        discount = discount_factors(discount_rate, DTF_YEARS)
 
-    # Calculate terminal value with conservative growth
-    terminal_growth = min(0.03, adjusted_growth_rate / 2)  # More conservative terminal growth
-    terminal_value = (projected_cf[-1] * (1 + terminal_growth)) / (discount_rate - terminal_growth)
+    # Project cash flows for 5 years; (1 + g) ** year is the same table as a discount factor
+    projected_cf = base_cash_flow[:, None] * discount_factors(adjusted_growth_rate, DTF_YEARS)
 
-    # Calculate present value of projected cash flows
-    present_value = 0
-    for i, cf in enumerate(projected_cf):
-        present_value += cf / (1 + discount_rate)**(i+1)
+    # Terminal value with conservative growth
+    terminal_growth = np.minimum(0.03, adjusted_growth_rate / 2)
+    terminal_value = (projected_cf[:, -1] * (1 + terminal_growth)) / (discount_rate - terminal_growth)
 
-    # Add present value of terminal value
-    present_value += terminal_value / (1 + discount_rate)**5
+    # Present value of the projected cash flows (summed in order) plus the terminal value
+    present_value = np.cumsum(projected_cf / discount, axis=1)[:, -1]
+    present_value += terminal_value / discount[:, -1]
 
-    # Calculate per share value with margin of safety
-    shares_outstanding = info.get('sharesOutstanding', 1)
-    fair_value = present_value / shares_outstanding
+    fair_value = present_value / col['sharesOutstanding']
 
-    # Apply a margin of safety based on company quality metrics
+    # Margin of safety from company quality metrics: 70-100%
     quality_score = (
-        (1 if info.get('returnOnEquity', 0) > 0.15 else 0) +  # Good ROE
-        (1 if info.get('currentRatio', 0) > 1.5 else 0) +     # Good liquidity
-        (1 if info.get('debtToEquity', 0) < 1 else 0) +       # Low debt
-        (1 if profit_margin > 0.1 else 0)                      # Good margins
+        (col['returnOnEquity'] > 0.15).astype(int) +  # Good ROE
+        (col['currentRatio'] > 1.5) +                  # Good liquidity
+        (col['debtToEquity'] < 1) +                    # Low debt
+        (profit_margin > 0.1)                          # Good margins
     ) / 4.0
-
-    margin_of_safety = 0.7 + (0.3 * quality_score)  # 70-100% based on quality
+    margin_of_safety = 0.7 + (0.3 * quality_score)
 
     return fair_value * margin_of_safety
 
+@traced()
+def calculate_dtf_valuation(stock):
+    """Calculate Discounted Cash Flow (DTF) valuation with comprehensive financial data."""
+    return float(batch_dtf_valuation(dtf_columns([stock.info]))[0])
+
+@traced()
 def get_valuation_points(stock):
     """Get 8-point valuation analysis with enhanced financial metrics."""
     info = stock.info
@@ -63,13 +88,17 @@ def get_valuation_points(stock):
     revenue_growth = info.get('revenueGrowth', 0) * 100
     earnings_growth = info.get('earningsGrowth', 0) * 100
 
-    # Get industry averages (example values, could be fetched from sector data)
-    industry_pe = 20  # Example industry P/E
-    industry_pb = 2.5  # Example industry P/B
+    # Peer medians for the ticker's industry (or sector); fixed benchmarks without enough peers
+    peers = get_peer_stats()
+    sector, industry = info.get('sector'), info.get('industry')
+    peer_pe = peers.stat('trailingPE', sector, industry)
+    peer_pb = peers.stat('priceToBook', sector, industry)
+    pe_benchmark = f"peer median of {round(peer_pe, 2)}" if peer_pe is not None else "fixed benchmark of 20"
+    pb_benchmark = f"peer median of {round(peer_pb, 2)}" if peer_pb is not None else "fixed benchmark of 2.5"
 
     return {
-        "1. Price to Earnings": f"P/E ratio is {info.get('trailingPE', 0):.2f} vs industry average of {industry_pe}",
-        "2. Price to Book": f"P/B ratio is {info.get('priceToBook', 0):.2f} vs industry average of {industry_pb}",
+        "1. Price to Earnings": f"P/E ratio is {info.get('trailingPE', 0):.2f} vs {pe_benchmark}",
+        "2. Price to Book": f"P/B ratio is {info.get('priceToBook', 0):.2f} vs {pb_benchmark}",
         "3. Debt Levels": (f"Debt to Equity ratio is {info.get('debtToEquity', 0):.2f} "
                           f"{'(High Risk)' if info.get('debtToEquity', 0) > 2 else '(Moderate Risk)' if info.get('debtToEquity', 0) > 1 else '(Low Risk)'}"),
         "4. Profit Margins": (f"Net profit margin is {info.get('profitMargins', 0)*100:.2f}% "
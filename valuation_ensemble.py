@@ -0,0 +1,194 @@
+"""Valuation ensemble: DCF, DTF and peer-multiple fair values for a batch of tickers.
+
+The inputs of all models are read once into a columnar frame, and the
+discount factors are built once per distinct rate and shared by every
+model, so each model is one vectorized pass over the batch and adding a
+model adds one pass, not one per ticker. The output is one table of
+per-model fair values plus a blended estimate with configurable weights.
+
+    python valuation_ensemble.py tickers.txt --output ensemble.csv
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from dtf import FCF_BASES, batch_advanced_dcf, calculate_wacc, discount_factors, get_dcf_inputs, require_risk_free_rate
+from instrumentation import traced
+from peer_stats import get_peer_stats
+from valuation import DTF_FIELDS, DTF_YEARS, batch_dtf_valuation, dtf_columns, dtf_discount_rates
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {'short_term_growth': 0.1, 'long_term_growth': 0.02, 'market_risk_premium': 0.06,
+                  'fcf_basis': 'annual'}
+
+# Blend weights; renormalized per ticker over the models that produced a value
+DEFAULT_WEIGHTS = {'dcf': 0.4, 'dtf': 0.2, 'pe_multiple': 0.2, 'pb_multiple': 0.2}
+
+# Peer multiples used by the relative models, with the fallbacks of get_valuation_points
+PEER_MULTIPLES = {'pe_multiple': ('trailingPE', 20), 'pb_multiple': ('priceToBook', 2.5)}
+
+FRAME_COLUMNS = (['sector', 'industry', 'currentPrice', 'trailingPE', 'priceToBook'] + list(DTF_FIELDS)
+                 + ['wacc', 'latest_fcf', 'net_debt', 'shares'])
+
+class DiscountTable:
+    """(1 + rate) ** year rows for years 1..years_total, built once per distinct rate.
+
+    Shared by the models of a run: the DCF reads full rows for its WACCs,
+    the DTF the first DTF_YEARS columns for its risk-adjusted rates.
+    """
+
+    def __init__(self, years_total=10):
+        self.years_total = years_total
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def factors(self, rates, years=None):
+        """(N, years) discount factors for an array of N rates."""
+        unique, inverse = np.unique(np.asarray(rates, dtype=float), return_inverse=True)
+        unique = unique.tolist()
+        missing = [rate for rate in unique if rate not in self._rows]
+        if missing:
+            self._rows.update(zip(missing, discount_factors(np.array(missing), self.years_total)))
+        table = np.array([self._rows[rate] for rate in unique]).reshape(len(unique), self.years_total)
+        return table[inverse.reshape(-1), :years]
+
+def build_valuation_frame(stocks, risk_free_rate, market_risk_premium=0.06, fcf_basis='annual'):
+    """Model inputs for {ticker: stock} (ticker x FRAME_COLUMNS), read once for every model.
+
+    WACC falls back to 8% as in calculate_wacc; tickers without free cash
+    flow get NaN DCF inputs (and so no DCF value).
+    """
+    infos = {ticker: stock.info for ticker, stock in stocks.items()}
+    frame = pd.DataFrame(dtf_columns(list(infos.values())), index=list(infos))
+    for key in ('sector', 'industry'):
+        frame[key] = [info.get(key) or 'Unknown' for info in infos.values()]
+    for key in ('currentPrice', 'trailingPE', 'priceToBook'):
+        frame[key] = pd.to_numeric(pd.Series([info.get(key) for info in infos.values()], index=frame.index,
+                                             dtype=object), errors='coerce').astype(float)
+
+    wacc, dcf_inputs = [], []
+    for ticker, stock in stocks.items():
+        wacc.append(calculate_wacc(stock, risk_free_rate, market_risk_premium, on_error=logger.debug)[0])
+        try:
+            inputs = get_dcf_inputs(stock, fcf_basis)
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.debug("No DCF inputs for %s: %s", ticker, e)
+            inputs = None
+        dcf_inputs.append(inputs or (np.nan, np.nan, np.nan))
+    frame['wacc'] = np.array(wacc, dtype=float)
+    frame[['latest_fcf', 'net_debt', 'shares']] = np.array(dcf_inputs, dtype=float).reshape(len(frame), 3)
+    frame.index.name = 'ticker'
+    return frame[FRAME_COLUMNS]
+
+def _dcf_model(frame, discount, params):
+    wacc = frame['wacc'].to_numpy()
+    fair_prices, _ = batch_advanced_dcf(frame['latest_fcf'], params['short_term_growth'],
+                                        params['long_term_growth'], wacc, frame['net_debt'], frame['shares'],
+                                        years_total=discount.years_total, discount=discount.factors(wacc))
+    return fair_prices
+
+def _dtf_model(frame, discount, params):
+    return batch_dtf_valuation(frame, discount=discount.factors(dtf_discount_rates(frame), DTF_YEARS))
+
+def _peer_multiple_model(metric, default):
+    # Price at the peer median multiple: price * peer multiple / own multiple (positive multiples only)
+    def model(frame, discount, params):
+        peers = params['peers']
+        groups = {group: peers.stat(metric, *group, default=default)
+                  for group in set(zip(frame['sector'], frame['industry']))}
+        peer_multiple = np.array([groups[group] for group in zip(frame['sector'], frame['industry'])], dtype=float)
+        multiple = frame[metric].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(multiple > 0, frame['currentPrice'].to_numpy() * peer_multiple / multiple, np.nan)
+    return model
+
+# Name -> model(frame, discount table, params) returning fair prices aligned to the frame
+VALUATION_MODELS = {
+    'dcf': _dcf_model,
+    'dtf': _dtf_model,
+    **{name: _peer_multiple_model(metric, default) for name, (metric, default) in PEER_MULTIPLES.items()},
+}
+
+@traced()
+def run_models(frame, short_term_growth=0.1, long_term_growth=0.02, models=None, peers=None, discount=None):
+    """Per-model fair values (ticker x model) for a valuation frame.
+
+    `discount` may pass a DiscountTable to reuse factors across runs
+    (e.g. when only the growth assumptions change).
+    """
+    models = list(VALUATION_MODELS) if models is None else models
+    params = {'short_term_growth': short_term_growth, 'long_term_growth': long_term_growth,
+              'peers': get_peer_stats() if peers is None else peers}
+    discount = DiscountTable() if discount is None else discount
+    fair_values = pd.DataFrame(index=frame.index)
+    if len(frame):
+        for name in models:
+            fair_values[name] = VALUATION_MODELS[name](frame, discount, params)
+    return fair_values.reindex(columns=models).astype(float)
+
+def blend(fair_values, weights=None):
+    """Weighted fair value per ticker over the models with a finite value (weights renormalized)."""
+    weights = pd.Series(DEFAULT_WEIGHTS if weights is None else weights, dtype=float)
+    weights = weights.reindex(fair_values.columns, fill_value=0.0).to_numpy()
+    values = fair_values.to_numpy(dtype=float)
+    available = np.isfinite(values) & (weights > 0)
+    applied = np.where(available, weights, 0.0)
+    total = applied.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        blended = np.where(total > 0, np.where(available, values, 0.0) @ weights / total, np.nan)
+    return pd.Series(blended, index=fair_values.index, name='blended')
+
+@traced()
+def value_ensemble(stocks, risk_free_rate=None, short_term_growth=0.1, long_term_growth=0.02,
+                   market_risk_premium=0.06, fcf_basis='annual', weights=None, models=None, peers=None):
+    """Per-model and blended fair values with upside to the current price for {ticker: stock}."""
+    risk_free_rate = require_risk_free_rate() if risk_free_rate is None else risk_free_rate
+    frame = build_valuation_frame(stocks, risk_free_rate, market_risk_premium, fcf_basis)
+    result = run_models(frame, short_term_growth, long_term_growth, models, peers)
+    result['blended'] = blend(result, weights)
+    result['current_price'] = frame['currentPrice']
+    result['upside'] = result['blended'] / result['current_price'] - 1
+    return result
+
+def main(argv=None):
+    from bulk_fetch import bulk_fetch
+    from pipeline import read_tickers
+
+    parser = argparse.ArgumentParser(description="Per-model and blended fair values for a list of tickers")
+    parser.add_argument('tickers', help="text file with one ticker per line, or CSV with a 'ticker' column")
+    parser.add_argument('--output', help="write the ensemble table to this CSV")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--as-of', help="point-in-time date for the risk-free rate (YYYY-MM-DD)")
+    parser.add_argument('--short-term-growth', type=float, default=DEFAULT_PARAMS['short_term_growth'])
+    parser.add_argument('--long-term-growth', type=float, default=DEFAULT_PARAMS['long_term_growth'])
+    parser.add_argument('--market-risk-premium', type=float, default=DEFAULT_PARAMS['market_risk_premium'])
+    parser.add_argument('--fcf-basis', choices=FCF_BASES, default=DEFAULT_PARAMS['fcf_basis'])
+    parser.add_argument('--weight', nargs=2, action='append', metavar=('MODEL', 'WEIGHT'),
+                        help="blend weight of a model (repeatable; unset models get 0)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    weights = {model: float(weight) for model, weight in args.weight} if args.weight else None
+    if weights and set(weights) - set(VALUATION_MODELS):
+        parser.error(f"unknown models {sorted(set(weights) - set(VALUATION_MODELS))}, "
+                     f"choose from {list(VALUATION_MODELS)}")
+    fields = ('info', 'financials', 'cashflow') + (('quarterly_cashflow',) if args.fcf_basis == 'ttm' else ())
+    stocks, errors = bulk_fetch(read_tickers(args.tickers), fields=fields, max_workers=args.workers)
+    for ticker, failed in errors.items():
+        logger.warning("Skipping %s: %s", ticker, next(iter(failed.values())))
+
+    result = value_ensemble({ticker: stock for ticker, stock in stocks.items() if ticker not in errors},
+                            require_risk_free_rate(args.as_of), args.short_term_growth, args.long_term_growth,
+                            args.market_risk_premium, args.fcf_basis, weights)
+    if args.output:
+        result.to_csv(args.output)
+    logger.info("Valued %d tickers; models with a value: %s", len(result),
+                ", ".join(f"{name} {count}" for name, count in result.notna().sum().items()))
+
+if __name__ == '__main__':
+    main()
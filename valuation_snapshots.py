@@ -0,0 +1,270 @@
+"""Materialized default-assumption valuations, refreshed incrementally.
+
+A nightly job values the universe at the app's default slider values
+(overview, valuation points, WACC, DCF, Monte Carlo summary and the model
+ensemble) and stores one row per ticker, FCF basis and as-of date. Only
+tickers whose inputs changed are recomputed: the fetched fields, the
+risk-free rate and the ticker's peer group are hashed, and a ticker whose
+hash matches its latest row just has that row marked as still current.
+The app reads these rows instead of computing until a slider leaves the
+defaults.
+
+    python valuation_snapshots.py tickers.txt
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bulk_fetch import bulk_fetch
+from dcf_scenarios import monte_carlo_dcf
+from dtf import FCF_BASES, batch_advanced_dcf, calculate_wacc, require_risk_free_rate
+from financial_statements import ttm_value
+from instrumentation import traced
+from peer_stats import get_peer_stats
+from stock_analysis import get_stock_info
+from valuation import get_valuation_points
+from valuation_ensemble import build_valuation_frame, run_models
+
+logger = logging.getLogger(__name__)
+
+# The app's default slider values; rows are only valid for exactly these
+DEFAULT_PARAMS = {'short_term_growth': 0.1, 'long_term_growth': 0.02, 'market_risk_premium': 0.06}
+
+# Fields the stored results depend on (quarterly cash flow for the TTM basis)
+SNAPSHOT_FIELDS = ('info', 'financials', 'cashflow', 'quarterly_cashflow')
+
+# Part of every content hash: bump when a model changes so the next refresh recomputes everything
+MODEL_VERSION = 1
+
+# Rows not confirmed by a refresh within this many days are treated as missing
+MAX_AGE_DAYS = 2
+
+MONTE_CARLO_BINS = 100
+
+DEFAULT_SNAPSHOTS_PATH = os.environ.get(
+    'VALUATION_SNAPSHOTS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'valuation_snapshots.sqlite'))
+
+def is_default(short_term_growth, long_term_growth, market_risk_premium):
+    """True when slider values are the ones the snapshot rows were computed for."""
+    return np.allclose((short_term_growth, long_term_growth, market_risk_premium),
+                       tuple(DEFAULT_PARAMS.values()), rtol=0, atol=1e-9)
+
+def _hash_value(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), value.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+def content_hash(stock, risk_free_rate, peers=None):
+    """Hash of everything a ticker's stored results depend on."""
+    peers = get_peer_stats() if peers is None else peers
+    info = stock.info
+    digest = hashlib.sha256()
+    _hash_value(digest, [MODEL_VERSION, DEFAULT_PARAMS, risk_free_rate,
+                         peers.peer_group(info.get('sector'), info.get('industry'))])
+    for field in SNAPSHOT_FIELDS:
+        _hash_value(digest, getattr(stock, field))
+    return digest.hexdigest()
+
+def monte_carlo_summary(monte_carlo, bins=MONTE_CARLO_BINS):
+    """Monte Carlo result with the samples replaced by a histogram (counts, bin edges).
+
+    None when no sample produced a finite fair price.
+    """
+    if not monte_carlo['valid_samples']:
+        return None
+    summary = {key: value for key, value in monte_carlo.items() if key != 'fair_prices'}
+    summary['histogram'] = np.histogram(monte_carlo['fair_prices'], bins=bins)
+    return summary
+
+@traced()
+def materialize(stocks, risk_free_rate, fcf_basis='annual', peers=None):
+    """Default-assumption results for {ticker: stock}, one batched pass per model.
+
+    Each row holds what the app shows at default slider values. Tickers
+    whose data can't be valued are left out (the app computes them live).
+    """
+    peers = get_peer_stats() if peers is None else peers
+    short_term_growth, long_term_growth, market_risk_premium = DEFAULT_PARAMS.values()
+    rows = {}
+    for ticker, stock in stocks.items():
+        try:
+            wacc_warnings = []
+            wacc, adjusted_beta = calculate_wacc(stock, risk_free_rate, market_risk_premium,
+                                                 on_error=wacc_warnings.append)
+            rows[ticker] = {'risk_free_rate': risk_free_rate, 'wacc_warnings': list(dict.fromkeys(wacc_warnings)),
+                            'stock_info': get_stock_info(stock), 'valuation_points': get_valuation_points(stock),
+                            'dcf': {'wacc': wacc, 'adjusted_beta': adjusted_beta, 'fair_price': None,
+                                    'projected_fcfs': None, 'current_price': stock.info.get('currentPrice')}}
+        except Exception as e:
+            logger.warning("Not materializing %s: %s: %s", ticker, type(e).__name__, e)
+    if not rows:
+        return rows
+
+    frame = build_valuation_frame({ticker: stocks[ticker] for ticker in rows}, risk_free_rate,
+                                  market_risk_premium, fcf_basis)
+    ensemble = run_models(frame, short_term_growth, long_term_growth, peers=peers)
+    with_fcf = frame['latest_fcf'].notna().to_numpy()
+    dcf_frame = frame[with_fcf]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fair_prices, projected_fcfs = batch_advanced_dcf(dcf_frame['latest_fcf'], short_term_growth,
+                                                         long_term_growth, dcf_frame['wacc'], dcf_frame['net_debt'],
+                                                         dcf_frame['shares'])
+    # As in the scenario grid: no finite terminal value when long-term growth reaches WACC
+    fair_prices[long_term_growth >= dcf_frame['wacc'].to_numpy()] = np.nan
+
+    for i, ticker in enumerate(dcf_frame.index):
+        row, inputs = rows[ticker], dcf_frame.loc[ticker]
+        row['dcf'].update(fair_price=fair_prices[i], projected_fcfs=list(projected_fcfs[i]))
+        row['latest_fcf'] = inputs['latest_fcf']
+        ttm_available = fcf_basis == 'ttm' and ttm_value(stocks[ticker], 'cash_flow', 'Free Cash Flow') is not None
+        row['fcf_basis'] = 'ttm' if ttm_available else 'annual'
+        try:
+            row['monte_carlo'] = monte_carlo_summary(monte_carlo_dcf(
+                inputs['latest_fcf'], inputs['net_debt'], inputs['shares'], short_term_growth, long_term_growth,
+                inputs['wacc'], seed=0))
+        except Exception as e:
+            logger.warning("No Monte Carlo summary for %s: %s: %s", ticker, type(e).__name__, e)
+            row['monte_carlo'] = None
+    for ticker, row in rows.items():
+        row['ensemble'] = ensemble.loc[[ticker]].assign(current_price=frame.loc[[ticker], 'currentPrice'])
+    return rows
+
+class ValuationSnapshotStore:
+    """SQLite store of materialized rows keyed by (ticker, FCF basis, as-of date).
+
+    A row is written only when its content hash changes; `refreshed_on`
+    records the last refresh that confirmed it, so a point-in-time lookup
+    returns the latest row at or before the requested date.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS valuations ('
+            ' ticker TEXT NOT NULL, fcf_basis TEXT NOT NULL, as_of TEXT NOT NULL, content_hash TEXT NOT NULL,'
+            ' refreshed_on TEXT NOT NULL, payload BLOB NOT NULL, PRIMARY KEY (ticker, fcf_basis, as_of))')
+        self._conn.commit()
+
+    def latest(self, ticker, fcf_basis='annual', as_of=None):
+        """The row valid on `as_of` (default today) with its 'as_of' and 'refreshed_on', or None."""
+        as_of = as_of or date.today().isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT as_of, refreshed_on, payload FROM valuations WHERE ticker = ? AND fcf_basis = ?'
+                ' AND as_of <= ? ORDER BY as_of DESC LIMIT 1', (ticker.upper(), fcf_basis, as_of)).fetchone()
+        if row is None:
+            return None
+        return dict(pickle.loads(row[2]), as_of=row[0], refreshed_on=row[1])
+
+    def current(self, ticker, fcf_basis='annual', max_age_days=MAX_AGE_DAYS):
+        """Today's row if a refresh confirmed it within `max_age_days`, else None."""
+        row = self.latest(ticker, fcf_basis)
+        if row is None or row['refreshed_on'] < (date.today() - timedelta(days=max_age_days)).isoformat():
+            return None
+        return row
+
+    def hashes(self, fcf_basis='annual'):
+        """{ticker: content hash} of each ticker's latest row."""
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT ticker, content_hash FROM valuations v WHERE fcf_basis = ? AND as_of ='
+                ' (SELECT MAX(as_of) FROM valuations WHERE ticker = v.ticker AND fcf_basis = v.fcf_basis)',
+                (fcf_basis,)).fetchall())
+
+    def put(self, rows, hashes, fcf_basis, as_of):
+        """Store {ticker: row} computed on `as_of` with their content hashes."""
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO valuations VALUES (?, ?, ?, ?, ?, ?)',
+                [(ticker, fcf_basis, as_of, hashes[ticker], as_of,
+                  pickle.dumps(row, protocol=pickle.HIGHEST_PROTOCOL)) for ticker, row in rows.items()])
+            self._conn.commit()
+
+    def confirm(self, tickers, fcf_basis, as_of):
+        """Mark the latest rows of unchanged tickers as current on `as_of`."""
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE valuations SET refreshed_on = ? WHERE ticker = ? AND fcf_basis = ? AND as_of ='
+                ' (SELECT MAX(as_of) FROM valuations WHERE ticker = ? AND fcf_basis = ?)',
+                [(as_of, ticker, fcf_basis, ticker, fcf_basis) for ticker in tickers])
+            self._conn.commit()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_snapshot_store():
+    """Process-wide store at DEFAULT_SNAPSHOTS_PATH."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ValuationSnapshotStore()
+        return _store
+
+@traced()
+def refresh_snapshots(tickers, store=None, as_of=None, fcf_bases=FCF_BASES, peers=None, fetch=None,
+                      max_workers=16):
+    """Recompute and store the rows of tickers whose inputs changed; returns counts per basis.
+
+    Unchanged tickers cost a fetch (through the fundamentals cache) and a
+    hash; failed fetches keep their previous row, which ages out after
+    MAX_AGE_DAYS without a confirming refresh.
+    """
+    store = store or get_snapshot_store()
+    peers = get_peer_stats() if peers is None else peers
+    as_of = as_of or date.today().isoformat()
+    risk_free_rate = require_risk_free_rate(as_of)
+    stocks, errors = bulk_fetch(tickers, fields=SNAPSHOT_FIELDS, fetch=fetch, max_workers=max_workers)
+    for ticker, failed in errors.items():
+        logger.warning("Skipping %s: %s", ticker, next(iter(failed.values())))
+    stocks = {ticker: stock for ticker, stock in stocks.items() if ticker not in errors}
+    hashes = {ticker: content_hash(stock, risk_free_rate, peers) for ticker, stock in stocks.items()}
+
+    counts = {}
+    for fcf_basis in fcf_bases:
+        stored = store.hashes(fcf_basis)
+        changed = {ticker: stock for ticker, stock in stocks.items() if stored.get(ticker) != hashes[ticker]}
+        rows = materialize(changed, risk_free_rate, fcf_basis, peers)
+        store.put(rows, hashes, fcf_basis, as_of)
+        store.confirm([ticker for ticker in stocks if ticker not in changed], fcf_basis, as_of)
+        counts[fcf_basis] = {'tickers': len(stocks), 'recomputed': len(rows),
+                             'unchanged': len(stocks) - len(changed), 'failed': len(changed) - len(rows)}
+    counts['fetch_errors'] = len(errors)
+    return counts
+
+def main(argv=None):
+    from pipeline import read_tickers
+
+    parser = argparse.ArgumentParser(description="Materialize default-assumption valuations for a universe")
+    parser.add_argument('tickers', help="text file with one ticker per line, or CSV with a 'ticker' column")
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOTS_PATH)
+    parser.add_argument('--as-of', help="as-of date for the rows and the risk-free rate (YYYY-MM-DD)")
+    parser.add_argument('--fcf-basis', nargs='+', choices=FCF_BASES, default=list(FCF_BASES))
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    counts = refresh_snapshots(read_tickers(args.tickers), ValuationSnapshotStore(args.output), args.as_of,
+                               args.fcf_basis, max_workers=args.workers)
+    for fcf_basis in args.fcf_basis:
+        logger.info("%s: %d tickers, %d recomputed, %d unchanged, %d failed", fcf_basis,
+                    *counts[fcf_basis].values())
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
-import plotly.graph_objects as go
+from instrumentation import RENDER, traced
 
+@traced(RENDER)
 def create_metrics_pie_chart(stock):
     """Create pie charts for key financial metrics."""
+    import plotly.graph_objects as go
     info = stock.info
     
     # Financial metrics for pie chart
@@ -10,8 +12,6 @@ def create_metrics_pie_chart(stock):
     operating_income = info.get('operatingIncome', 0)
     net_income = info.get('netIncomeToCommon', 0)
 
-    print(costs)
-    
     # Create pie chart
     labels = ['Costs', 'Operating Income', 'Net Income']
     values = [costs, operating_income - net_income, net_income]
@@ -34,3 +34,25 @@ def create_metrics_pie_chart(stock):
     )
     
     return fig
+
+
+@traced(RENDER)
+def create_risk_heatmap(score_matrix):
+    """Heatmap of 0/1/2 risk scores (tickers x factors), e.g. aggregate_portfolio's 'risk_scores'."""
+    import plotly.graph_objects as go
+    fig = go.Figure(data=go.Heatmap(
+        z=score_matrix.to_numpy(),
+        x=[column.title() for column in score_matrix.columns],
+        y=list(score_matrix.index),
+        zmin=0,
+        zmax=2,
+        colorscale=[[0, '#99ff99'], [0.5, '#ffe699'], [1, '#ff9999']],
+        colorbar=dict(tickvals=[0, 1, 2], ticktext=['Low', 'Moderate', 'High'])
+    ))
+
+    fig.update_layout(
+        title="Risk Factor Heatmap",
+        height=max(400, 20 * len(score_matrix))
+    )
+
+    return fig
@@ -0,0 +1,246 @@
+import io
+import logging
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from bulk_fetch import DEFAULT_TIMEOUT, get_http_session
+from data_provider import ReplayProvider, curve_snapshot_path, get_data_provider
+from instrumentation import FETCH, count, span
+
+logger = logging.getLogger(__name__)
+
+TREASURY_CSV_URL = ("https://home.treasury.gov/resource-center/data-chart-center/interest-rates/"
+                    "daily-treasury-rates.csv/{year}/all?type=daily_treasury_yield_curve"
+                    "&field_tdr_date_value={year}&page&_format=csv")
+
+DEFAULT_CURVE_PATH = os.environ.get(
+    'YIELD_CURVE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'yield_curve.csv'))
+
+DEFAULT_TENOR = '10 Yr'
+
+# First year of the stored history; Treasury's daily par yield curve starts in 1990
+DEFAULT_START_YEAR = int(os.environ.get('YIELD_CURVE_START_YEAR', 1990))
+
+def fetch_treasury_year(year, session=None, timeout=DEFAULT_TIMEOUT):
+    """Download one calendar year of daily par yield curve rates (percent, tenors as columns)."""
+    session = session or get_http_session()
+    count('network_calls')
+    with span('treasury yield curve', FETCH, year=year):
+        response = session.get(TREASURY_CSV_URL.format(year=year), timeout=timeout)
+    response.raise_for_status()
+    return parse_treasury_csv(response.text)
+
+def _provider_treasury_year(year):
+    # Live, recorded or replayed, depending on the process-wide data provider
+    return get_data_provider().treasury_year(year)
+
+def parse_treasury_csv(text):
+    curve = pd.read_csv(io.StringIO(text))
+    curve['Date'] = pd.to_datetime(curve['Date'], format='%m/%d/%Y')
+    return curve.set_index('Date').sort_index().apply(pd.to_numeric, errors='coerce')
+
+class YieldCurveService:
+    """Daily Treasury yield-curve history kept on disk and served from memory.
+
+    The curve is persisted as CSV at `path`, loaded on construction and
+    refreshed by a background thread every `refresh_interval` seconds, so
+    callers never block on the network; batch jobs that need a rate call
+    ensure() to load the years they need synchronously. The history starts
+    in `start_year`; `years`, if given, limits refreshes to those years
+    (e.g. the ones a replay recorded). Lookups use a sorted date array and return decimal
+    rates (0.043 for 4.3%).
+    """
+
+    def __init__(self, path=DEFAULT_CURVE_PATH, refresh_interval=6 * 3600, start_year=DEFAULT_START_YEAR,
+                 fetch_year=None, years=None):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.start_year = start_year
+        self.fetch_year = fetch_year or _provider_treasury_year
+        self.years = None if years is None else frozenset(years)
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._set_curve(self._load())
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame()
+        curve = pd.read_csv(self.path, index_col='Date', parse_dates=['Date'])
+        return curve.sort_index()
+
+    def _set_curve(self, curve):
+        # Swap in an immutable snapshot; readers never see a half-updated curve
+        snapshot = (curve,
+                    curve.index.values.astype('datetime64[D]'),
+                    {tenor: curve[tenor].to_numpy(dtype=float) / 100 for tenor in curve.columns})
+        with self._lock:
+            self._snapshot = snapshot
+
+    @property
+    def curve(self):
+        """Full history as a DataFrame (dates x tenors, percent)."""
+        return self._snapshot[0]
+
+    def refresh(self, start_year=None, end_year=None):
+        """Fetch the missing years from `start_year` (default self.start_year) to `end_year` and persist the curve.
+
+        The latest stored year and the current one are always re-fetched.
+        Years are fetched newest first and independently: a failed year is
+        logged and tried again on the next refresh, the others are kept. The
+        refresh lock is held per year, so a synchronous ensure() waits for at
+        most one download of a background backfill. Returns True when every
+        year was fetched.
+        """
+        curve = self.curve
+        this_year = date.today().year
+        latest = curve.index[-1].year if len(curve) else this_year
+        start_year = self.start_year if start_year is None else start_year
+        end_year = this_year if end_year is None else min(end_year, this_year)
+        stored = set(curve.index.year) if len(curve) else set()
+        years = [year for year in range(start_year, end_year + 1) if year >= latest or year not in stored]
+        if self.years is not None:
+            years = [year for year in years if year in self.years]
+
+        fetched, failed = 0, {}
+        for year in reversed(years):
+            with self._refresh_lock:
+                # Another refresh may have loaded this year in the meantime
+                if year < latest and len(self.curve) and year in set(self.curve.index.year):
+                    continue
+                try:
+                    frame = self.fetch_year(year)
+                except Exception as e:
+                    failed[year] = e
+                    continue
+                merged = pd.concat([self.curve, frame]) if len(self.curve) else frame
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                merged.index.name = 'Date'
+                self._set_curve(merged)
+                fetched += 1
+        if failed:
+            self.last_error = next(iter(failed.values()))
+            logger.warning("Yield curve years %s not fetched, keeping %d stored days: %s",
+                           ", ".join(map(str, sorted(failed))), len(self.curve), self.last_error)
+        else:
+            self.last_error = None
+        if fetched:
+            with self._refresh_lock:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                self.curve.to_csv(tmp_path)
+                os.replace(tmp_path, self.path)
+        return not failed
+
+    def covers(self, as_of=None, max_gap_days=7):
+        """Whether the curve has an observation at most `max_gap_days` before `as_of` (today if None)."""
+        _, dates, _ = self._snapshot
+        if not len(dates):
+            return False
+        day = np.datetime64(pd.Timestamp(date.today() if as_of is None else as_of).date(), 'D')
+        return dates[0] <= day and dates[-1] >= day - np.timedelta64(max_gap_days, 'D')
+
+    def ensure(self, as_of=None, max_gap_days=7):
+        """Load the years `as_of` needs synchronously unless the curve covers it; returns whether it does then.
+
+        Only those years are fetched (on a cold install, just the current
+        one); the rest of the history is backfilled by the background refresh.
+        """
+        if not self.covers(as_of, max_gap_days):
+            day = pd.Timestamp(date.today() if as_of is None else as_of)
+            self.refresh((day - pd.Timedelta(days=max_gap_days)).year, day.year)
+        return self.covers(as_of, max_gap_days)
+
+    def start(self):
+        """Start the background refresh loop (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='yield-curve-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+    def rate(self, as_of=None, tenor=DEFAULT_TENOR, max_gap_days=None):
+        """Rate for `tenor` on the last observation at or before `as_of` (latest if None).
+
+        Returns None when no observation is available, or when it is more
+        than `max_gap_days` before `as_of` (e.g. inside a year that failed
+        to load).
+        """
+        _, dates, tenors = self._snapshot
+        values = tenors.get(tenor)
+        if values is None or not len(dates):
+            return None
+        day = None if as_of is None else np.datetime64(pd.Timestamp(as_of).date(), 'D')
+        if day is None:
+            position = len(dates) - 1
+        else:
+            position = np.searchsorted(dates, day, side='right') - 1
+            if position < 0:
+                return None
+        # Skip days where this tenor was not quoted
+        while position >= 0 and np.isnan(values[position]):
+            position -= 1
+        if position < 0:
+            return None
+        if day is not None and max_gap_days is not None and dates[position] < day - np.timedelta64(max_gap_days, 'D'):
+            return None
+        return float(values[position])
+
+    def latest(self, tenor=DEFAULT_TENOR):
+        return self.rate(None, tenor)
+
+    def curve_on(self, as_of=None):
+        """All tenors (decimal) for the last observation at or before `as_of`."""
+        curve, dates, _ = self._snapshot
+        if not len(dates):
+            return pd.Series(dtype=float)
+        if as_of is None:
+            return curve.iloc[-1] / 100
+        position = np.searchsorted(dates, np.datetime64(pd.Timestamp(as_of).date(), 'D'), side='right') - 1
+        return curve.iloc[position] / 100 if position >= 0 else pd.Series(dtype=float)
+
+_service = None
+_service_provider = None
+_service_lock = threading.Lock()
+
+def _make_service(provider):
+    if isinstance(provider, ReplayProvider):
+        # The recorded curve only: no background refresh, no years beyond the recording
+        years = provider.treasury_years()
+        service = YieldCurveService(path=curve_snapshot_path(provider.root), start_year=min(years, default=date.today().year),
+                                    years=years)
+        if not len(service.curve):
+            service.refresh()
+        return service
+    return YieldCurveService().start()
+
+def get_yield_curve_service():
+    """Process-wide service for the current data provider.
+
+    Live: loaded from disk and refreshing in the background. Replay: the
+    curve recorded under the snapshot directory, limited to the recorded
+    years. Rebuilt when set_data_provider() swaps the provider.
+    """
+    global _service, _service_provider
+    provider = get_data_provider()
+    with _service_lock:
+        if _service is None or _service_provider is not provider:
+            if _service is not None:
+                _service.stop()
+            _service, _service_provider = _make_service(provider), provider
+        return _service